@@ -43,14 +43,18 @@ data_analyst_agent = LlmAgent(
         "ROLE: SQL Orchestrator. You have MCP SQL tools and the write_sql agent-tool.\n"
         "GOAL: Answer the user's KPI question by producing a compact result from the database and return the FINAL SQL used.\n"
         "TOOLS YOU CAN CALL:\n"
+        "- kpi_slice(kpi, grain, start, end)\n"
+        "- kpi_trend / kpi_cagr / kpi_volatility / kpi_seasonality / kpi_forecast (kpi, start, end)\n"
+        "- sql_db_schema_compact\n"
         "- sql_db_list_tables\n"
         "- sql_db_schema (use sample_rows=0)\n"
         "- sql_db_query_checker(dialect='sqlite')\n"
         "- write_sql (the nl2sql_agent via AgentTool)\n"
         "- sql_execute_query\n"
         "PROCESS:\n"
-        "1) Discover tables with sql_db_list_tables. Identify likely relevant tables from their names.\n"
-        "2) Fetch schemas with sql_db_schema(sample_rows=0) for only the relevant tables (cap at ~8). Build a SCHEMA string with one line per table: table(col type, ...).\n"
+        "0) If the question is a latest value, trailing N months, quarterly/yearly average, or period-over-period/YoY change of a monthly_kpis column, answer it with kpi_slice (grain='month'|'quarter'|'year') and return its rows with sql_final set to \"kpi_slice(...)\"; for trend slope, CAGR, volatility, seasonality or a forecast, call the matching kpi_* tool. Use the SQL steps below only for anything else.\n"
+        "1) Call sql_db_schema_compact to get the SCHEMA string (one line per table: table(col type, ...)). Identify likely relevant tables from it.\n"
+        "2) Only if you need DDL details for a table, call sql_db_schema(sample_rows=0) for the relevant tables (cap at ~8); use sql_db_list_tables if the SCHEMA string is empty.\n"
         "3) Build a precise QUESTION from the user prompt (include KPI name, target, timeframe if mentioned), and use the nl2sql agent tool to create an sql query\n"
         "4) Call write_sql with:\n"
         "   SCHEMA:\\n<one line per table>\\n\\nQUESTION:\\n<precise question>\n"
@@ -66,13 +70,20 @@ data_analyst_agent = LlmAgent(
         "     \"notes\": list[str]        # any caveats or assumptions\n"
         "   }\n"
         "CONSTRAINTS:\n"
-        "- always follow use discover tables and fetch schema tools before the rest.\n"
-        "- don't return a response without having tried all of your tools and agent tools\n"
+        "- always get the SCHEMA (sql_db_schema_compact) before writing any SQL.\n"
+        "- unless kpi_slice answered the question, don't return a response without having tried all of your tools and agent tools\n"
     ),
     tools=[
         MCPToolset(
             connection_params=SseConnectionParams(url=SSE_URL),
             tool_filter=[
+                "kpi_slice",
+                "kpi_trend",
+                "kpi_cagr",
+                "kpi_volatility",
+                "kpi_seasonality",
+                "kpi_forecast",
+                "sql_db_schema_compact",
                 "sql_db_list_tables",
                 "sql_db_schema",
                 "sql_db_query_checker",
@@ -119,15 +130,16 @@ feasible_agent = LlmAgent(
     name="feasibility_agent",
     instruction=(
         "ROLE: Feasibility Analyst & Benchmarker.\n"
-        "TOOLS: web_search → fetch; and the adjustments_agent.\n"
+        "TOOLS: search (or web_search) → fetch (or fetch_many for several urls); kpi_trend, kpi_cagr, kpi_volatility, kpi_seasonality, kpi_forecast (internal monthly_kpis history); and the adjustments_agent.\n"
         "OBJECTIVE: Given a user KPI goal and (optionally) a compact internal data summary, determine feasibility and, if weak, propose better goals.\n"
         "SCALE:\n"
         "- 5 = Very feasible; 4 = Feasible (moderate effort); 3 = Borderline/risky; 2 = Unlikely w/o major changes; 1 = Not feasible.\n"
         "PROCESS:\n"
         "1) Parse the goal: KPI, target, timeframe, scope. Note baseline if provided by the orchestrator.\n"
+        "   - Get the internal baseline numbers from the kpi_* tools: kpi_trend/kpi_cagr for the historical improvement rate, kpi_volatility/kpi_seasonality for noise, and kpi_forecast for where the KPI lands by the deadline without changes.\n"
         "2) Evidence gathering:\n"
         "   - use the web_search tool combining the KPI, industry, typical improvement rates, and timelines, and gather around 3 urls on the topic.\n"
-        "   - fuse your fetch tool to Extract concrete stats, ranges, and case benchmarks from the provided urls.\n"
+        "   - fuse your fetch tool to Extract concrete stats, ranges, and case benchmarks from the provided urls (pass a `query` to get only the relevant passages).\n"
         "3) Rate feasibility (difficulty_score 1-5) and produce feasibility_label and a brief rationale. List key blockers and assumptions.\n"
         "4) If difficulty_score <= 2 OR evidence is weak OR internal data contradicts the goal, call adjustments_agent with the goal + data summary + distilled web facts.\n"
         "   - Receive 1-3 alt goals. Briefly re-score each (1 sentence each) and choose a recommended alternative.\n"
@@ -154,7 +166,7 @@ feasible_agent = LlmAgent(
             connection_params=SseConnectionParams(
                 url="http://localhost:8787/sse"  
             ),
-            tool_filter=["web_search", "fetch"], 
+            tool_filter=["search", "web_search", "fetch", "fetch_many", "kpi_trend", "kpi_cagr", "kpi_volatility", "kpi_seasonality", "kpi_forecast"], 
         )
         , AgentTool(adjustments_agent)
     ],
@@ -54,6 +54,8 @@ Benchmakr_system_prompt = SystemMessage(
     "You are an agent that is connected to a web search tool and fecth tool"
     "You should primarly research the stated similar competitors to the company and use the web search to get the relevant urls"
     "Once you have used the web search tool, you should use the fetch tool to get the content of the urls."
+    "When you have several urls, use the fetch_many tool to get them in one call."
+    "Pass a short query to fetch/fetch_many to get only the passages relevant to it."
     "Your goal is to gather relevant information from the web to answer the user's query."
     "Everything that might be relevant to developping a plan to achieve the user's goal should be retrieved."
 )
@@ -184,9 +186,9 @@ async def main():
             print("MCP tools:", list(tool_map.keys()))
 
             
-            web_llm = model.bind_tools([tool_map["web_search"], tool_map["fetch"]])
+            web_llm = model.bind_tools([tool_map["search"], tool_map["web_search"], tool_map["fetch"], tool_map["fetch_many"]])
             rag_llm = model.bind_tools([tool_map["rag_tool"]])
-            plan_llm = advanced_model.bind_tools([tool_map["web_search"], tool_map["fetch"]])
+            plan_llm = advanced_model.bind_tools([tool_map["search"], tool_map["web_search"], tool_map["fetch"], tool_map["fetch_many"]])
 
             graph_builder = StateGraph(State)
             graph_builder.add_node("Baseline_model", Baseline_model)
@@ -258,9 +260,9 @@ async def create_graph_and_tools():
     tools = await load_mcp_tools(session=_client_session)
     tool_map = {t.name: t for t in tools}
 
-    web_llm = model.bind_tools([tool_map["web_search"], tool_map["fetch"]])
+    web_llm = model.bind_tools([tool_map["search"], tool_map["web_search"], tool_map["fetch"], tool_map["fetch_many"]])
     rag_llm = model.bind_tools([tool_map["rag_tool"]])
-    plan_llm = advanced_model.bind_tools([tool_map["web_search"], tool_map["fetch"]])
+    plan_llm = advanced_model.bind_tools([tool_map["search"], tool_map["web_search"], tool_map["fetch"], tool_map["fetch_many"]])
 
     graph_builder = StateGraph(State)
     graph_builder.add_node("Baseline_model", Baseline_model)
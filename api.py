@@ -1,7 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Any, Dict, Optional
 from a2a_seg.final_step.agent import ADK_Run  
 from server import rag_tool
+from sql_tools import iter_query_rows, validate_sql, QueryRejected
+import json
+import sqlite3
 import torch
 
 app = FastAPI()
@@ -9,13 +14,32 @@ app = FastAPI()
 class Prompt(BaseModel):
     text: str
 
+class SQLQuery(BaseModel):
+    query: str
+    params: Optional[Dict[str, Any]] = None
+    max_rows: int = 10000
+
 @app.post("/full_workflow")
 async def run_agent_endpoint(prompt: Prompt):
     return  await ADK_Run(prompt.text)
 
 @app.post("/rag_tool")
-def run_rag_tool_endpoint(prompt: Prompt):
-    return rag_tool(prompt.text)
+async def run_rag_tool_endpoint(prompt: Prompt):
+    return await rag_tool(prompt.text)
+
+@app.post("/sql_stream")
+def sql_stream_endpoint(req: SQLQuery):
+    """Stream query rows as NDJSON (one JSON object per line)."""
+    ok, errs = validate_sql(req.query)
+    if not ok:
+        raise HTTPException(status_code=400, detail=errs)
+    try:
+        rows = iter_query_rows(req.query, params=req.params, row_limit=req.max_rows)
+    except QueryRejected as e:
+        raise HTTPException(status_code=400, detail={"error": "guard_rejected", "guard": e.guard})
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=400, detail={"error": "execution_error", "message": str(e)})
+    return StreamingResponse((json.dumps(r, default=str) + "\n" for r in rows), media_type="application/x-ndjson")
 
 
 
@@ -0,0 +1,112 @@
+# Incremental FAISS index builder for the RAG tool.
+# usage: python build_rag_index.py [--full]
+# Every document and chunk is hashed; a manifest next to the index records which chunk ids came from which
+# document version, so only chunks of changed documents are embedded and their vectors added/removed in place.
+# The index is written to a temp dir and swapped in, so a running server never loads a half-written index.
+from __future__ import annotations
+import os, json, time, shutil, hashlib
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+import click
+from rag import MANIFEST, index_settings, directories, db_dir, load_markdown, get_text_splitter, get_embeddings, embedding_cache_stats
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_document(doc) -> List[Tuple[str, Any]]:
+    """Split one document into (chunk id, chunk) pairs; ids are content hashes, stable across runs."""
+    seen: Counter = Counter()
+    out = []
+    for chunk in get_text_splitter().split_documents([doc]):
+        base = _sha(f"{doc.metadata.get('source')}\0{chunk.page_content}")[:32]
+        seen[base] += 1
+        out.append((base if seen[base] == 1 else f"{base}-{seen[base]}", chunk))
+    return out
+
+def _load_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save(db, manifest: Dict[str, Any], dest: str) -> None:
+    tmp = f"{dest.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    db.save_local(tmp)
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.makedirs(dest, exist_ok=True)
+    for name in ("index.faiss", "index.pkl", MANIFEST):
+        os.replace(os.path.join(tmp, name), os.path.join(dest, name))
+    shutil.rmtree(tmp, ignore_errors=True)
+
+def build_index(docs_dir: str = directories, index_dir: str = db_dir, full: bool = False) -> Dict[str, Any]:
+    from langchain_community.vectorstores import FAISS
+    t0 = time.time()
+    old = _load_manifest(index_dir)
+    rebuild = full or old.get("settings") != index_settings() or not os.path.exists(os.path.join(index_dir, "index.faiss"))
+    old_docs: Dict[str, Dict[str, Any]] = {} if rebuild else old.get("docs", {})
+
+    docs = {d.metadata["source"]: d for d in load_markdown(docs_dir)}
+    new_docs: Dict[str, Dict[str, Any]] = {}
+    add_ids: List[str] = []
+    add_chunks: List[Any] = []
+    remove_ids: List[str] = []
+    unchanged = 0
+    for source, doc in sorted(docs.items()):
+        doc_hash = _sha(doc.page_content)
+        prev = old_docs.get(source)
+        if prev and prev["hash"] == doc_hash:
+            new_docs[source] = prev
+            unchanged += len(prev["chunks"])
+            continue
+        chunks = chunk_document(doc)
+        ids = [cid for cid, _ in chunks]
+        prev_ids = set(prev["chunks"]) if prev else set()
+        for cid, chunk in chunks:
+            if cid not in prev_ids:
+                add_ids.append(cid)
+                add_chunks.append(chunk)
+            else:
+                unchanged += 1
+        remove_ids.extend(prev_ids - set(ids))
+        new_docs[source] = {"hash": doc_hash, "chunks": ids}
+    for source, prev in old_docs.items():
+        if source not in docs:
+            remove_ids.extend(prev["chunks"])
+
+    summary = {"ok": True, "rebuilt": rebuild, "documents": len(docs), "chunks_embedded": len(add_ids),
+               "chunks_removed": len(remove_ids), "chunks_unchanged": unchanged}
+    if not (rebuild or add_ids or remove_ids):
+        # Nothing to embed: don't even load the model. Only renamed/re-hashed docs may need a manifest update.
+        if old.get("docs") != new_docs:
+            with open(os.path.join(index_dir, MANIFEST), "w", encoding="utf-8") as f:
+                json.dump({"settings": index_settings(), "docs": new_docs}, f, indent=1, sort_keys=True)
+        return {**summary, "vectors": unchanged, "saved": False, "duration_ms": int((time.time() - t0) * 1000)}
+
+    embeddings = get_embeddings()
+    if rebuild:
+        if not add_chunks:
+            raise click.ClickException(f"No Markdown documents under {docs_dir}.")
+        db = FAISS.from_documents(add_chunks, embeddings, ids=add_ids)
+    else:
+        db = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+        if remove_ids:
+            db.delete(remove_ids)
+        if add_chunks:
+            db.add_documents(add_chunks, ids=add_ids)
+    _save(db, {"settings": index_settings(), "docs": new_docs}, index_dir)
+    return {**summary, "vectors": db.index.ntotal, "saved": True, "embedding_cache": embedding_cache_stats(),
+            "duration_ms": int((time.time() - t0) * 1000)}
+
+@click.command()
+@click.option("--docs", "docs_dir", default=directories, show_default=True, help="Directory of Markdown documents.")
+@click.option("--index", "index_dir", default=db_dir, show_default=True, help="FAISS index directory.")
+@click.option("--full", is_flag=True, help="Re-embed everything instead of only changed chunks.")
+def main(docs_dir, index_dir, full):
+    """Build or incrementally update the RAG FAISS index."""
+    click.echo(build_index(docs_dir=docs_dir, index_dir=index_dir, full=full))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# In-memory cache of converted `fetch` documents so paginated calls (start_index > 0) are a plain slice:
+# no download, no Readability/markdownify pass. Documents are stored once per content hash; the URL index
+# (url_canon.url_key) and the short document handle handed out in truncation hints both point at that hash.
+from __future__ import annotations
+import os, time, hashlib, threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DOC_CACHE_TTL_S = float(os.getenv("DOC_CACHE_TTL_S", "900"))
+HANDLE_LEN = 12
+
+def content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8", "replace")).hexdigest()
+
+@dataclass
+class Document:
+    handle: str
+    url: str
+    content: str
+    prefix: str
+    size: int
+    created: float
+    passages: Optional[List[Any]] = field(default=None, repr=False)  # passages.split_passages, built on first query
+
+class DocCache:
+    """Byte-bounded LRU of converted documents keyed by (source content hash, raw flag), with a TTL."""
+    def __init__(self, max_bytes: int = DOC_CACHE_MAX_BYTES, ttl_s: float = DOC_CACHE_TTL_S):
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._docs: "OrderedDict[str, Document]" = OrderedDict()
+        self._by_url: Dict[Tuple[str, bool], str] = {}
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "conversions_saved": 0, "evictions": 0}
+
+    @staticmethod
+    def key(body_hash: str, raw: bool) -> str:
+        return hashlib.sha256(f"{body_hash}:{int(raw)}".encode()).hexdigest()[:HANDLE_LEN]
+
+    def _live(self, handle: Optional[str]) -> Optional[Document]:
+        doc = self._docs.get(handle) if handle else None
+        if doc is None:
+            return None
+        if time.time() - doc.created > self.ttl_s:
+            self._drop(handle)
+            return None
+        self._docs.move_to_end(handle)
+        return doc
+
+    def _drop(self, handle: str) -> None:
+        doc = self._docs.pop(handle, None)
+        if doc is not None:
+            self._bytes -= doc.size
+
+    def lookup(self, key: str, raw: bool, handle: Optional[str] = None) -> Optional[Document]:
+        """Find a converted document by handle, else by the last version seen for URL key `key`."""
+        with self._lock:
+            doc = self._live(handle) or self._live(self._by_url.get((key, raw)))
+            self.stats["hits" if doc else "misses"] += 1
+            return doc
+
+    def by_body(self, key: str, body_hash: str, raw: bool) -> Optional[Document]:
+        """Same bytes already converted (possibly under another URL): reuse it and skip the conversion."""
+        with self._lock:
+            doc = self._live(self.key(body_hash, raw))
+            if doc is not None:
+                self._by_url[(key, raw)] = doc.handle
+                self.stats["conversions_saved"] += 1
+            return doc
+
+    def put(self, key: str, url: str, body_hash: str, raw: bool, content: str, prefix: str) -> Document:
+        handle = self.key(body_hash, raw)
+        doc = Document(handle, url, content, prefix, len(content.encode("utf-8", "replace")), time.time())
+        with self._lock:
+            self._drop(handle)
+            self._docs[handle] = doc
+            self._by_url[(key, raw)] = handle
+            self._bytes += doc.size
+            evicted = False
+            while self._bytes > self.max_bytes and len(self._docs) > 1:
+                _, old = self._docs.popitem(last=False)
+                self._bytes -= old.size
+                self.stats["evictions"] += 1
+                evicted = True
+            if evicted:
+                self._by_url = {k: h for k, h in self._by_url.items() if h in self._docs}
+        return doc
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._docs), "bytes": self._bytes, "max_bytes": self.max_bytes, "ttl_s": self.ttl_s, **self.stats}
+
+DOC_CACHE = DocCache()
+
+def doc_cache_stats() -> Dict[str, Any]:
+    return DOC_CACHE.report()
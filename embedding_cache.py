@@ -0,0 +1,136 @@
+# Persistent, content-addressed embedding cache shared by the RAG index builder, the MCP server and the
+# RAG evaluation scripts. Vectors live in one memory-mapped float32 matrix per model; a small SQLite index maps
+# sha256(model, kind, normalized text) -> row. Only texts never seen before reach the model.
+from __future__ import annotations
+import os, re, hashlib, sqlite3, threading, unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join("data", "embedding_cache"))
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1") != "0"
+_SQL_BATCH = 500
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+def text_key(model: str, kind: str, text: str) -> str:
+    """`kind` separates document and query embeddings (some models embed them differently)."""
+    return hashlib.sha256(f"{model}\0{kind}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingStore:
+    """Append-only float32 matrix (vectors.f32) + key -> row index (keys.sqlite) for one model."""
+    def __init__(self, model_name: str, root: str = EMBED_CACHE_DIR):
+        self.dir = os.path.join(root, re.sub(r"[^\w.-]+", "_", model_name))
+        os.makedirs(self.dir, exist_ok=True)
+        self.path = os.path.join(self.dir, "vectors.f32")
+        self._lock = threading.Lock()
+        # WAL + BEGIN IMMEDIATE below: several processes may append concurrently.
+        self._db = sqlite3.connect(os.path.join(self.dir, "keys.sqlite"), check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, row INTEGER NOT NULL) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);"
+        )
+        row = self._db.execute("SELECT v FROM meta WHERE k = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+        self._mm: Optional[np.memmap] = None
+
+    def _matrix(self, need_rows: int) -> np.memmap:
+        if self._mm is None or self._mm.shape[0] < need_rows:
+            rows = os.path.getsize(self.path) // (4 * self.dim)
+            self._mm = np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._mm
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = list(keys)
+        if not keys or self.dim is None:
+            return {}
+        found: Dict[str, int] = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                part = keys[i:i + _SQL_BATCH]
+                q = f"SELECT key, row FROM keys WHERE key IN ({', '.join('?' * len(part))})"
+                found.update(self._db.execute(q, part).fetchall())
+            if not found:
+                return {}
+            mm = self._matrix(max(found.values()) + 1)
+            return {k: np.array(mm[r]) for k, r in found.items()}
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None:
+                    self.dim = int(vectors.shape[1])
+                    self._db.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (str(self.dim),))
+                elif vectors.shape[1] != self.dim:
+                    raise ValueError(f"Embedding dim {vectors.shape[1]} != cached dim {self.dim} in {self.dir}.")
+                start = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM keys").fetchone()[0]
+                with open(self.path, "r+b" if os.path.exists(self.path) else "w+b") as f:
+                    f.seek(start * 4 * self.dim)
+                    f.write(vectors.tobytes())
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO keys VALUES (?, ?)", [(k, start + i) for i, k in enumerate(keys)]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def rows(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._mm = None
+            self._db.close()
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper: looks every text up in an EmbeddingStore and embeds only the misses, in one batch."""
+    def __init__(self, inner: Embeddings, model_name: str, root: str = EMBED_CACHE_DIR,
+                 query_batch: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        self.inner = inner
+        self.model_name = model_name
+        self.query_batch = query_batch  # embeds many queries in one pass; default: inner.embed_query per text
+        self.store = EmbeddingStore(model_name, root)
+        self._stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _embed(self, texts: List[str], kind: str, compute: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        keys = [text_key(self.model_name, kind, t) for t in texts]
+        found = self.store.get_many(set(keys))
+        todo: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in todo:
+                todo[k] = t
+        if todo:
+            vectors = np.asarray(compute(list(todo.values())), dtype=np.float32)
+            self.store.put_many(list(todo), vectors)
+            found.update(zip(todo, vectors))
+        with self._stats_lock:
+            self.stats["misses"] += len(todo)
+            self.stats["hits"] += len(keys) - len(todo)
+        return [found[k].tolist() for k in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts), "doc", self.inner.embed_documents)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts), "query", self.query_batch or (lambda ts: [self.inner.embed_query(t) for t in ts]))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def report(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            st = dict(self.stats)
+        total = st["hits"] + st["misses"]
+        return {
+            "model": self.model_name, "dir": self.store.dir, "rows": self.store.rows(), "dim": self.store.dim,
+            **st, "hit_ratio": round(st["hits"] / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,122 @@
+# Fast in-process main-content extraction for `fetch` (lxml + readability-style density scoring).
+# readabilipy's use_readability=True path spawns a Node.js process per page; this tier runs in ~ms and
+# returns a quality score so the caller only falls back to Node Readability when the heuristics are unsure.
+# https://github.com/mozilla/readability (scoring ideas)  https://lxml.de/lxmlhtml.html
+from __future__ import annotations
+import os, re
+from typing import Optional, Tuple
+import lxml.html
+from lxml import etree
+
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "tiered")  # tiered | fast | readability
+EXTRACT_MIN_SCORE = float(os.getenv("EXTRACT_MIN_SCORE", "0.6"))  # see the corpus sweep in README (bench_extract.py)
+
+DROP_TAGS = ("script", "style", "noscript", "template", "iframe", "svg", "canvas", "form", "button", "input", "select", "nav", "aside", "footer")
+BOILERPLATE = re.compile(
+    r"comment|footer|sidebar|side-bar|\bnav|menu|cookie|consent|share|social|banner|\bad[s-]|advert|promo|related|"
+    r"subscribe|newsletter|breadcrumb|popup|modal|masthead|skip-link|pagination",
+    re.IGNORECASE,
+)
+POSITIVE = re.compile(r"article|body|content|entry|main|post|story|text|blog", re.IGNORECASE)
+BLOCKS = ("p", "pre", "td", "li", "blockquote", "h2", "h3", "dd")
+
+def _text(el: etree._Element) -> str:
+    return " ".join(el.text_content().split())
+
+def _link_density(el: etree._Element, text_len: int) -> float:
+    if not text_len:
+        return 1.0
+    links = sum(len(" ".join(a.text_content().split())) for a in el.iter("a"))
+    return min(links / text_len, 1.0)
+
+def _class_weight(el: etree._Element) -> float:
+    attrs = f"{el.get('class', '')} {el.get('id', '')}"
+    w = 0.0
+    if POSITIVE.search(attrs):
+        w += 25
+    if BOILERPLATE.search(attrs):
+        w -= 25
+    return w
+
+def _clean(root: etree._Element) -> None:
+    etree.strip_elements(root, etree.Comment, *DROP_TAGS, with_tail=False)
+    for el in list(root.iter("header", "div", "section", "ul", "span", "p")):
+        attrs = f"{el.get('class', '')} {el.get('id', '')} {el.get('role', '')}"
+        if el.getparent() is not None and BOILERPLATE.search(attrs) and not POSITIVE.search(el.get("id", "")):
+            el.drop_tree()
+
+def fast_extract(html: str) -> Tuple[str, float]:
+    """
+    Return (main-content HTML, quality score in [0, 1]). The score combines text length,
+    paragraph count, link density and how dominant the chosen node is within the page text.
+    """
+    try:
+        root = lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return "", 0.0
+    _clean(root)
+    body = root.find("body")
+    if body is None:
+        body = root
+    page_len = len(_text(body))
+    if page_len == 0:
+        return "", 0.0
+
+    scores = {}
+    for block in body.iter(*BLOCKS):
+        text = _text(block)
+        if len(text) < 25:
+            continue
+        points = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = block.getparent()
+        for el, share in ((parent, 1.0), (parent.getparent() if parent is not None else None, 0.5)):
+            if el is None or not isinstance(el.tag, str):
+                continue
+            if el not in scores:
+                scores[el] = _class_weight(el) + (10 if el.tag in ("article", "main") else 0)
+            scores[el] += points * share
+
+    best: Optional[etree._Element] = None
+    best_score = 0.0
+    for el, s in scores.items():
+        s *= 1 - _link_density(el, len(_text(el)))
+        if s > best_score:
+            best, best_score = el, s
+    if best is None:
+        best = body
+    # Readability-style sibling pass: content split across adjacent containers under one parent.
+    parent = best.getparent()
+    if parent is not None and best is not body:
+        threshold = max(10.0, best_score * 0.2)
+        keep = [sib for sib in parent if sib is best or scores.get(sib, 0.0) >= threshold]
+        if len(keep) > 1:
+            wrapper = etree.Element("div")
+            for sib in keep:
+                wrapper.append(sib)
+            best = wrapper
+
+    text_len = len(_text(best))
+    paragraphs = sum(1 for p in best.iter("p", "pre", "li") if len(_text(p)) >= 40)
+    density = _link_density(best, text_len)
+    coverage = min(text_len / page_len, 1.0)
+    score = (
+        0.35 * min(text_len / 1500, 1.0)
+        + 0.25 * min(paragraphs / 5, 1.0)
+        + 0.25 * (1 - density)
+        + 0.15 * (1.0 if 0.2 <= coverage else coverage / 0.2)
+    )
+    return lxml.html.tostring(best, encoding="unicode"), round(score, 4)
+
+def readability_extract(html: str) -> str:
+    from readabilipy.simple_json import simple_json_from_html_string
+    data = simple_json_from_html_string(html, use_readability=True)
+    return (data or {}).get("content") or ""
+
+def extract_main_html(html: str, mode: str = EXTRACT_MODE, min_score: float = EXTRACT_MIN_SCORE) -> Tuple[str, str, float]:
+    """Return (content HTML, tier used, fast-tier score). Tiered mode only calls Node Readability below `min_score`."""
+    if mode == "readability":
+        return readability_extract(html), "readability", 0.0
+    content, score = fast_extract(html)
+    if mode == "fast" or (content and score >= min_score):
+        return content, "fast", score
+    return readability_extract(html) or content, "readability", score
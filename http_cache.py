@@ -0,0 +1,201 @@
+# Disk-backed HTTP cache for `fetch`: SQLite store keyed by canonical URL (url_canon.clean_url) holding body, content type,
+# ETag and Last-Modified. Fresh entries are served without I/O, stale ones are revalidated with a
+# conditional GET (304 -> reuse), and on network/5xx errors a stale copy is served for a grace period.
+# https://www.rfc-editor.org/rfc/rfc9111  https://www.rfc-editor.org/rfc/rfc5861 (stale-if-error)
+from __future__ import annotations
+import os, re, time, sqlite3, asyncio, threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+import httpx
+from http_client import read_text_capped
+from url_canon import clean_url
+
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join("data", "http_cache", "http_cache.db"))
+HTTP_CACHE_MAX_AGE_S = float(os.getenv("HTTP_CACHE_MAX_AGE_S", "3600"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+HTTP_CACHE_STALE_IF_ERROR_S = float(os.getenv("HTTP_CACHE_STALE_IF_ERROR_S", str(7 * 24 * 3600)))
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") != "0"
+
+DDL = """
+CREATE TABLE IF NOT EXISTS http_cache (
+  url TEXT PRIMARY KEY,
+  body TEXT NOT NULL,
+  content_type TEXT,
+  etag TEXT,
+  last_modified TEXT,
+  fetched_at REAL NOT NULL,
+  expires_at REAL NOT NULL,
+  last_access REAL NOT NULL,
+  size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_http_cache_last_access ON http_cache(last_access);
+"""
+
+def _lifetime(headers: httpx.Headers, default_s: float) -> Optional[float]:
+    """Freshness lifetime from Cache-Control; None means the response must not be stored."""
+    cc = headers.get("cache-control", "").lower()
+    if "no-store" in cc:
+        return None
+    if "no-cache" in cc:
+        return 0.0
+    m = re.search(r"max-age\s*=\s*(\d+)", cc)
+    return float(m.group(1)) if m else default_s
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: str
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def stale_usable(self) -> bool:
+        return time.time() < self.expires_at + HTTP_CACHE_STALE_IF_ERROR_S
+
+    def conditional_headers(self) -> Dict[str, str]:
+        h = {}
+        if self.etag:
+            h["If-None-Match"] = self.etag
+        if self.last_modified:
+            h["If-Modified-Since"] = self.last_modified
+        return h
+
+class HttpCache:
+    """SQLite-backed URL cache with a byte cap enforced by evicting least-recently-used entries."""
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_bytes: int = HTTP_CACHE_MAX_BYTES, max_age_s: float = HTTP_CACHE_MAX_AGE_S):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stale_served": 0, "stores": 0, "truncated_skipped": 0, "evictions": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # WAL + busy_timeout: the MCP server and api.py may share the file.
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(DDL)
+            self._conn = conn
+        return self._conn
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT url, body, content_type, etag, last_modified, fetched_at, expires_at FROM http_cache WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE http_cache SET last_access = ? WHERE url = ?", (time.time(), url))
+            return CacheEntry(*row)
+
+    def put(self, url: str, body: str, content_type: str, headers: httpx.Headers) -> None:
+        lifetime = _lifetime(headers, self.max_age_s)
+        size = len(body.encode("utf-8", "replace"))
+        if lifetime is None or size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body, content_type, headers.get("etag"), headers.get("last-modified"), now, now + lifetime, now, size),
+            )
+            self.stats["stores"] += 1
+            self._evict(db)
+
+    def touch(self, entry: CacheEntry, headers: httpx.Headers) -> None:
+        """Record a 304: keep the body, refresh validators and expiry."""
+        lifetime = _lifetime(headers, self.max_age_s) or 0.0
+        now = time.time()
+        entry.expires_at = now + lifetime
+        entry.etag = headers.get("etag") or entry.etag
+        entry.last_modified = headers.get("last-modified") or entry.last_modified
+        with self._lock:
+            self._db().execute(
+                "UPDATE http_cache SET etag = ?, last_modified = ?, expires_at = ?, last_access = ? WHERE url = ?",
+                (entry.etag, entry.last_modified, entry.expires_at, now, entry.url),
+            )
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in db.execute("SELECT url, size FROM http_cache ORDER BY last_access").fetchall():
+            db.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+            self.stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM http_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            n, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache").fetchone()
+        return {"enabled": HTTP_CACHE_ENABLED, "path": self.path, "entries": n, "bytes": size, "max_bytes": self.max_bytes, **self.stats}
+
+HTTP_CACHE = HttpCache()
+
+async def cached_get(
+    client: httpx.AsyncClient,
+    url: str,
+    cache: Optional[HttpCache] = None,
+    **kwargs: Any,
+) -> Tuple[str, str, str]:
+    """
+    GET `url` through the cache and return (text, content_type, cache_status),
+    cache_status being one of hit / revalidated / miss / stale. Raises like `client.get` when nothing usable is cached.
+    Bodies are streamed and capped at FETCH_MAX_BYTES (see http_client.read_text_capped); a truncated body is
+    returned but never stored, so a later hit or revalidation cannot serve a cut-off page as complete.
+    """
+    cache = cache or HTTP_CACHE
+    key = clean_url(url)
+    entry = await asyncio.to_thread(cache.get, key)
+    if entry is not None and entry.fresh:
+        cache.stats["hits"] += 1
+        return entry.body, entry.content_type, "hit"
+    headers = {**kwargs.pop("headers", {}), **(entry.conditional_headers() if entry else {})}
+    try:
+        async with client.stream("GET", url, headers=headers, **kwargs) as r:
+            if r.status_code == 304 and entry is not None:
+                await asyncio.to_thread(cache.touch, entry, r.headers)
+                cache.stats["revalidated"] += 1
+                return entry.body, entry.content_type, "revalidated"
+            r.raise_for_status()
+            text, truncated = await read_text_capped(r)
+    except (httpx.TransportError, httpx.HTTPStatusError) as e:
+        server_error = isinstance(e, httpx.HTTPStatusError) and e.response.status_code >= 500
+        if entry is not None and entry.stale_usable and (server_error or isinstance(e, httpx.TransportError)):
+            cache.stats["stale_served"] += 1
+            return entry.body, entry.content_type, "stale"
+        raise
+    cache.stats["misses"] += 1
+    ctype = r.headers.get("content-type", "")
+    if truncated:
+        cache.stats["truncated_skipped"] += 1
+    else:
+        await asyncio.to_thread(cache.put, key, text, ctype, r.headers)
+    return text, ctype, "miss"
+
+def http_cache_stats() -> Dict[str, Any]:
+    return HTTP_CACHE.report()
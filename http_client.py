@@ -0,0 +1,329 @@
+# Process-wide pooled HTTP clients for fetch / web_search: keep-alive, HTTP/2 (when `h2` is installed),
+# per-host concurrency limits, a small DNS cache and connection-reuse stats.
+# https://www.python-httpx.org/advanced/transports/  https://www.encode.io/httpcore/network-backends/
+from __future__ import annotations
+import os, time, codecs, socket, asyncio, threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import httpx
+import httpcore
+
+DEFAULT_UA = "FastMCP/1.0 (+https://example.com)"
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "5"))
+HTTP_READ_TIMEOUT_S = float(os.getenv("HTTP_READ_TIMEOUT_S", "20"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "60"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+DNS_CACHE_TTL_S = float(os.getenv("DNS_CACHE_TTL_S", "300"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+# Bodies fetch can turn into text; anything else (PDF, images, archives, video) is refused from the headers.
+TEXT_TYPES = ("text/", "application/xhtml+xml", "application/xml", "application/json", "application/ld+json",
+              "application/rss+xml", "application/atom+xml", "application/javascript")
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+TIMEOUT = httpx.Timeout(HTTP_READ_TIMEOUT_S, connect=HTTP_CONNECT_TIMEOUT_S)
+LIMITS = httpx.Limits(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+)
+
+_stats_lock = threading.Lock()
+STATS: Dict[str, int] = {
+    "requests": 0, "connections_opened": 0, "dns_hits": 0, "dns_misses": 0,
+    "bytes_read": 0, "truncated": 0, "rejected_content_type": 0,
+}
+
+def _count(key: str, n: int = 1) -> None:
+    with _stats_lock:
+        STATS[key] += n
+
+class DNSCache:
+    """host:port -> resolved addresses, kept for `ttl_s` seconds."""
+    def __init__(self, ttl_s: float = DNS_CACHE_TTL_S):
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+
+    def get(self, host: str, port: int) -> Optional[List[str]]:
+        with self._lock:
+            hit = self._entries.get((host, port))
+        if hit and time.monotonic() - hit[0] < self.ttl_s:
+            _count("dns_hits")
+            return hit[1]
+        _count("dns_misses")
+        return None
+
+    def put(self, host: str, port: int, infos: List[Any]) -> List[str]:
+        addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._entries[(host, port)] = (time.monotonic(), addrs)
+        return addrs
+
+DNS = DNSCache()
+
+def _is_ip(host: str) -> bool:
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except OSError:
+            pass
+    return False
+
+class CachingAsyncBackend(httpcore.AsyncNetworkBackend):
+    """AnyIO backend that resolves hostnames through `DNS` and counts new TCP connections."""
+    def __init__(self):
+        self._inner = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None, local_address: Optional[str] = None, socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        addrs = [host] if _is_ip(host) else DNS.get(host, port)
+        if addrs is None:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            addrs = DNS.put(host, port, infos)
+        err: Optional[Exception] = None
+        for addr in addrs:
+            try:
+                stream = await self._inner.connect_tcp(addr, port, timeout=timeout, local_address=local_address, socket_options=socket_options)
+                _count("connections_opened")
+                return stream
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                err = e
+        raise err or httpcore.ConnectError(f"Could not resolve {host}")
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        return await self._inner.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._inner.sleep(seconds)
+
+class CachingSyncBackend(httpcore.NetworkBackend):
+    """Blocking counterpart of CachingAsyncBackend, for the sync client used by web_search."""
+    def __init__(self):
+        self._inner = httpcore.SyncBackend()
+
+    def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None, local_address: Optional[str] = None, socket_options: Any = None) -> httpcore.NetworkStream:
+        addrs = [host] if _is_ip(host) else DNS.get(host, port)
+        if addrs is None:
+            addrs = DNS.put(host, port, socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+        err: Optional[Exception] = None
+        for addr in addrs:
+            try:
+                stream = self._inner.connect_tcp(addr, port, timeout=timeout, local_address=local_address, socket_options=socket_options)
+                _count("connections_opened")
+                return stream
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                err = e
+        raise err or httpcore.ConnectError(f"Could not resolve {host}")
+
+    def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options: Any = None) -> httpcore.NetworkStream:
+        return self._inner.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    def sleep(self, seconds: float) -> None:
+        self._inner.sleep(seconds)
+
+def _pool_kwargs() -> Dict[str, Any]:
+    return dict(
+        ssl_context=httpx.create_ssl_context(),
+        max_connections=LIMITS.max_connections,
+        max_keepalive_connections=LIMITS.max_keepalive_connections,
+        keepalive_expiry=LIMITS.keepalive_expiry,
+        http1=True,
+        http2=HTTP2,
+        retries=1,
+    )
+
+# httpcore -> httpx exceptions (callers catch httpx.TransportError); the most specific class in the MRO wins.
+_EXC_MAP = {
+    httpcore.TimeoutException: httpx.TimeoutException, httpcore.ConnectTimeout: httpx.ConnectTimeout,
+    httpcore.ReadTimeout: httpx.ReadTimeout, httpcore.WriteTimeout: httpx.WriteTimeout, httpcore.PoolTimeout: httpx.PoolTimeout,
+    httpcore.NetworkError: httpx.NetworkError, httpcore.ConnectError: httpx.ConnectError, httpcore.ReadError: httpx.ReadError,
+    httpcore.WriteError: httpx.WriteError, httpcore.ProxyError: httpx.ProxyError, httpcore.UnsupportedProtocol: httpx.UnsupportedProtocol,
+    httpcore.ProtocolError: httpx.ProtocolError, httpcore.LocalProtocolError: httpx.LocalProtocolError,
+    httpcore.RemoteProtocolError: httpx.RemoteProtocolError,
+}
+
+@contextmanager
+def _mapped_errors() -> Iterator[None]:
+    try:
+        yield
+    except Exception as exc:
+        for cls in type(exc).__mro__:
+            if cls in _EXC_MAP:
+                raise _EXC_MAP[cls](str(exc)) from exc
+        raise
+
+def _core_request(request: httpx.Request) -> httpcore.Request:
+    url = httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host, port=request.url.port, target=request.url.raw_path)
+    return httpcore.Request(method=request.method, url=url, headers=request.headers.raw, content=request.stream, extensions=request.extensions)
+
+class _SyncBody(httpx.SyncByteStream):
+    def __init__(self, stream: Any):
+        self._stream = stream
+
+    def __iter__(self) -> Iterator[bytes]:
+        with _mapped_errors():
+            for part in self._stream:
+                yield part
+
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+class _AsyncBody(httpx.AsyncByteStream):
+    def __init__(self, stream: Any):
+        self._stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with _mapped_errors():
+            async for part in self._stream:
+                yield part
+
+    async def aclose(self) -> None:
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+class PooledAsyncTransport(httpx.AsyncBaseTransport):
+    """Minimal httpx transport over our own httpcore pool (DNS-caching backend), using only public httpx/httpcore API."""
+    def __init__(self):
+        self.pool = httpcore.AsyncConnectionPool(network_backend=CachingAsyncBackend(), **_pool_kwargs())
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with _mapped_errors():
+            resp = await self.pool.handle_async_request(_core_request(request))
+        return httpx.Response(status_code=resp.status, headers=resp.headers, stream=_AsyncBody(resp.stream), extensions=resp.extensions)
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+
+class PooledSyncTransport(httpx.BaseTransport):
+    """Blocking counterpart of PooledAsyncTransport."""
+    def __init__(self):
+        self.pool = httpcore.ConnectionPool(network_backend=CachingSyncBackend(), **_pool_kwargs())
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with _mapped_errors():
+            resp = self.pool.handle_request(_core_request(request))
+        return httpx.Response(status_code=resp.status, headers=resp.headers, stream=_SyncBody(resp.stream), extensions=resp.extensions)
+
+    def close(self) -> None:
+        self.pool.close()
+
+async def _on_request(request: httpx.Request) -> None:
+    _count("requests")
+
+def _on_request_sync(request: httpx.Request) -> None:
+    _count("requests")
+
+_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
+_sync_lock = threading.Lock()
+_host_limits: Dict[str, List[Any]] = {}  # host -> [semaphore, users]; dropped when its last user leaves
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared async client (idempotent). Called at MCP server startup."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            transport=PooledAsyncTransport(),
+            follow_redirects=True,
+            headers={"User-Agent": DEFAULT_UA},
+            timeout=TIMEOUT,
+            event_hooks={"request": [_on_request]},
+        )
+    return _client
+
+async def get_http_client() -> httpx.AsyncClient:
+    return _client if _client is not None and not _client.is_closed else await start_http_client()
+
+def get_sync_http_client() -> httpx.Client:
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(
+                transport=PooledSyncTransport(),
+                follow_redirects=True,
+                headers={"User-Agent": DEFAULT_UA},
+                timeout=TIMEOUT,
+                event_hooks={"request": [_on_request_sync]},
+            )
+        return _sync_client
+
+async def close_http_client() -> None:
+    """Close both shared clients. Called on MCP server shutdown."""
+    global _client, _sync_client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+@asynccontextmanager
+async def host_slot(url: str) -> AsyncIterator[None]:
+    """Limit concurrent requests to one host to HTTP_PER_HOST_LIMIT. Only hosts with requests in flight are tracked."""
+    host = httpx.URL(url).host
+    slot = _host_limits.get(host)
+    if slot is None:
+        slot = _host_limits[host] = [asyncio.Semaphore(HTTP_PER_HOST_LIMIT), 0]
+    slot[1] += 1
+    try:
+        async with slot[0]:
+            yield
+    finally:
+        slot[1] -= 1
+        if not slot[1] and _host_limits.get(host) is slot:
+            del _host_limits[host]
+
+class UnsupportedContent(Exception):
+    """Response refused from its headers (non-text Content-Type)."""
+
+def check_content_type(content_type: str) -> None:
+    ctype = content_type.split(";", 1)[0].strip().lower()
+    if ctype and not ctype.startswith(TEXT_TYPES):
+        _count("rejected_content_type")
+        raise UnsupportedContent(f"Unsupported content type {ctype!r}.")
+
+async def read_text_capped(response: httpx.Response, max_bytes: int = FETCH_MAX_BYTES) -> Tuple[str, bool]:
+    """
+    Stream a response opened with `client.stream(...)` and decode it incrementally, stopping after `max_bytes`.
+    Returns (text, truncated). Raises UnsupportedContent before reading the body for non-text types.
+    """
+    check_content_type(response.headers.get("content-type", ""))
+    try:
+        decoder = codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    declared = response.headers.get("content-length")
+    truncated = bool(declared and declared.isdigit() and int(declared) > max_bytes)
+    parts: List[str] = []
+    read = 0
+    async for chunk in response.aiter_bytes():
+        if read + len(chunk) > max_bytes:
+            parts.append(decoder.decode(chunk[: max_bytes - read]))
+            read = max_bytes
+            truncated = True
+            break
+        parts.append(decoder.decode(chunk))
+        read += len(chunk)
+    parts.append(decoder.decode(b"", final=True))
+    _count("bytes_read", read)
+    if truncated:
+        _count("truncated")
+    return "".join(parts), truncated
+
+def http_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        st = dict(STATS)
+    st["http2"] = HTTP2
+    st["hosts_in_flight"] = len(_host_limits)
+    st["reused_requests"] = max(st["requests"] - st["connections_opened"], 0)
+    st["reuse_ratio"] = round(st["reused_requests"] / st["requests"], 4) if st["requests"] else 0.0
+    return st
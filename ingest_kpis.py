@@ -0,0 +1,136 @@
+# Bulk CSV -> SQLite loader for `monthly_kpis`.
+# usage: python ingest_kpis.py data/company_data/monthly_kpis_2015_2025.csv [next_drop.csv ...]
+# The live DB is opened immutable by sql_tools, so it is never written in place: the loader works on a copy
+# and swaps it in with os.replace. Running servers see the new file fingerprint and recycle their connections.
+from __future__ import annotations
+import os, sqlite3, time
+from typing import Any, Dict, List, Sequence
+import click
+import pandas as pd
+from sql_tools import DB_FILE
+
+TABLE = "monthly_kpis"
+COLUMNS = {
+    "month": "TEXT",
+    "active_customers": "INTEGER",
+    "new_customers": "INTEGER",
+    "churned_customers": "INTEGER",
+    "arpu": "REAL",
+    "mrr": "REAL",
+    "payment_fees": "REAL",
+    "infra_cost": "REAL",
+    "support_cost": "REAL",
+    "total_variable_cost": "REAL",
+    "contribution_margin_pct": "REAL",
+    "cost_to_serve": "REAL",
+    "acquisition_rate_ratio": "REAL",
+}
+BATCH_SIZE = 5000
+# Stored values are rounded (USD to 2 dp, ratios to 4 dp), so derived columns are compared with a tolerance.
+TOLERANCES = {"total_variable_cost": 0.05, "contribution_margin_pct": 0.0006, "cost_to_serve": 0.011}
+
+def read_csvs(paths: Sequence[str]) -> pd.DataFrame:
+    frames = [pd.read_csv(p, dtype={"month": str}) for p in paths]
+    df = pd.concat(frames, ignore_index=True)
+    missing = [c for c in COLUMNS if c not in df.columns]
+    if missing:
+        raise click.ClickException(f"Missing columns: {', '.join(missing)}")
+    df = df[list(COLUMNS)]
+    df["month"] = pd.to_datetime(df["month"], format="%Y-%m-%d").dt.strftime("%Y-%m-01")
+    return df.drop_duplicates("month", keep="last").sort_values("month").reset_index(drop=True)
+
+def validate(df: pd.DataFrame) -> Dict[str, List[str]]:
+    """Vectorized checks of the derived columns and sanity ranges; returns {check: [bad months]}."""
+    tvc = df["payment_fees"] + df["infra_cost"] + df["support_cost"]
+    checks = {
+        "total_variable_cost": (df["total_variable_cost"] - tvc).abs() > TOLERANCES["total_variable_cost"],
+        "contribution_margin_pct": (
+            (df["contribution_margin_pct"] - (df["mrr"] - df["total_variable_cost"]) / df["mrr"]).abs()
+            > TOLERANCES["contribution_margin_pct"]
+        ),
+        "cost_to_serve": (
+            (df["cost_to_serve"] - df["total_variable_cost"] / df["active_customers"]).abs()
+            > TOLERANCES["cost_to_serve"]
+        ),
+        "non_negative": (df[list(COLUMNS)[1:]] < 0).any(axis=1),
+        "nulls": df.isna().any(axis=1),
+    }
+    return {name: df.loc[bad.fillna(True), "month"].tolist() for name, bad in checks.items() if bad.fillna(True).any()}
+
+def _copy_db(src: str, dst: str) -> None:
+    if os.path.exists(dst):
+        os.remove(dst)
+    out = sqlite3.connect(dst)
+    if os.path.exists(src):
+        con = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+        try:
+            con.backup(out)
+        finally:
+            con.close()
+    out.close()
+
+def ingest(paths: Sequence[str], db_path: str = DB_FILE, allow_invalid: bool = False) -> Dict[str, Any]:
+    """Append months that are not yet in `monthly_kpis`, then index, ANALYZE and atomically replace the DB file."""
+    t0 = time.time()
+    df = read_csvs(paths)
+    problems = validate(df)
+    if problems:
+        if not allow_invalid:
+            raise click.ClickException(f"Validation failed: {problems}")
+        bad = {m for months in problems.values() for m in months}
+        df = df[~df["month"].isin(bad)]
+
+    tmp = f"{db_path}.ingest"
+    _copy_db(db_path, tmp)
+    con = sqlite3.connect(tmp)
+    try:
+        cols_sql = ",\n  ".join(f'"{c}" {t}' for c, t in COLUMNS.items())
+        con.execute(f'CREATE TABLE IF NOT EXISTS "{TABLE}" (\n  {cols_sql}\n)')
+        existing = {r[0] for r in con.execute(f'SELECT month FROM "{TABLE}"')}
+        had_index = con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (f"idx_{TABLE}_month",)
+        ).fetchone() is not None
+        new = df[~df["month"].isin(existing)]
+        rows = list(new.astype(object).itertuples(index=False, name=None))
+        placeholders = ", ".join("?" * len(COLUMNS))
+        with con:
+            for i in range(0, len(rows), BATCH_SIZE):
+                con.executemany(f'INSERT INTO "{TABLE}" ({", ".join(COLUMNS)}) VALUES ({placeholders})', rows[i:i + BATCH_SIZE])
+            con.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{TABLE}_month ON "{TABLE}"(month)')
+        con.execute("ANALYZE")
+        total = con.execute(f'SELECT COUNT(*), MIN(month), MAX(month) FROM "{TABLE}"').fetchone()
+    finally:
+        con.close()
+
+    if rows or not had_index or not os.path.exists(db_path):
+        os.replace(tmp, db_path)
+        replaced = True
+    else:
+        os.remove(tmp)
+        replaced = False
+    return {
+        "ok": True,
+        "inserted": len(rows),
+        "skipped_existing": len(df) - len(rows),
+        "dropped_invalid": sorted({m for ms in problems.values() for m in ms}),
+        "rows_total": total[0],
+        "coverage": [total[1], total[2]],
+        "replaced": replaced,
+        "duration_ms": int((time.time() - t0) * 1000),
+    }
+
+@click.command()
+@click.argument("csv_paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--db", "db_path", default=DB_FILE, show_default=True, help="Target SQLite file.")
+@click.option("--allow-invalid", is_flag=True, help="Drop rows that fail validation instead of aborting.")
+@click.option("--rollups/--no-rollups", default=True, help="Rebuild the kpi_slice rollups afterwards.")
+def main(csv_paths, db_path, allow_invalid, rollups):
+    """Load monthly KPI CSV drops into monthly_kpis (new months only)."""
+    result = ingest(csv_paths, db_path=os.path.abspath(db_path), allow_invalid=allow_invalid)
+    click.echo(result)
+    if rollups and result["replaced"] and os.path.abspath(db_path) == DB_FILE:
+        from kpi_rollups import build_rollups
+        click.echo(build_rollups())
+
+if __name__ == "__main__":
+    main()
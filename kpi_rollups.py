@@ -0,0 +1,235 @@
+# Precomputed KPI rollups (monthly / quarterly / yearly) served by the `kpi_slice` MCP tool.
+# The source DB is opened read-only + immutable, so rollups live in a side DB next to it.
+from __future__ import annotations
+import os, re, json, sqlite3, threading
+from typing import Any, Dict, List, Optional, Tuple
+from sql_tools import POOL, CATALOG, ConnectionPool, db_fingerprint, DB_FILE
+
+ROLLUP_PATH = os.getenv("KPI_ROLLUP_DB_PATH", os.path.join(os.path.dirname(DB_FILE), "kpi_rollups.db"))
+SOURCE_TABLE = "monthly_kpis"
+GRAINS = ("month", "quarter", "year")
+KPIS = (
+    "active_customers", "new_customers", "churned_customers", "arpu", "mrr", "payment_fees", "infra_cost",
+    "support_cost", "total_variable_cost", "contribution_margin_pct", "cost_to_serve", "acquisition_rate_ratio",
+)
+# Flow counts add up over a period; every other KPI is a level/ratio and is averaged.
+SUM_KPIS = {"new_customers", "churned_customers"}
+YOY_LAG = {"month": 12, "quarter": 4, "year": 1}
+
+ROLLUP_DDL = """
+CREATE TABLE kpi_rollups (
+  kpi TEXT NOT NULL,
+  grain TEXT NOT NULL,
+  period_start TEXT NOT NULL,
+  period TEXT NOT NULL,
+  period_end TEXT NOT NULL,
+  n_months INTEGER NOT NULL,
+  value REAL,
+  avg REAL,
+  sum REAL,
+  min REAL,
+  max REAL,
+  first REAL,
+  last REAL,
+  rolling_3 REAL,
+  rolling_12 REAL,
+  delta_pop REAL,
+  delta_pop_pct REAL,
+  delta_yoy REAL,
+  delta_yoy_pct REAL,
+  PRIMARY KEY (kpi, grain, period_start)
+) WITHOUT ROWID;
+CREATE TABLE rollup_meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_lock = threading.Lock()
+_checked_for: Optional[Tuple[str, int, int]] = None
+_pool_lock = threading.Lock()
+_pool_opened_for: Optional[Tuple[int, int, int]] = None
+
+def _period(month: str, grain: str) -> Tuple[str, str]:
+    """Return (period label, period_start) for a 'YYYY-MM-01' month."""
+    y, m = int(month[:4]), int(month[5:7])
+    if grain == "month":
+        return month[:7], month
+    if grain == "quarter":
+        q = (m - 1) // 3 + 1
+        return f"{y}-Q{q}", f"{y}-{3 * (q - 1) + 1:02d}-01"
+    return str(y), f"{y}-01-01"
+
+def _delta(cur: Optional[float], prev: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+    if cur is None or prev is None:
+        return None, None
+    return cur - prev, ((cur - prev) / prev if prev else None)
+
+def compute_rollups(months: List[str], series: Dict[str, List[Optional[float]]]) -> List[Tuple]:
+    """Turn monthly column series into kpi_rollups rows (one per kpi x grain x period)."""
+    out: List[Tuple] = []
+    for kpi, values in series.items():
+        for grain in GRAINS:
+            buckets: Dict[str, Dict[str, Any]] = {}
+            for month, v in zip(months, values):
+                label, start = _period(month, grain)
+                b = buckets.setdefault(start, {"period": label, "end": month, "vals": []})
+                b["end"] = month
+                if v is not None:
+                    b["vals"].append(float(v))
+            starts = sorted(buckets)
+            agg: List[Optional[float]] = []
+            for i, start in enumerate(starts):
+                vals = buckets[start]["vals"]
+                avg = sum(vals) / len(vals) if vals else None
+                total = sum(vals) if vals else None
+                value = total if kpi in SUM_KPIS else avg
+                agg.append(value)
+                roll3 = roll12 = None
+                if grain == "month":
+                    w3 = [x for x in agg[-3:] if x is not None]
+                    w12 = [x for x in agg[-12:] if x is not None]
+                    roll3 = sum(w3) / len(w3) if len(w3) == 3 else None
+                    roll12 = sum(w12) / len(w12) if len(w12) == 12 else None
+                d_pop, d_pop_pct = _delta(value, agg[i - 1] if i >= 1 else None)
+                lag = YOY_LAG[grain]
+                d_yoy, d_yoy_pct = _delta(value, agg[i - lag] if i >= lag else None)
+                out.append((
+                    kpi, grain, start, buckets[start]["period"], buckets[start]["end"], len(vals),
+                    value, avg, total, min(vals) if vals else None, max(vals) if vals else None,
+                    vals[0] if vals else None, vals[-1] if vals else None,
+                    roll3, roll12, d_pop, d_pop_pct, d_yoy, d_yoy_pct,
+                ))
+    return out
+
+def build_rollups(dest: str = ROLLUP_PATH) -> Dict[str, Any]:
+    """
+    Read `monthly_kpis` through the read-only pool and (re)write the rollup DB.
+    The new file is written next to `dest` and swapped in with os.replace, so readers never see a partial build.
+    """
+    fp = db_fingerprint()
+    CATALOG.ensure()  # recycle POOL first if the source DB was swapped, so we never read the old file
+    with POOL.connection() as conn:
+        cur = conn.execute(f"SELECT month, {', '.join(KPIS)} FROM {SOURCE_TABLE} ORDER BY month")
+        raw = cur.fetchall()
+    months = [r[0] for r in raw]
+    series = {k: [r[i + 1] for r in raw] for i, k in enumerate(KPIS)}
+    rows = compute_rollups(months, series)
+
+    tmp = f"{dest}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    out = sqlite3.connect(tmp)
+    try:
+        out.executescript(ROLLUP_DDL)
+        with out:
+            out.executemany(f"INSERT INTO kpi_rollups VALUES ({', '.join('?' * 19)})", rows)
+            out.execute("INSERT INTO rollup_meta VALUES ('source_fingerprint', ?)", (json.dumps(fp[1:]),))
+        out.execute("ANALYZE")
+    finally:
+        out.close()
+    os.replace(tmp, dest)
+    return {"ok": True, "path": dest, "rows": len(rows), "months": len(months)}
+
+def _rollup_fingerprint(path: str = ROLLUP_PATH) -> Optional[List[int]]:
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM rollup_meta WHERE key='source_fingerprint'").fetchone()
+        return json.loads(row[0]) if row else None
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+def ensure_rollups() -> Dict[str, Any]:
+    """Build the rollup DB if it is missing or was built from a different version of the source DB."""
+    global _checked_for
+    fp = db_fingerprint()
+    if fp == _checked_for and os.path.exists(ROLLUP_PATH):
+        return {"ok": True, "path": ROLLUP_PATH, "rebuilt": False}
+    with _lock:
+        if _rollup_fingerprint() == list(fp[1:]):
+            out = {"ok": True, "path": ROLLUP_PATH, "rebuilt": False}
+        else:
+            out = {**build_rollups(), "rebuilt": True}
+        _checked_for = fp
+        return out
+
+def _rollup_connect() -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{os.path.abspath(ROLLUP_PATH)}?mode=ro", uri=True, check_same_thread=False)
+
+ROLLUP_POOL = ConnectionPool(size=2, connect=_rollup_connect)
+
+def _rollup_file_id() -> Tuple[int, int, int]:
+    st = os.stat(ROLLUP_PATH)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def rollup_pool() -> ConnectionPool:
+    """ROLLUP_POOL, recycled whenever the rollup file was replaced (by build_rollups here or in another process)."""
+    global _pool_opened_for
+    fid = _rollup_file_id()
+    if fid != _pool_opened_for:
+        with _pool_lock:
+            if fid != _pool_opened_for:
+                ROLLUP_POOL.reset()
+                _pool_opened_for = fid
+    return ROLLUP_POOL
+
+def _bound(value: Optional[str], grain: str, upper: bool) -> Optional[str]:
+    """Accept 'YYYY', 'YYYY-Qn', 'YYYY-MM' or 'YYYY-MM-DD' and return a period_start bound for `grain`."""
+    if not value:
+        return None
+    v = value.strip()
+    m = re.fullmatch(r"(\d{4})-?Q([1-4])", v, re.IGNORECASE)
+    if m:
+        v = f"{m.group(1)}-{3 * (int(m.group(2)) - 1) + 1:02d}-01"
+    elif re.fullmatch(r"\d{4}", v):
+        v = f"{v}-{'12' if upper else '01'}-01"
+    elif re.fullmatch(r"\d{4}-\d{2}", v):
+        v = f"{v}-01"
+    elif not re.fullmatch(r"\d{4}-\d{2}-\d{2}", v):
+        raise ValueError(f"Unrecognized period {value!r}; use YYYY, YYYY-Qn, YYYY-MM or YYYY-MM-DD.")
+    return _period(v[:7] + "-01", grain)[1]
+
+SLICE_COLS = [
+    "period", "period_start", "period_end", "n_months", "value", "avg", "sum", "min", "max", "first", "last",
+    "rolling_3", "rolling_12", "delta_pop", "delta_pop_pct", "delta_yoy", "delta_yoy_pct",
+]
+
+def kpi_slice(kpi: str, grain: str = "month", start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Answer a KPI question from the precomputed rollups with one indexed range lookup.
+    `value` is the period sum for new/churned customers and the period average for every other KPI.
+    With neither `start` nor `end`, only the latest period is returned.
+    Output is {kpi, grain, cols, rows, row_count}.
+    """
+    if kpi not in KPIS:
+        return {"ok": False, "error": "validation_failed", "details": [f"Unknown kpi {kpi!r}; expected one of {', '.join(KPIS)}."]}
+    if grain not in GRAINS:
+        return {"ok": False, "error": "validation_failed", "details": [f"Unknown grain {grain!r}; expected one of {', '.join(GRAINS)}."]}
+    try:
+        lo, hi = _bound(start, grain, upper=False), _bound(end, grain, upper=True)
+    except ValueError as e:
+        return {"ok": False, "error": "validation_failed", "details": [str(e)]}
+    sql = f"SELECT {', '.join(SLICE_COLS)} FROM kpi_rollups WHERE kpi = ? AND grain = ?"
+    args: List[Any] = [kpi, grain]
+    if lo:
+        sql += " AND period_start >= ?"
+        args.append(lo)
+    if hi:
+        sql += " AND period_start <= ?"
+        args.append(hi)
+    sql += " ORDER BY period_start" if (lo or hi) else " ORDER BY period_start DESC LIMIT 1"
+    try:
+        ensure_rollups()
+        with rollup_pool().connection() as conn:
+            rows = conn.execute(sql, args).fetchall()
+    except Exception as e:
+        return {"ok": False, "error": "execution_error", "message": str(e)}
+    return {
+        "ok": True,
+        "kpi": kpi,
+        "grain": grain,
+        "cols": SLICE_COLS,
+        "rows": [dict(zip(SLICE_COLS, r)) for r in rows],
+        "row_count": len(rows),
+    }
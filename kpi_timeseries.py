@@ -0,0 +1,215 @@
+# NumPy time-series engine over `monthly_kpis`: the table is loaded once into column arrays
+# and every tool answers with exact numbers instead of a row dump for the LLM to reason over.
+from __future__ import annotations
+import threading
+from statistics import NormalDist
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from sql_tools import POOL, CATALOG, db_fingerprint
+from kpi_rollups import KPIS, SOURCE_TABLE
+
+class KpiSeries:
+    """Column arrays of `monthly_kpis`, reloaded only when the DB file fingerprint changes."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[Tuple[str, int, int]] = None
+        self.months = np.array([], dtype="datetime64[M]")
+        self.cols: Dict[str, np.ndarray] = {}
+
+    def ensure(self) -> "KpiSeries":
+        fp = db_fingerprint()
+        if fp == self._fingerprint:
+            return self
+        with self._lock:
+            if fp != self._fingerprint:
+                CATALOG.ensure()  # recycle POOL first if the DB was swapped, so `fp` is never paired with old data
+                with POOL.connection() as conn:
+                    rows = conn.execute(f"SELECT month, {', '.join(KPIS)} FROM {SOURCE_TABLE} ORDER BY month").fetchall()
+                self.months = np.array([r[0][:7] for r in rows], dtype="datetime64[M]")
+                self.cols = {k: np.array([r[i + 1] for r in rows], dtype=np.float64) for i, k in enumerate(KPIS)}
+                self._fingerprint = fp
+        return self
+
+    def window(self, kpi: str, start: Optional[str] = None, end: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (months, values) for `kpi` between `start` and `end` (YYYY-MM or YYYY-MM-DD, inclusive)."""
+        if kpi not in KPIS:
+            raise ValueError(f"Unknown kpi {kpi!r}; expected one of {', '.join(KPIS)}.")
+        self.ensure()
+        months, values = self.months, self.cols[kpi]
+        mask = np.ones(len(months), dtype=bool)
+        if start:
+            mask &= months >= np.datetime64(start[:7], "M")
+        if end:
+            mask &= months <= np.datetime64(end[:7], "M")
+        mask &= ~np.isnan(values)
+        return months[mask], values[mask]
+
+SERIES = KpiSeries()
+
+def _ok(kpi: str, months: np.ndarray, **out: Any) -> Dict[str, Any]:
+    return {"ok": True, "kpi": kpi, "start": str(months[0]), "end": str(months[-1]), "n_months": int(len(months)), **out}
+
+def _fail(e: Exception) -> Dict[str, Any]:
+    return {"ok": False, "error": "validation_failed" if isinstance(e, ValueError) else "execution_error", "message": str(e)}
+
+def _linfit(y: np.ndarray) -> Tuple[float, float, np.ndarray]:
+    """OLS fit of y against 0..n-1; returns (slope, intercept, residuals)."""
+    x = np.arange(len(y), dtype=np.float64)
+    slope, intercept = np.polyfit(x, y, 1)
+    return float(slope), float(intercept), y - (slope * x + intercept)
+
+def kpi_trend(kpi: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Linear trend of a KPI: slope per month and per year, R², and the slope as a % of the mean level.
+    """
+    try:
+        months, y = SERIES.window(kpi, start, end)
+        if len(y) < 3:
+            raise ValueError("Need at least 3 months for a trend.")
+        slope, intercept, resid = _linfit(y)
+        ss_tot = float(((y - y.mean()) ** 2).sum())
+        r2 = 1 - float((resid ** 2).sum()) / ss_tot if ss_tot else 1.0
+        return _ok(
+            kpi, months,
+            slope_per_month=slope,
+            slope_per_year=slope * 12,
+            slope_pct_of_mean_per_year=(slope * 12 / float(y.mean())) if y.mean() else None,
+            r2=r2,
+            first=float(y[0]),
+            last=float(y[-1]),
+            mean=float(y.mean()),
+        )
+    except Exception as e:
+        return _fail(e)
+
+def kpi_cagr(kpi: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Compound annual growth rate between the first and last month of the window (needs positive endpoints).
+    """
+    try:
+        months, y = SERIES.window(kpi, start, end)
+        if len(y) < 2:
+            raise ValueError("Need at least 2 months for a CAGR.")
+        if y[0] <= 0 or y[-1] <= 0:
+            raise ValueError("CAGR needs positive start and end values.")
+        years = (months[-1] - months[0]).astype(int) / 12
+        cagr = float((y[-1] / y[0]) ** (1 / years) - 1)
+        return _ok(kpi, months, cagr=cagr, years=float(years), first=float(y[0]), last=float(y[-1]), total_change_pct=float(y[-1] / y[0] - 1))
+    except Exception as e:
+        return _fail(e)
+
+def kpi_volatility(kpi: str, window: int = 12, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Rolling volatility: standard deviation of month-over-month % changes over `window` months.
+    Returns the latest and average rolling value plus the full-period figure.
+    """
+    try:
+        months, y = SERIES.window(kpi, start, end)
+        window = int(window)
+        if window < 2 or len(y) < window + 1:
+            raise ValueError(f"Need window >= 2 and at least window+1 ({window + 1}) months.")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            chg = np.diff(y) / y[:-1]
+        chg = np.where(np.isfinite(chg), chg, np.nan)
+        windows = np.lib.stride_tricks.sliding_window_view(chg, window)
+        rolling = np.nanstd(windows, axis=1, ddof=1)
+        return _ok(
+            kpi, months,
+            window=window,
+            latest=float(rolling[-1]),
+            mean=float(np.nanmean(rolling)),
+            max=float(np.nanmax(rolling)),
+            full_period=float(np.nanstd(chg, ddof=1)),
+            mean_mom_change=float(np.nanmean(chg)),
+        )
+    except Exception as e:
+        return _fail(e)
+
+def _decompose(y: np.ndarray, calendar_months: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Classical additive decomposition with a centred 2x12 moving average; returns (trend, seasonal, residual)."""
+    weights = np.r_[0.5, np.ones(11), 0.5] / 12
+    trend = np.full(len(y), np.nan)
+    trend[6:-6] = np.convolve(y, weights, mode="valid")
+    detrended = y - trend
+    idx = np.zeros(12)
+    for m in range(12):
+        vals = detrended[(calendar_months == m) & ~np.isnan(detrended)]
+        idx[m] = vals.mean() if len(vals) else 0.0
+    idx -= idx.mean()
+    seasonal = idx[calendar_months]
+    return trend, seasonal, y - trend - seasonal
+
+def kpi_seasonality(kpi: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Additive seasonal decomposition (12-month cycle): seasonal index per calendar month,
+    seasonal strength (share of detrended variance explained by seasonality) and residual std.
+    """
+    try:
+        months, y = SERIES.window(kpi, start, end)
+        if len(y) < 24:
+            raise ValueError("Need at least 24 months for a seasonal decomposition.")
+        cal = months.astype(int) % 12
+        trend, seasonal, resid = _decompose(y, cal)
+        ok = ~np.isnan(resid)
+        detrended_var = float(np.var((seasonal + resid)[ok]))
+        strength = max(0.0, 1 - float(np.var(resid[ok])) / detrended_var) if detrended_var else 0.0
+        names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+        idx = {names[m]: float(seasonal[cal == m][0]) for m in range(12) if (cal == m).any()}
+        return _ok(
+            kpi, months,
+            seasonal_index=idx,
+            seasonal_strength=strength,
+            peak_month=max(idx, key=idx.get),
+            trough_month=min(idx, key=idx.get),
+            residual_std=float(np.std(resid[ok], ddof=1)),
+            latest_trend=float(trend[ok][-1]),
+        )
+    except Exception as e:
+        return _fail(e)
+
+def kpi_forecast(
+    kpi: str,
+    horizon: int = 6,
+    level: float = 0.95,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Linear trend (+ seasonal indices when there are >= 24 months) forecast for the next `horizon` months,
+    with OLS prediction intervals at `level`.
+    """
+    try:
+        months, y = SERIES.window(kpi, start, end)
+        horizon = int(horizon)
+        if len(y) < 6 or not 1 <= horizon <= 36 or not 0 < level < 1:
+            raise ValueError("Need >= 6 months, 1 <= horizon <= 36 and 0 < level < 1.")
+        cal = months.astype(int) % 12
+        seasonal_idx = np.zeros(12)
+        if len(y) >= 24:
+            _, seasonal, _ = _decompose(y, cal)
+            for m in range(12):
+                if (cal == m).any():
+                    seasonal_idx[m] = seasonal[cal == m][0]
+        adj = y - seasonal_idx[cal]
+        slope, intercept, resid = _linfit(adj)
+        n = len(y)
+        x = np.arange(n, dtype=np.float64)
+        s = float(np.sqrt((resid ** 2).sum() / max(n - 2, 1)))
+        sxx = float(((x - x.mean()) ** 2).sum())
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        fx = np.arange(n, n + horizon, dtype=np.float64)
+        fmonths = months[-1] + np.arange(1, horizon + 1)
+        point = slope * fx + intercept + seasonal_idx[fmonths.astype(int) % 12]
+        half = z * s * np.sqrt(1 + 1 / n + (fx - x.mean()) ** 2 / sxx)
+        return _ok(
+            kpi, months,
+            method="linear_trend+seasonal" if len(y) >= 24 else "linear_trend",
+            level=level,
+            forecast=[
+                {"month": f"{m}-01", "value": float(p), "lower": float(p - h), "upper": float(p + h)}
+                for m, p, h in zip(fmonths.astype(str), point, half)
+            ],
+            residual_std=s,
+        )
+    except Exception as e:
+        return _fail(e)
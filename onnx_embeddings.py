@@ -0,0 +1,141 @@
+# ONNX Runtime embedding backend for the RAG layer (rag.make_embeddings with EMBED_BACKEND=onnx).
+# Runs the same sentence-transformers checkpoint as HuggingFaceEmbeddings: the transformer is exported to ONNX once
+# (optionally with dynamic int8 weight quantization) under EMBED_ONNX_DIR, and pooling/normalization follow the
+# checkpoint's own modules.json, so fp32 vectors match the PyTorch path.
+# Needs onnxruntime at run time; torch + onnx only for the one-off export.
+from __future__ import annotations
+import os, re, json
+from typing import Any, Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBED_ONNX_DIR = os.getenv("EMBED_ONNX_DIR", os.path.join("data", "onnx_models"))
+ONNX_OPSET = 17
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+def model_path(model_name: str) -> str:
+    """Local checkpoint dir: the path itself, or the Hugging Face snapshot (downloaded on first use)."""
+    if os.path.isdir(model_name):
+        return model_name
+    from huggingface_hub import snapshot_download
+    return snapshot_download(model_name)
+
+def st_config(src: str) -> Dict[str, Any]:
+    """Transformer subdir, pooling, normalization and max length from a sentence-transformers checkpoint."""
+    cfg = {"transformer": src, "pooling": "mean", "normalize": False, "max_length": 512}
+    try:
+        with open(os.path.join(src, "modules.json"), encoding="utf-8") as f:
+            modules = json.load(f)
+    except OSError:
+        return cfg  # plain transformers checkpoint: sentence-transformers' defaults
+    for m in modules:
+        kind, path = m["type"].rsplit(".", 1)[-1], os.path.join(src, m.get("path", ""))
+        if kind == "Transformer":
+            cfg["transformer"] = path
+            st = os.path.join(path, "sentence_bert_config.json")
+            if os.path.exists(st):
+                with open(st, encoding="utf-8") as f:
+                    cfg["max_length"] = json.load(f).get("max_seq_length") or cfg["max_length"]
+        elif kind == "Pooling":
+            with open(os.path.join(path, "config.json"), encoding="utf-8") as f:
+                pc = json.load(f)
+            # Older checkpoints (bge) set one pooling_mode_<x>_token flag; sentence-transformers >= 6 writes pooling_mode.
+            modes = [pc["pooling_mode"]] if "pooling_mode" in pc else [k[13:] for k, v in pc.items() if k.startswith("pooling_mode_") and v]
+            if modes not in (["cls"], ["cls_token"], ["mean"], ["mean_tokens"]):
+                raise ValueError(f"Unsupported pooling config for the ONNX backend: {pc}")
+            cfg["pooling"] = "cls" if modes[0].startswith("cls") else "mean"
+        elif kind == "Normalize":
+            cfg["normalize"] = True
+        else:
+            raise ValueError(f"Unsupported sentence-transformers module for the ONNX backend: {m['type']}")
+    return cfg
+
+def _export_fp32(transformer_dir: str, dest: str) -> None:
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    class Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).last_hidden_state
+
+    model = AutoModel.from_pretrained(transformer_dir).eval()
+    sample = AutoTokenizer.from_pretrained(transformer_dir)(["export sample", "a longer export sample text"], padding=True, return_tensors="pt")
+    if "token_type_ids" not in sample:
+        sample["token_type_ids"] = torch.zeros_like(sample["input_ids"])
+    axes = {0: "batch", 1: "seq"}
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(model), tuple(sample[n] for n in INPUT_NAMES), dest, input_names=INPUT_NAMES,
+            output_names=["last_hidden_state"], opset_version=ONNX_OPSET, dynamo=False,
+            dynamic_axes={n: axes for n in INPUT_NAMES + ["last_hidden_state"]},
+        )
+
+def export_onnx(model_name: str, int8: bool = False, root: str = EMBED_ONNX_DIR) -> str:
+    """Path of the exported model (model.onnx / model_int8.onnx), exporting/quantizing on first use."""
+    out = os.path.join(root, re.sub(r"[^\w.-]+", "_", model_name.strip("/\\")))
+    fp32, q8 = os.path.join(out, "model.onnx"), os.path.join(out, "model_int8.onnx")
+    os.makedirs(out, exist_ok=True)
+    if not os.path.exists(fp32):
+        _export_fp32(st_config(model_path(model_name))["transformer"], fp32 + ".tmp")
+        os.replace(fp32 + ".tmp", fp32)
+    if int8 and not os.path.exists(q8):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        # Dynamic quantization: int8 weights for MatMul/Gemm, activations quantized per batch at run time.
+        quantize_dynamic(fp32, q8 + ".tmp", weight_type=QuantType.QInt8)
+        os.replace(q8 + ".tmp", q8)
+    return q8 if int8 else fp32
+
+class OnnxEmbeddings(Embeddings):
+    """HuggingFaceEmbeddings-compatible embeddings computed with ONNX Runtime on CPU."""
+    def __init__(self, model_name: str, int8: bool = False, threads: int = 0, batch_size: int = 32):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("EMBED_BACKEND=onnx needs onnxruntime (pip install onnxruntime).")
+        from transformers import AutoTokenizer
+        self.model_name = model_name
+        self.int8 = int8
+        self.batch_size = batch_size
+        self.config = st_config(model_path(model_name))
+        self.tokenizer = AutoTokenizer.from_pretrained(self.config["transformer"])
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(export_onnx(model_name, int8), opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.config["max_length"], return_tensors="np")
+        if "token_type_ids" not in enc:
+            enc["token_type_ids"] = np.zeros_like(enc["input_ids"])
+        feed = {n: np.asarray(enc[n], dtype=np.int64) for n in INPUT_NAMES if n in self._inputs}
+        hidden = self.session.run(None, feed)[0]
+        if self.config["pooling"] == "cls":
+            vectors = hidden[:, 0]
+        else:
+            mask = feed["attention_mask"][..., None].astype(np.float32)
+            vectors = (hidden * mask).sum(1) / np.clip(mask.sum(1), 1e-9, None)
+        if self.config["normalize"]:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # As langchain_community's HuggingFaceEmbeddings does; newer wrappers don't, hence rag.embedder_id keeps ONNX vectors apart.
+        texts = [t.replace("\n", " ") for t in texts]
+        # Length-sorted batches (as sentence-transformers does) keep padding, and so wasted compute, low.
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        out: List[Any] = [None] * len(texts)
+        for s in range(0, len(order), self.batch_size):
+            idx = order[s:s + self.batch_size]
+            for i, v in zip(idx, self._encode([texts[i] for i in idx])):
+                out[i] = v.tolist()
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
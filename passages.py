@@ -0,0 +1,104 @@
+# Query-focused passage selection for `fetch`: split converted Markdown into passages (with char offsets
+# into the document), rank them with BM25 against the query, and pack the best ones into the length budget.
+# https://en.wikipedia.org/wiki/Okapi_BM25
+from __future__ import annotations
+import re, math
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+PASSAGE_TARGET_CHARS = 700
+PASSAGE_MAX_CHARS = 1500
+BM25_K1 = 1.2
+BM25_B = 0.75
+STOPWORDS = set(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were what when "
+    "where which who why will with do does did can could should would about into than then there these those".split()
+)
+HEADING = re.compile(r"^#{1,6}\s+(.*)$")
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+(?:[.,][0-9]+)*%?", text.lower()) if t not in STOPWORDS]
+
+@dataclass
+class Passage:
+    start: int
+    end: int
+    section: str
+    text: str
+    tf: Counter = field(default_factory=Counter)
+    length: int = 0
+
+def split_passages(content: str) -> List[Passage]:
+    """Blank-line blocks merged up to ~PASSAGE_TARGET_CHARS; a heading always starts a new passage."""
+    blocks: List[Tuple[int, int]] = []
+    for m in re.finditer(r"\S(?:.*?)(?=\n\s*\n|\Z)", content, re.DOTALL):
+        s, e = m.start(), m.end()
+        # Hard-split oversized blocks (tables, long lists) on line boundaries.
+        while e - s > PASSAGE_MAX_CHARS:
+            cut = content.rfind("\n", s, s + PASSAGE_MAX_CHARS)
+            cut = cut if cut > s else s + PASSAGE_MAX_CHARS
+            blocks.append((s, cut))
+            s = cut
+        blocks.append((s, e))
+
+    passages: List[Passage] = []
+    section = ""
+    cur: Optional[Passage] = None
+    for s, e in blocks:
+        first_line = content[s:e].lstrip().split("\n", 1)[0]
+        h = HEADING.match(first_line)
+        if h:
+            section = h.group(1).strip()
+        if cur is None or h or (e - cur.start) > PASSAGE_TARGET_CHARS:
+            if cur is not None:
+                passages.append(cur)
+            cur = Passage(s, e, section, "")
+        else:
+            cur.end = e
+    if cur is not None:
+        passages.append(cur)
+    for p in passages:
+        p.text = content[p.start:p.end].strip()
+        toks = tokenize(f"{p.section} {p.text}" if p.section and not p.text.startswith("#") else p.text)
+        p.tf, p.length = Counter(toks), len(toks)
+    return passages
+
+def bm25_scores(passages: List[Passage], query: str) -> List[float]:
+    q = list(dict.fromkeys(tokenize(query)))
+    n = len(passages)
+    if not q or not n:
+        return [0.0] * n
+    avgdl = sum(p.length for p in passages) / n or 1.0
+    df: Dict[str, int] = {t: sum(1 for p in passages if t in p.tf) for t in q}
+    idf = {t: math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5)) for t in q}
+    scores = []
+    for p in passages:
+        s = 0.0
+        for t in q:
+            f = p.tf.get(t, 0)
+            if f:
+                s += idf[t] * f * (BM25_K1 + 1) / (f + BM25_K1 * (1 - BM25_B + BM25_B * p.length / avgdl))
+        scores.append(s)
+    return scores
+
+def select_passages(passages: List[Passage], query: str, max_chars: int) -> List[Tuple[Passage, float]]:
+    """Highest-scoring passages that fit in `max_chars`, returned in document order."""
+    ranked = sorted(zip(passages, bm25_scores(passages, query)), key=lambda x: -x[1])
+    chosen, used = [], 0
+    for p, score in ranked:
+        if score <= 0:
+            break
+        cost = len(p.text) + 40  # room for the offset header
+        if used + cost > max_chars:
+            if not chosen and p.text:
+                chosen.append((p, score))  # always return something for a matching page
+                used = max_chars
+            continue
+        chosen.append((p, score))
+        used += cost
+    return sorted(chosen, key=lambda x: x[0].start)
+
+def format_passages(selected: List[Tuple[Passage, float]], max_chars: int) -> str:
+    parts = [f"[chars {p.start}-{p.end}]\n{p.text}" for p, _ in selected]
+    return "\n\n---\n\n".join(parts)[:max_chars]
@@ -0,0 +1,94 @@
+# Micro-batching for rag_tool retrieval. Concurrent callers (the LangGraph Baseline stage, parallel A2A tasks)
+# each block on search(); a single worker thread gathers whatever arrives within QUERY_BATCH_WINDOW_MS, embeds
+# the batch in one forward pass and hands all of its vectors to one search call.
+from __future__ import annotations
+import os, time, queue, threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "3"))
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "64"))
+
+class QueryBatcher:
+    """Collects concurrent queries for a few ms, then runs `embed` once and `search` once for the whole batch."""
+    def __init__(self, embed: Callable[[List[str]], List[List[float]]], search: Callable[[List[List[float]]], List[List[Any]]],
+                 window_ms: float = QUERY_BATCH_WINDOW_MS, max_batch: int = QUERY_BATCH_MAX):
+        self.embed = embed
+        self.search_vectors = search
+        self.window_s = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"queries": 0, "batches": 0, "largest_batch": 0, "embed_ms": 0.0, "search_ms": 0.0}
+
+    def search(self, question: str, timeout: Optional[float] = None) -> List[Any]:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="query-batcher", daemon=True)
+                self._thread.start()
+        fut: Future = Future()
+        self._queue.put((question, fut))
+        return fut.result(timeout)
+
+    def _collect(self, first: Tuple[str, Future]) -> Tuple[List[Tuple[str, Future]], bool]:
+        batch, deadline = [first], time.monotonic() + self.window_s
+        while len(batch) < self.max_batch:
+            try:
+                # Drain what is already queued (it piled up during the previous pass) even after the window.
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch: List[Tuple[str, Future]]) -> None:
+        questions = list(dict.fromkeys(q for q, _ in batch))  # identical questions share one row
+        try:
+            t0 = time.perf_counter()
+            vectors = self.embed(questions)
+            t1 = time.perf_counter()
+            results = dict(zip(questions, self.search_vectors(vectors)))
+            t2 = time.perf_counter()
+        except BaseException as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        for q, fut in batch:
+            fut.set_result(list(results[q]))
+        with self._lock:
+            st = self.stats
+            st["queries"] += len(batch)
+            st["batches"] += 1
+            st["largest_batch"] = max(st["largest_batch"], len(batch))
+            st["embed_ms"] += (t1 - t0) * 1000
+            st["search_ms"] += (t2 - t1) * 1000
+
+    def close(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            st = dict(self.stats)
+        batches = st["batches"] or 1
+        return {
+            "window_ms": self.window_s * 1000, "max_batch": self.max_batch, **st,
+            "avg_batch": round(st["queries"] / batches, 2),
+            "embed_ms": round(st["embed_ms"], 1), "search_ms": round(st["search_ms"], 1),
+        }
@@ -1,31 +1,81 @@
-from langchain_community.document_loaders import DirectoryLoader
-from langchain.document_loaders import TextLoader
+# RAG building blocks: document loading/chunking, the embedding model and the FAISS index.
+# Importing this module has no side effects; the index is (re)built by `python build_rag_index.py`
+# and the MCP server only loads it.
+from langchain_community.document_loaders import DirectoryLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import OllamaEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from google import genai
-from openai import OpenAI
-import os
+from langchain_core.embeddings import Embeddings
+import os, json, math, warnings
+from typing import Any, Dict, List, Optional
+from embedding_cache import CachedEmbeddings, EMBED_CACHE_ENABLED
+from onnx_embeddings import OnnxEmbeddings
 from dotenv import load_dotenv
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-
-with open('data/company_data/kpi_handbook.md', 'r', encoding="utf-8", errors="replace") as file:
-  dataset = file.readlines()
-  print(f'Loaded {len(dataset)} entries')
-
-model = "gemma-3-270m-it"
-OLLAMA_BASE_URL = "http://localhost:11434"
+EMBED_MODEL = "BAAI/bge-small-en-v1.5"
 directories = "data/rag_documents"
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 25
-embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
 db_dir = "data/rag_documents/faiss_index"
-
-def load_markdown(root: str):
+MANIFEST = "manifest.json"  # written next to the index by build_rag_index.py
+# Embedding backend: "torch" (HuggingFaceEmbeddings) or "onnx" (ONNX Runtime, optionally dynamic int8).
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_INT8 = os.getenv("EMBED_INT8", "0") == "1"
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))  # operator threads; 0 = library default
+
+_embeddings: Optional[Embeddings] = None
+
+def embedder_id(backend: str = EMBED_BACKEND, int8: bool = EMBED_INT8) -> str:
+  """Identity of the vectors (embedding cache rows, index settings). Each backend gets its own: their text preprocessing
+  is not guaranteed identical across langchain versions, so switching backend or int8 re-embeds and rebuilds the index."""
+  if backend == "onnx":
+    return f"{EMBED_MODEL}#onnx-int8" if int8 else f"{EMBED_MODEL}#onnx"
+  return EMBED_MODEL
+
+def index_settings() -> Dict[str, Any]:
+  """Settings an index must have been built with to be searched with the active embedder."""
+  return {"model": embedder_id(), "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+def make_embeddings(backend: str = EMBED_BACKEND, int8: bool = EMBED_INT8, threads: int = EMBED_THREADS, model_name: str = EMBED_MODEL) -> Embeddings:
+  if backend == "torch":
+    if int8:
+      raise ValueError("EMBED_INT8=1 needs EMBED_BACKEND=onnx.")
+    if threads:
+      import torch
+      torch.set_num_threads(threads)
+    return HuggingFaceEmbeddings(model_name=model_name)
+  if backend == "onnx":
+    return OnnxEmbeddings(model_name, int8=int8, threads=threads)
+  raise ValueError(f"Unknown EMBED_BACKEND {backend!r}; expected 'torch' or 'onnx'.")
+
+def get_embeddings() -> Embeddings:
+  """Process-wide embedding model (loaded on first use), behind the persistent embedding cache unless EMBED_CACHE_ENABLED=0."""
+  global _embeddings
+  if _embeddings is None:
+    model = make_embeddings()
+    # Both backends embed a query exactly like a one-text document batch, so queries batch the same way.
+    _embeddings = CachedEmbeddings(model, embedder_id(), query_batch=model.embed_documents) if EMBED_CACHE_ENABLED else model
+  return _embeddings
+
+def embed_queries(texts: List[str], embeddings: Optional[Embeddings] = None) -> List[List[float]]:
+  """Embed many queries in one forward pass where the model allows it."""
+  emb = embeddings or get_embeddings()
+  if isinstance(emb, CachedEmbeddings):
+    return emb.embed_queries(texts)
+  if isinstance(emb, (HuggingFaceEmbeddings, OnnxEmbeddings)):
+    return emb.embed_documents(texts)
+  return [emb.embed_query(t) for t in texts]
+
+def embedding_cache_stats() -> Dict[str, Any]:
+  if isinstance(_embeddings, CachedEmbeddings):
+    return _embeddings.report()
+  return {"enabled": EMBED_CACHE_ENABLED, "loaded": _embeddings is not None}
+
+def load_markdown(root: str = directories):
   loader = DirectoryLoader(
     root,
     glob="**/*.md",
@@ -37,10 +87,55 @@ def load_markdown(root: str):
   )
   return loader.load()
 
-def load_index(db_dir: str = db_dir, embeddings: HuggingFaceEmbeddings = embeddings):
-    db = FAISS.load_local(db_dir, embeddings, allow_dangerous_deserialization=True)
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+  return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+def split_documents(docs) -> List:
+  return get_text_splitter().split_documents(docs)
+
+def load_index(db_dir: str = db_dir, embeddings: Optional[Embeddings] = None, check_settings: bool = True):
+    """Load the FAISS index; raises if its manifest says it was built with another embedder or chunking."""
+    if not os.path.exists(os.path.join(db_dir, "index.faiss")):
+        raise FileNotFoundError(f"No FAISS index in {db_dir}; build it with `python build_rag_index.py`.")
+    if check_settings:
+        try:
+            with open(os.path.join(db_dir, MANIFEST), encoding="utf-8") as f:
+                built = json.load(f).get("settings")
+        except (OSError, ValueError):
+            built = None
+        active = index_settings()
+        if built is None:
+            warnings.warn(f"No {MANIFEST} in {db_dir}: cannot check the index was built with {active}; "
+                          "rebuild it with `python build_rag_index.py --full`.")
+        elif built != active:
+            diff = {k: (built.get(k), v) for k, v in active.items() if built.get(k) != v}
+            raise ValueError(f"FAISS index in {db_dir} was built with different settings (built, active): {diff}; "
+                             "rebuild it with `python build_rag_index.py --full`.")
+    db = FAISS.load_local(db_dir, embeddings or get_embeddings(), allow_dangerous_deserialization=True)
     return db
 
+def get_retriever(db, threshold: float = 0.5):
+    return db.as_retriever(
+        search_type="similarity_score_threshold",
+        search_kwargs={"score_threshold": threshold}
+    )
+
+# Distance -> relevance in [0, 1], as VectorStore defines it for each FAISS distance strategy.
+_RELEVANCE = {
+    DistanceStrategy.EUCLIDEAN_DISTANCE: lambda d: 1.0 - d / math.sqrt(2),
+    DistanceStrategy.COSINE: lambda d: 1.0 - d,
+    DistanceStrategy.MAX_INNER_PRODUCT: lambda d: 1.0 - d if d > 0 else -1.0 * d,
+}
+
+def search_by_vectors(db, vectors: List[List[float]], k: int = 4, threshold: Optional[float] = None) -> List[List]:
+    """Per already-embedded query, the documents the similarity_score_threshold retriever returns (public FAISS API only)."""
+    relevance = db.override_relevance_score_fn or _RELEVANCE[db.distance_strategy]
+    out = []
+    for v in vectors:
+        hits = db.similarity_search_with_score_by_vector(list(map(float, v)), k=k)
+        out.append([doc for doc, d in hits if threshold is None or relevance(float(d)) >= threshold])
+    return out
+
 def run_rag_for_question(client, retriever, question, model):
     retrieved = retriever.get_relevant_documents(question)
     context = "\n\n".join([d.page_content for d in retrieved])
@@ -64,49 +159,11 @@ def run_rag_for_question(client, retriever, question, model):
         "answer": text.strip()
     }
 
-docs = load_markdown(directories)
-text_splitter = RecursiveCharacterTextSplitter(
-  chunk_size=CHUNK_SIZE,
-  chunk_overlap=CHUNK_OVERLAP
-  )
-
-chunks = text_splitter.split_documents(docs)
-
-db = FAISS.from_documents(chunks, embeddings)
-db.save_local(db_dir)
-
-retriever = db.as_retriever(
-                search_type="similarity_score_threshold",
-                search_kwargs={'score_threshold': 0.5}
-            )
-
-query = "Define what cost to serve is?"
-retrieved_docs = retriever.get_relevant_documents(query)
-
-# for i, doc in enumerate(retrieved_docs):
-#   print(f"\n\nDOC: [{i}] {doc.page_content[:100]}...")
-
-context = "\n\n".join([doc.page_content for doc in retrieved_docs])
-
-prompt = f"""You are a helpful assistant. Use ONLY the context to answer.
-            If the answer isn't in the context, say you don't know.
-            Cite sources as [#] with the source filename.
-            Context:
-            {context}
-            Question: {query}
-            Answer:"""
-
-client = genai.Client(api_key=GOOGLE_API_KEY)
-response = client.models.generate_content(
-    model="gemini-2.0-flash", contents=prompt
-)
-print("gemini response: ",response.text)
-
-# client_lm = OpenAI(base_url="http://127.0.0.1:1234/v1", api_key="lm-studio")
-# resp = client_lm.chat.completions.create(
-#     model="lmstudio-community/gemma-3-270m-it-GGUF",  
-#     messages=[{"role":"user", "content":prompt}],
-#     temperature=0.2
-# )
-# print("local llm response: ", resp.choices[0].message.content)
-
+if __name__ == "__main__":
+    # Smoke test against the prebuilt index: python rag.py ["question"]
+    import sys
+    from google import genai
+    query = sys.argv[1] if len(sys.argv) > 1 else "Define what cost to serve is?"
+    client = genai.Client(api_key=GOOGLE_API_KEY)
+    result = run_rag_for_question(client, get_retriever(load_index()), query, "gemini-2.0-flash")
+    print("gemini response: ", result["answer"])
@@ -0,0 +1,129 @@
+# Shared search-result cache for web_search / web_search_api. SQLite (WAL) so every server worker process
+# sees the same entries. Result sets and empty searches get separate TTLs, so a transient
+# "no results" from DuckDuckGo expires in minutes instead of sticking for the life of the process.
+# Failed searches are never stored: the backends raise, and callers turn the error into a reply row outside the cache.
+from __future__ import annotations
+import os, re, json, time, sqlite3, threading, unicodedata
+from typing import Any, Callable, Dict, List, Optional
+
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join("data", "http_cache", "search_cache.db"))
+SEARCH_CACHE_TTL_S = float(os.getenv("SEARCH_CACHE_TTL_S", str(6 * 3600)))
+SEARCH_NEGATIVE_TTL_S = float(os.getenv("SEARCH_NEGATIVE_TTL_S", "120"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "20000"))
+
+DDL = """
+CREATE TABLE IF NOT EXISTS search_cache (
+  backend TEXT NOT NULL,
+  query TEXT NOT NULL,
+  max_results INTEGER NOT NULL,
+  results TEXT NOT NULL,
+  negative INTEGER NOT NULL,
+  created REAL NOT NULL,
+  expires_at REAL NOT NULL,
+  PRIMARY KEY (backend, query, max_results)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_search_cache_expires ON search_cache(expires_at);
+"""
+
+def normalize_query(query: str) -> str:
+    """NFKC, case-folded, whitespace-collapsed; surrounding quotes/punctuation stripped."""
+    q = unicodedata.normalize("NFKC", query).casefold()
+    q = re.sub(r"\s+", " ", q).strip()
+    return q.strip(" \t?!.;,")
+
+def _is_negative(results: List[Dict[str, str]]) -> bool:
+    return not any(r.get("url") for r in results)
+
+class SearchCache:
+    """(backend, normalized query, max_results) -> result list, with positive and negative TTLs."""
+    def __init__(self, path: str = SEARCH_CACHE_PATH, ttl_s: float = SEARCH_CACHE_TTL_S, negative_ttl_s: float = SEARCH_NEGATIVE_TTL_S):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts = 0
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0, "negative_stores": 0, "errors": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(DDL)
+            self._conn = conn
+        return self._conn
+
+    def get(self, backend: str, query: str, max_results: int) -> Optional[List[Dict[str, str]]]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT results, negative FROM search_cache WHERE backend = ? AND query = ? AND max_results = ? AND expires_at > ?",
+                (backend, normalize_query(query), max_results, time.time()),
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["negative_hits" if row[1] else "hits"] += 1
+            return json.loads(row[0])
+
+    def put(self, backend: str, query: str, max_results: int, results: List[Dict[str, str]]) -> None:
+        negative = _is_negative(results)
+        now = time.time()
+        ttl = self.negative_ttl_s if negative else self.ttl_s
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (backend, normalize_query(query), max_results, json.dumps(results), int(negative), now, now + ttl),
+            )
+            self.stats["negative_stores" if negative else "stores"] += 1
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self._prune(db, now)
+
+    def _prune(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+        n = db.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        if n > SEARCH_CACHE_MAX_ENTRIES:
+            db.execute(
+                "DELETE FROM search_cache WHERE (backend, query, max_results) IN "
+                "(SELECT backend, query, max_results FROM search_cache ORDER BY created LIMIT ?)",
+                (n - SEARCH_CACHE_MAX_ENTRIES,),
+            )
+
+    def cached(self, backend: str, query: str, max_results: int, search: Callable[[], List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """Return the cached result set or run `search()` and store it. Exceptions propagate and are not cached."""
+        hit = self.get(backend, query, max_results)
+        if hit is not None:
+            return hit
+        try:
+            results = search()
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self.put(backend, query, max_results, results)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            n, neg = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(negative), 0) FROM search_cache WHERE expires_at > ?", (time.time(),)
+            ).fetchone()
+            st = dict(self.stats)
+        lookups = st["hits"] + st["negative_hits"] + st["misses"]
+        return {
+            "path": self.path, "live_entries": n, "live_negative": neg, "ttl_s": self.ttl_s, "negative_ttl_s": self.negative_ttl_s,
+            **st, "hit_ratio": round((st["hits"] + st["negative_hits"]) / lookups, 4) if lookups else 0.0,
+        }
+
+SEARCH_CACHE = SearchCache()
+
+def search_cache_stats() -> Dict[str, Any]:
+    return SEARCH_CACHE.report()
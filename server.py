@@ -3,26 +3,32 @@
 import os
 from typing import List, Dict, Literal, Optional, Any
 from pydantic import BaseModel, AnyUrl, Field
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from dotenv import load_dotenv
-from functools import lru_cache
 from google import genai
 import traceback
+import anyio
 # load web functions:
-from web_server_fct import html_to_markdown, http_get_text, looks_like_html, web_search, web_search_api, fetch
+from web_server_fct import html_to_markdown, http_get_text, looks_like_html, web_search, web_search_api, fetch, fetch_many, hedged_search
 # load sql functions:
-from sql_tools import sql_db_list_tables, sql_db_schema, sql_execute_query, sql_db_query_checker, sql_db_explain
+from sql_tools import sql_db_list_tables, sql_db_schema, sql_execute_query, sql_execute_query_paged, sql_cursor_stats, sql_budget_stats, sql_db_query_checker, sql_db_explain, sql_db_schema_compact, sql_pool_stats, sql_result_cache_stats, POOL, CATALOG
+# load kpi rollups:
+from kpi_rollups import kpi_slice, ensure_rollups
+from kpi_timeseries import kpi_trend, kpi_cagr, kpi_volatility, kpi_seasonality, kpi_forecast, SERIES
+# thread/process offloading for blocking tools:
+from tool_dispatch import offload, dispatch_stats, shutdown as shutdown_dispatch
+# shared pooled HTTP client for fetch / web_search:
+from http_client import start_http_client, close_http_client, http_stats
+from http_cache import HTTP_CACHE, http_cache_stats
+from doc_cache import doc_cache_stats
+from search_cache import SEARCH_CACHE, search_cache_stats
 # load rag tool:
-from rag import run_rag_for_question, load_index
+from rag import run_rag_for_question, load_index, get_retriever, embedding_cache_stats, embed_queries, search_by_vectors
+from query_batcher import QueryBatcher
 
 load_dotenv() 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 DEFAULT_UA = "FastMCP/1.0 (+https://example.com)"
-DB_PATH = "data/company_data/Company_data.db"
-# https://www.sqlite.org/uri.html
-DB_URI = f"file:{os.path.abspath(DB_PATH)}?mode=ro&immutable=1&cache=shared"
 
 
 mcp = FastMCP(
@@ -32,6 +38,13 @@ mcp = FastMCP(
     port=8787,
 )
 
+# max concurrent calls per tool group (all tools of a group share one limit; each call runs on the shared thread pool)
+WEB_LIMIT = int(os.getenv("MCP_WEB_LIMIT", "8"))
+LLM_LIMIT = int(os.getenv("MCP_LLM_LIMIT", "4"))
+SQL_LIMIT = int(os.getenv("MCP_SQL_LIMIT", "8"))
+# rag_tool retrieval runs under its own limit so the query batcher sees every concurrent caller, not just LLM_LIMIT of them
+RAG_LIMIT = int(os.getenv("MCP_RAG_LIMIT", "16"))
+
 models = ["gpt-4o-mini-search-preview", "gpt-5","gpt-5-mini", "gpt-40","gpt-4o-mini"]
 default_model = models[1]
 
@@ -51,36 +64,90 @@ class SearchRequest(BaseModel):
     name="web_search_api",
     description="Search the web and return candidate URLs with short snippets.",
 )
+@offload(limit=LLM_LIMIT, group="llm")
 def web_search_api_tool(query: str, max_results: int = 5, model: str = default_model) -> List[Dict[str, str]]:
     """Minimal web_search: returns [{'url': str, 'snippet': str}, ...]."""
-    return web_search_api(query, max_results, model)
+    try:
+        return SEARCH_CACHE.cached(f"openai:{model}", query, max_results, lambda: web_search_api(query, max_results, model))
+    except Exception as e:  # reported to the agent, never cached
+        return [{"url": "", "snippet": f"Search failed: {e}"}]
 
 # -------------------------------------------------------------FETCH----------------------------------------------------------------
 @mcp.tool(
     name="fetch",
-    description="Fetch a URL. For HTML, returns simplified Markdown; else returns raw text. Supports pagination.",
+    description=(
+        "Fetch a URL. For HTML, returns simplified Markdown; else returns raw text. Supports pagination: "
+        "pass the returned `doc` handle with the next start_index to page through the already-converted document. "
+        "With `query`, returns only the passages most relevant to it (with their char offsets) within max_length."
+    ),
+)
+async def fetch_tool(
+    url: str,
+    max_length: int = 5000,
+    start_index: int = 0,
+    raw: bool = False,
+    doc: Optional[str] = None,
+    query: Optional[str] = None,
+) -> Dict:
+    return await fetch(url=url, max_length=max_length, start_index=start_index, raw=raw, doc=doc, query=query)
+
+@mcp.tool(
+    name="fetch_many",
+    description=(
+        "Fetch several URLs concurrently (same output per URL as `fetch`). Slow sites are cut off at "
+        "`per_url_timeout_s`; whatever is done by `deadline_s` is returned, the rest is listed in `pending`. "
+        "`query` selects the most relevant passages per page, as in `fetch`."
+    ),
 )
-async def fetch_tool(url: str, max_length: int = 5000, start_index: int = 0, raw: bool = False) -> Dict:
-    return await fetch(url=url, max_length=max_length, start_index=start_index, raw=raw)
+async def fetch_many_tool(
+    urls: List[str],
+    max_length: int = 5000,
+    per_url_timeout_s: float = 15,
+    deadline_s: float = 30,
+    query: Optional[str] = None,
+    ctx: Optional[Context] = None,
+) -> Dict:
+    async def progress(result: Dict, done: int, total: int) -> None:
+        if ctx is not None:
+            await ctx.report_progress(done, total)
+            await ctx.info(f"fetched {result.get('url')} ({done}/{total})")
+    return await fetch_many(urls, max_length=max_length, per_url_timeout_s=per_url_timeout_s, deadline_s=deadline_s, on_result=progress, query=query)
 
 # -----------------------------------------------------------WEB SEARCH-----------------------------------------------------------------
 
-@lru_cache(maxsize=256)
 def web_search_cached(query: str, max_results: int = 5) -> List[Dict[str,str]]:
-    urls = web_search(query, max_results=max_results)
-    if not urls:
-        return [{"url": "", "snippet": "No results"}]
-    return [{"url": u, "snippet": ""} for u in urls]
+    def search() -> List[Dict[str,str]]:
+        urls = web_search(query, max_results=max_results)
+        if not urls:
+            return [{"url": "", "snippet": "No results"}]
+        return [{"url": u, "snippet": ""} for u in urls]
+    # DuckDuckGo ignores `model`, so the key is the backend + normalized query only.
+    try:
+        return SEARCH_CACHE.cached("ddg", query, max_results, search)
+    except Exception as e:  # reported to the agent, never cached
+        return [{"url": "", "snippet": f"Search failed: {e}"}]
 
 @mcp.tool(
     name="web_search",
     description="Search the web and return candidate URLs (no API key).",
 )
+@offload(limit=WEB_LIMIT, group="web")
 def web_search_tool(query: str, max_results: int = 5, model: str = default_model) -> List[Dict[str,str]]:
     return web_search_cached(query, max_results)
 
+@mcp.tool(
+    name="search",
+    description=(
+        "Search the web with DuckDuckGo and the OpenAI search backend at once; returns merged, de-duplicated URLs "
+        "(with the backends that found each) as soon as one backend answers, within `budget_s` seconds."
+    ),
+)
+async def search_tool(query: str, max_results: int = 5, model: str = default_model, budget_s: float = 8) -> Dict[str, Any]:
+    return await hedged_search(query, max_results=max_results, model=model, budget_s=budget_s)
+
 # -----------------------------------------------------------SQL: List Tables-----------------------------------------------------------------
 @mcp.tool(name = "sql_db_list_tables", description= "List all tables in the current database.")
+@offload(limit=SQL_LIMIT, group="sql")
 def sql_db_list_tables_tool() -> List[str]:
     """
     Return the list of table names in the current database.
@@ -92,30 +159,130 @@ def sql_db_list_tables_tool() -> List[str]:
         name="sql_db_schema",
         description="Return schema info (DDL + columns) and sample rows for each table."
 )
+@offload(limit=SQL_LIMIT, group="sql")
 def sql_db_schema_tool(tables: Optional[List[str]] = None, sample_rows: int = 3) -> Dict[str, Dict[str, Any]]:
     """
     Return schema info (DDL + columns) and up to `sample_rows` sample rows for each table.
     """
     return sql_db_schema(tables=tables, sample_rows=sample_rows)
 
+# -----------------------------------------------------------SQL: Compact Schema-----------------------------------------------------------------
+@mcp.tool(
+    name="sql_db_schema_compact",
+    description="Return a SCHEMA string with one line per table: table(col type, ...).",
+)
+@offload(limit=SQL_LIMIT, group="sql")
+def sql_db_schema_compact_tool(tables: Optional[List[str]] = None) -> str:
+    """
+    Return a ready-made SCHEMA string, one line per table: table(col type, ...).
+    """
+    return sql_db_schema_compact(tables=tables)
+
 # -----------------------------------------------------------SQL: Execute Query-----------------------------------------------------------------
 @mcp.tool(
     name="sql_execute_query",
     description="Execute a SQL query and return rows.",
 )
-def sql_execute_query_tool(query: str, params: Optional[Dict[str, Any]] = None, max_rows: int = 1000) -> Dict[str, Any]:
+@offload(limit=SQL_LIMIT, group="sql")
+def sql_execute_query_tool(
+    query: str,
+    params: Optional[Dict[str, Any]] = None,
+    max_rows: int = 1000,
+    format: Literal["records", "columnar", "csv", "arrow"] = "records",
+    timeout_ms: Optional[int] = None,
+    max_vm_steps: Optional[int] = None,
+) -> Dict[str, Any]:
     """
     Execute a provided SQL query (SQLite) safely and return rows.
     Input to this tool is a detailed and correct SQL query (use :name parameters).
-    Output is {cols, rows, row_count, duration_ms, truncated}.
+    `format` selects the rows encoding: records (list of dicts), columnar (one list per column), csv or arrow (base64 IPC).
+    The plan is checked first: an over-budget plan is rejected with error="guard_rejected", riskier shapes come back with guard.verdict="warn".
+    `timeout_ms` / `max_vm_steps` cap execution; an aborted query returns error="budget_exceeded" with its progress.
+    Output is {cols, format, rows, bytes, row_count, duration_ms, truncated, guard, cache}.
+    """
+    return sql_execute_query(
+        query=query, params=params, row_limit=max_rows, format=format,
+        timeout_ms=timeout_ms, max_vm_steps=max_vm_steps,
+    )
+
+# -----------------------------------------------------------SQL: Paginated Query-----------------------------------------------------------------
+@mcp.tool(
+    name="sql_execute_query_paged",
+    description="Execute a SQL query page by page. Pass `query` first, then only the returned `cursor` for the next pages.",
+)
+@offload(limit=SQL_LIMIT, group="sql")
+def sql_execute_query_paged_tool(
+    query: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    page_size: int = 200,
+    cursor: Optional[str] = None,
+    format: Literal["records", "columnar", "csv", "arrow"] = "records",
+    timeout_ms: Optional[int] = None,
+    max_vm_steps: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Execute a SQL query page by page.
+    First call: pass `query` (and `params`); the response holds the first page and a `cursor` token when more rows exist.
+    Next calls: pass only `cursor` to get the following page. Cursors expire after a period of inactivity.
+    Output is {cols, format, rows, bytes, row_count, offset, has_more, cursor}.
     """
-    return sql_execute_query(query=query, params=params, row_limit=max_rows)
+    return sql_execute_query_paged(
+        query=query, params=params, page_size=page_size, cursor=cursor, format=format,
+        timeout_ms=timeout_ms, max_vm_steps=max_vm_steps,
+    )
+
+# -----------------------------------------------------------KPI Slice-----------------------------------------------------------------
+@mcp.tool(
+    name="kpi_slice",
+    description=(
+        "Answer common KPI questions (latest value, trailing months, quarterly/yearly averages, period-over-period "
+        "and YoY deltas, rolling 3/12-month means) from precomputed rollups of monthly_kpis, without writing SQL."
+    ),
+)
+@offload(limit=SQL_LIMIT, group="sql")
+def kpi_slice_tool(kpi: str, grain: Literal["month", "quarter", "year"] = "month", start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Answer a KPI question from the precomputed rollups with one indexed range lookup.
+    kpi: a monthly_kpis column, e.g. cost_to_serve, contribution_margin_pct, new_customers, mrr.
+    start/end: YYYY, YYYY-Qn, YYYY-MM or YYYY-MM-DD (inclusive). Omit both to get only the latest period.
+    `value` is the period sum for new/churned customers and the period average for every other KPI.
+    Output is {kpi, grain, cols, rows, row_count}.
+    """
+    return kpi_slice(kpi=kpi, grain=grain, start=start, end=end)
+
+# -----------------------------------------------------------KPI Time Series-----------------------------------------------------------------
+# kpi: a monthly_kpis column; start/end: YYYY-MM or YYYY-MM-DD (inclusive), omit for the full 2015-2025 history.
+@mcp.tool(name="kpi_trend", description="Linear trend of a KPI: slope per month/year, R², slope as % of mean.")
+@offload(limit=SQL_LIMIT, group="sql")
+def kpi_trend_tool(kpi: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    return kpi_trend(kpi=kpi, start=start, end=end)
+
+@mcp.tool(name="kpi_cagr", description="Compound annual growth rate of a KPI between two months.")
+@offload(limit=SQL_LIMIT, group="sql")
+def kpi_cagr_tool(kpi: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    return kpi_cagr(kpi=kpi, start=start, end=end)
+
+@mcp.tool(name="kpi_volatility", description="Rolling volatility (std of month-over-month % change) of a KPI.")
+@offload(limit=SQL_LIMIT, group="sql")
+def kpi_volatility_tool(kpi: str, window: int = 12, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    return kpi_volatility(kpi=kpi, window=window, start=start, end=end)
+
+@mcp.tool(name="kpi_seasonality", description="Seasonal index per calendar month, seasonal strength and residual noise of a KPI.")
+@offload(limit=SQL_LIMIT, group="sql")
+def kpi_seasonality_tool(kpi: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    return kpi_seasonality(kpi=kpi, start=start, end=end)
+
+@mcp.tool(name="kpi_forecast", description="Trend + seasonal forecast of a KPI for the next months, with prediction intervals.")
+@offload(limit=SQL_LIMIT, group="sql")
+def kpi_forecast_tool(kpi: str, horizon: int = 6, level: float = 0.95, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    return kpi_forecast(kpi=kpi, horizon=horizon, level=level, start=start, end=end)
 
 # -----------------------------------------------------------SQL: Validate SQL-----------------------------------------------------------------
 @mcp.tool(
     name="sql_db_query_checker",
     description="double-check a SQL query before execution.",
 )
+@offload(limit=SQL_LIMIT, group="sql")
 def sql_db_query_checker_tool(
     dialect: str,
     query: str,
@@ -134,27 +301,47 @@ def sql_db_query_checker_tool(
     name="sql_db_explain",
     description="Get SQLite EXPLAIN QUERY PLAN for a SELECT/WITH query.",
 )
-def sql_db_explain(query: str) -> Dict[str, Any]:
+@offload(limit=SQL_LIMIT, group="sql")
+def sql_db_explain_tool(query: str) -> Dict[str, Any]:
     """
-    Return SQLite EXPLAIN QUERY PLAN for the provided SELECT/WITH query.
+    Return SQLite EXPLAIN QUERY PLAN for the provided SELECT/WITH query, with the plan guard verdict.
     """
     return sql_db_explain(query=query)
 
 # ------------------------------------------------------------------RAG-------------------------------------------------------------------------
 
-embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-db_dir = "data/rag_documents/faiss_index"
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 rag_model = "gemini-2.0-flash"
 threshold = 0.5
 top_k = 5
 
-db = FAISS.load_local(db_dir, embeddings, allow_dangerous_deserialization=True)
-retriever = db.as_retriever(
-    search_type="similarity_score_threshold",
-    search_kwargs={"score_threshold": threshold}
+# Prebuilt index only; (re)build it with `python build_rag_index.py`.
+db = load_index()
+retriever = get_retriever(db, threshold)
+# Concurrent rag_tool calls share one embedding pass; each is then searched with the same k/threshold as `retriever`.
+rag_batcher = QueryBatcher(
+    embed=embed_queries,
+    search=lambda vectors: search_by_vectors(db, vectors, k=retriever.search_kwargs.get("k", 4), threshold=threshold),
 )
 
+@offload(limit=RAG_LIMIT, name="rag_retrieve", group="rag")
+def rag_retrieve(question: str) -> List[Any]:
+    return (rag_batcher.search(question) or [])[:top_k]
+
+@offload(limit=LLM_LIMIT, name="rag_answer", group="llm")
+def rag_answer(question: str, context: str) -> str:
+    prompt = (
+        "You are a data retriever. Use only the context to answer.\n"
+        "If the answer isn't in the context, say you don't know.\n"
+        "Gather as much as relevant info as you can.\n"
+        "Context:\n" + context + "\n"
+        "Question: " + question + "\n"
+        "Answer:"
+    )
+    resp = client.models.generate_content(model=rag_model, contents=prompt)
+    text = getattr(resp, "text", "") or ""
+    return text.strip() or "I don't know from the knowledge base."
+
 @mcp.tool(
     name="rag_tool",
     description="""
@@ -165,7 +352,7 @@ retriever = db.as_retriever(
     Outputs: answer.
     """
 )
-def rag_tool(question: str) -> str:
+async def rag_tool(question: str) -> str:
     """
     Answers from a vector DB built over: company profile, constraints/policies, current tactics, experiments log, KPI definitions, and data dictionary (`monthly_kpis`, 2015-2025).
     Use when the question touches policies/limits, KPI formulas, experiment outcomes, cadences, previous strategies, company baseline, or table coverage/keys.
@@ -174,26 +361,54 @@ def rag_tool(question: str) -> str:
     Outputs: answer.
     """
     try:
-        docs = retriever.get_relevant_documents(question) or []
-        docs = docs[:top_k]  
+        # Retrieval first (batched with other callers), then hold an LLM slot only for the Gemini round-trip.
+        docs = await rag_retrieve(question)
         context = "\n\n".join(d.page_content for d in docs)
         if not context.strip():
             return "I don't know from the knowledge base."
-
-        prompt = (
-            "You are a data retriever. Use only the context to answer.\n"
-            "If the answer isn't in the context, say you don't know.\n"
-            "Gather as much as relevant info as you can.\n"
-            "Context:\n" + context + "\n"
-            "Question: " + question + "\n"
-            "Answer:"
-        )
-        resp = client.models.generate_content(model=rag_model, contents=prompt)
-        text = getattr(resp, "text", "") or ""
-        return text.strip() or "I don't know from the knowledge base."
+        return await rag_answer(question, context)
     except Exception:   # exception handling given by chatgpt
         return "ERROR:\n" + traceback.format_exc()
 
+# -----------------------------------------------------------Server Metrics-----------------------------------------------------------------
+@mcp.tool(
+    name="server_stats",
+    description="Return server-side metrics (tool dispatch, HTTP client and cache, fetch document cache, search cache, embedding cache, RAG query batching, SQL connection pool, result cache, cursors, execution budgets).",
+)
+def server_stats_tool() -> Dict[str, Any]:
+    return {
+        "dispatch": dispatch_stats(),
+        "http": http_stats(),
+        "http_cache": http_cache_stats(),
+        "fetch_docs": doc_cache_stats(),
+        "search_cache": search_cache_stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "rag_batcher": rag_batcher.report(),
+        "sql_pool": sql_pool_stats(),
+        "sql_result_cache": sql_result_cache_stats(),
+        "sql_cursors": sql_cursor_stats(),
+        "sql_budgets": sql_budget_stats(),
+    }
+
 # -----------------------------------------------------------Run Server-----------------------------------------------------------------
+async def _serve() -> None:
+    # FastMCP's lifespan runs per SSE session, so process-wide resources are opened/closed here instead.
+    await start_http_client()
+    try:
+        await mcp.run_sse_async()
+    finally:
+        await close_http_client()
+        HTTP_CACHE.close()
+        SEARCH_CACHE.close()
+
 if __name__ == "__main__":
-    mcp.run(transport="sse")
+    POOL.warm()
+    CATALOG.ensure()
+    ensure_rollups()
+    SERIES.ensure()
+    try:
+        anyio.run(_serve)
+    finally:
+        shutdown_dispatch()
+        rag_batcher.close()
+        POOL.close()
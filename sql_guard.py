@@ -0,0 +1,192 @@
+# https://www.sqlite.org/eqp.html
+from __future__ import annotations
+import os, re, math, sqlite3
+from collections import defaultdict
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+GUARD_MODE = os.getenv("SQL_GUARD_MODE", "enforce")  # enforce | warn | off
+GUARD_COST_BUDGET = float(os.getenv("SQL_GUARD_COST_BUDGET", "5000000"))
+GUARD_LARGE_TABLE_ROWS = int(os.getenv("SQL_GUARD_LARGE_TABLE_ROWS", "100000"))
+UNKNOWN_TABLE_ROWS = 1000
+
+_TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<comment>--[^\n]*|/\*.*?(?:\*/|$))
+    |(?P<str>'(?:[^']|'')*'?)
+    |(?P<ident>"(?:[^"]|"")*"?|`[^`]*`?|\[[^\]]*\]?)
+    |(?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    |(?P<num>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+    |(?P<param>[:@$][A-Za-z0-9_]+|\?\d*)
+    |(?P<op>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_KEYWORDS = {
+    "select", "from", "where", "group", "order", "by", "having", "limit", "offset", "join", "inner", "left",
+    "right", "full", "outer", "cross", "natural", "on", "using", "union", "all", "except", "intersect", "as",
+    "with", "and", "or", "not", "window", "values", "recursive", "case", "when", "then", "else", "end",
+}
+
+def tokenize(sql: str) -> List[Tuple[str, str, int]]:
+    """Split SQL into (kind, text, paren_depth) tokens, skipping whitespace and comments."""
+    out: List[Tuple[str, str, int]] = []
+    depth = 0
+    for m in _TOKEN.finditer(sql):
+        kind, text = m.lastgroup, m.group()
+        if kind in ("ws", "comment"):
+            continue
+        if text == ")":
+            depth = max(depth - 1, 0)
+        out.append((kind, text, depth))
+        if text == "(":
+            depth += 1
+    return out
+
+def has_outer_limit(sql: str) -> bool:
+    """True if the statement has a LIMIT clause at the outermost level (not inside a subquery/CTE)."""
+    return any(k == "word" and d == 0 and t.lower() == "limit" for k, t, d in tokenize(sql))
+
+def inject_limit(sql: str, row_limit: int) -> str:
+    """Append `LIMIT row_limit` to the outermost statement unless it already has one."""
+    if not row_limit or has_outer_limit(sql):
+        return sql
+    return f"{sql.rstrip()}\nLIMIT {int(row_limit)}"
+
+def table_aliases(sql: str, names: List[str]) -> Dict[str, str]:
+    """Map every alias (and bare name) used in FROM/JOIN clauses to its table or CTE name."""
+    known = {n.lower(): n for n in names}
+    toks = [(k, t.strip('"`[]') if k == "ident" else t) for k, t, _ in tokenize(sql)]
+    for i, (k, t) in enumerate(toks):
+        if (k == "word" and t.lower() in ("with", "recursive")) or (k == "op" and t == ","):
+            if i + 3 < len(toks) and toks[i + 2][1].lower() == "as" and toks[i + 3][1] == "(" and toks[i + 1][0] in ("word", "ident"):
+                known.setdefault(toks[i + 1][1].lower(), toks[i + 1][1])
+    aliases: Dict[str, str] = {}
+    for i, (k, t) in enumerate(toks):
+        if k not in ("word", "ident") or t.lower() not in known:
+            continue
+        name = known[t.lower()]
+        aliases[t.lower()] = name
+        j = i + 1
+        if j < len(toks) and toks[j][1].lower() == "as":
+            j += 1
+        if j < len(toks) and toks[j][0] in ("word", "ident") and toks[j][1].lower() not in _KEYWORDS:
+            aliases[toks[j][1].lower()] = name
+    return aliases
+
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\S+)")
+_SEARCH = re.compile(r"^SEARCH (?:TABLE )?(\S+)")
+_NESTED = re.compile(r"^(MATERIALIZE|CO-ROUTINE) (?:SUBQUERY )?(\S+)")
+_CORRELATED = re.compile(r"^CORRELATED (SCALAR|LIST) SUBQUERY")
+
+def analyze_plan(
+    plan: List[Tuple[int, int, int, str]],
+    row_counts: Dict[str, int],
+    aliases: Dict[str, str],
+    budget: float = GUARD_COST_BUDGET,
+    large_table_rows: int = GUARD_LARGE_TABLE_ROWS,
+) -> Dict[str, Any]:
+    """
+    Estimate the rows visited by an EXPLAIN QUERY PLAN and flag risky shapes.
+    SCAN costs the table's row count, SEARCH roughly log2 of it, nested loops multiply,
+    and a correlated subquery costs its own plan once per outer row.
+    """
+    children: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+    for node_id, parent, _, detail in plan:
+        children[parent].append((node_id, detail))
+    produced: Dict[str, float] = {}
+    reasons: List[str] = []
+
+    def rows_of(name: str) -> float:
+        target = aliases.get(name.lower(), name)
+        if target in produced:
+            return produced[target]
+        return float(row_counts.get(target, UNKNOWN_TABLE_ROWS))
+
+    def walk(parent: int) -> Tuple[float, float]:
+        loop, total, scans = 1.0, 0.0, []
+        for node_id, detail in children.get(parent, []):
+            if detail.startswith("SCAN CONSTANT ROW"):
+                continue
+            m = _NESTED.match(detail)
+            if m:
+                sub_loop, sub_total = walk(node_id)
+                produced[m.group(2)] = sub_loop
+                total += sub_total
+                continue
+            m = _CORRELATED.match(detail)
+            if m:
+                _, sub_total = walk(node_id)
+                cost = loop * sub_total
+                total += cost
+                if cost > budget / 10:
+                    reasons.append(f"Correlated {m.group(1).lower()} subquery re-runs ~{sub_total:,.0f} row visits for each of ~{loop:,.0f} outer rows.")
+                continue
+            m = _SCAN.match(detail)
+            if m:
+                name = m.group(1)
+                n = rows_of(name)
+                target = aliases.get(name.lower(), name)
+                if target in row_counts and n >= large_table_rows:
+                    reasons.append(f"Full scan of large table {target} (~{n:,.0f} rows).")
+                scans.append(target)
+                loop *= max(n, 1.0)
+                total += loop
+                continue
+            m = _SEARCH.match(detail)
+            if m:
+                loop *= max(math.log2(max(rows_of(m.group(1)), 2.0)), 1.0)
+                total += loop
+                continue
+            if children.get(node_id):
+                _, sub_total = walk(node_id)
+                total += sub_total
+        if len(scans) > 1:
+            reasons.append(f"Cartesian/unindexed join: {' x '.join(scans)} are all fully scanned in one nested loop.")
+        return loop, total
+
+    _, cost = walk(0)
+    if cost > budget:
+        verdict = "reject"
+        reasons.insert(0, f"Estimated ~{cost:,.0f} row visits exceeds the budget of {budget:,.0f}.")
+    elif reasons:
+        verdict = "warn"
+    else:
+        verdict = "ok"
+    return {"verdict": verdict, "reasons": list(dict.fromkeys(reasons)), "estimated_cost": int(cost)}
+
+def explain_bindings(sql: str, params: Union[Dict[str, Any], Sequence[Any]]) -> Union[Dict[str, Any], Sequence[Any]]:
+    """
+    Parameters for EXPLAIN (values don't change the plan): the caller's sequence as is; otherwise None for every
+    placeholder, as a tuple sized by SQLite's numbering when the query uses ? / ?NNN, else a dict of names.
+    """
+    if not isinstance(params, dict):
+        return params
+    tokens = [t for k, t, _ in tokenize(sql) if k == "param"]
+    if not any(t[0] == "?" for t in tokens):
+        return {**{t[1:]: None for t in tokens}, **params}
+    top, names = 0, set()
+    for t in tokens:  # ? takes the largest index so far + 1, ?NNN takes NNN, a new name takes the next index
+        if t == "?":
+            top += 1
+        elif t[0] == "?":
+            top = max(top, int(t[1:]))
+        elif t not in names:
+            names.add(t)
+            top += 1
+    return (None,) * top
+
+def guard_query(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: Union[Dict[str, Any], Sequence[Any]],
+    row_counts: Dict[str, int],
+    budget: float = GUARD_COST_BUDGET,
+) -> Dict[str, Any]:
+    """Run EXPLAIN QUERY PLAN for `sql` and return {verdict, reasons, estimated_cost, plan}."""
+    plan = [tuple(r) for r in conn.execute("EXPLAIN QUERY PLAN " + sql, explain_bindings(sql, params)).fetchall()]
+    aliases = table_aliases(sql, list(row_counts))
+    out = analyze_plan(plan, row_counts, aliases, budget=budget)
+    out["plan"] = [r[3] for r in plan]
+    return out
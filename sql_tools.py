@@ -1,8 +1,11 @@
 # https://python.langchain.com/docs/tutorials/sql_qa/
 from __future__ import annotations
-import os, re, time, sqlite3, json
-from typing import Any, Dict, List, Optional, Tuple
+import os, re, io, csv, time, base64, sqlite3, json, queue, threading, secrets
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Sequence, Tuple
 from mcp.server.fastmcp import FastMCP
+from sql_guard import GUARD_MODE, GUARD_COST_BUDGET, tokenize, inject_limit, guard_query
 
 DB_PATH = "data/company_data/Company_data.db"
 
@@ -11,28 +14,485 @@ if not DB_PATH:
         "Set SQLITE_DB_PATH to your SQLite file, e.g. export SQLITE_DB_PATH=/mnt/data/monthly_kpis.db"
     )
 
+DB_FILE = os.path.abspath(DB_PATH)
 # https://www.sqlite.org/uri.html
-DB_URI = f"file:{os.path.abspath(DB_PATH)}?mode=ro&immutable=1&cache=shared"
+# No cache=shared: cursor/stream connections outlive POOL.reset(), and a shared cache they keep open would be
+# reused by new connections after the file is swapped, serving the old data.
+DB_URI = f"file:{DB_FILE}?mode=ro&immutable=1"
 
 DISALLOWED = re.compile(
     r"\b(INSERT|UPDATE|DELETE|DROP|ALTER|TRUNCATE|CREATE|REPLACE|ATTACH|DETACH|VACUUM|PRAGMA)\b",
     re.IGNORECASE
 )
 
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+POOL_TIMEOUT_S = float(os.getenv("SQLITE_POOL_TIMEOUT_S", "10"))
+
 def ro_connect() -> sqlite3.Connection:
     return sqlite3.connect(DB_URI, uri=True, check_same_thread=False)
 
+class ConnectionPool:
+    """
+    Bounded pool of long-lived read-only connections (to `DB_URI` unless another `connect` factory is given).
+    Connections are checked out with `pool.connection()` and returned when the block exits.
+    A connection that fails its health check (`SELECT 1`) is closed and replaced.
+    """
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        timeout_s: float = POOL_TIMEOUT_S,
+        connect: Callable[[], sqlite3.Connection] = ro_connect,
+    ):
+        self.size = max(int(size), 1)
+        self._connect = connect
+        self.timeout_s = timeout_s
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._replaced = 0
+        self._generation = 0
+        self._conn_generation: Dict[int, int] = {}
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+            generation = self._generation
+        try:
+            conn = self._connect()
+            with self._lock:
+                self._conn_generation[id(conn)] = generation
+            return conn
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._conn_generation.pop(id(conn), None)
+
+    @staticmethod
+    def _healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    def warm(self, n: Optional[int] = None) -> int:
+        """Open up to `n` (default: pool size) connections ahead of the first request."""
+        opened = 0
+        for _ in range(min(n or self.size, self.size)):
+            conn = self._open()
+            if conn is None:
+                break
+            self._idle.put_nowait(conn)
+            opened += 1
+        return opened
+
+    def _checkout(self) -> sqlite3.Connection:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+                if conn is None:
+                    with self._lock:
+                        self._waits += 1
+                    try:
+                        conn = self._idle.get(timeout=self.timeout_s)
+                    except queue.Empty:
+                        raise TimeoutError(f"No SQLite connection available after {self.timeout_s}s.")
+            if self._healthy(conn):
+                break
+            self._discard(conn)
+            with self._lock:
+                self._replaced += 1
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+        return conn
+
+    def _checkin(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._in_use -= 1
+            stale = self._conn_generation.get(id(conn)) != self._generation
+        if stale:
+            self._discard(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except Exception:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "idle": self._idle.qsize(),
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "replaced": self._replaced,
+                "generation": self._generation,
+            }
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def reset(self) -> None:
+        """Drop every connection opened against the previous DB file; in-use ones are closed on return."""
+        with self._lock:
+            self._generation += 1
+        self.close()
+
+POOL = ConnectionPool()
+
+SCHEMA_SAMPLE_CAP = int(os.getenv("SQLITE_SCHEMA_SAMPLE_CAP", "10"))
+
+def db_fingerprint() -> Tuple[str, int, int]:
+    """Identity of the DB file: (path, mtime_ns, size)."""
+    st = os.stat(DB_FILE)
+    return (DB_FILE, st.st_mtime_ns, st.st_size)
+
+class SchemaCatalog:
+    """
+    In-process copy of the database metadata (tables, DDL, columns, first sample rows).
+    The DB is opened immutable, so it is built once and only rebuilt when the file fingerprint changes.
+    """
+    def __init__(self, sample_cap: int = SCHEMA_SAMPLE_CAP):
+        self.sample_cap = sample_cap
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[Tuple[str, int, int]] = None
+        self._tables: List[str] = []
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._compact: Dict[str, str] = {}
+        self._row_counts: Dict[str, int] = {}
+        self.builds = 0
+
+    def _build(self, conn: sqlite3.Connection) -> None:
+        tables = _list_tables(conn)
+        info: Dict[str, Dict[str, Any]] = {}
+        compact: Dict[str, str] = {}
+        row_counts: Dict[str, int] = {}
+        for t in tables:
+            ddl_row = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type='table' AND name=?;", (t,)
+            ).fetchone()
+            cols = conn.execute(f"PRAGMA table_info('{t}')").fetchall()
+            col_info = [
+                {
+                    "cid": c[0],
+                    "name": c[1],
+                    "type": c[2],
+                    "notnull": c[3],
+                    "default": c[4],
+                    "pk": bool(c[5]),
+                }
+                for c in cols
+            ]
+            try:
+                cur = conn.execute(f"SELECT * FROM '{t}' LIMIT ?;", (self.sample_cap,))
+                samp_cols = [d[0] for d in cur.description]
+                samples = [dict(zip(samp_cols, r)) for r in cur.fetchall()]
+            except Exception as e:
+                samples = [{"error": str(e)}]
+            info[t] = {"ddl": ddl_row[0] if ddl_row else None, "columns": col_info, "samples": samples}
+            compact[t] = f"{t}(" + ", ".join(f"{c['name']} {c['type']}".strip() for c in col_info) + ")"
+            row_counts[t] = conn.execute(f"SELECT COUNT(*) FROM '{t}'").fetchone()[0]
+        self._tables, self._info, self._compact, self._row_counts = tables, info, compact, row_counts
+        self.builds += 1
+
+    def ensure(self) -> "SchemaCatalog":
+        fp = db_fingerprint()
+        if fp == self._fingerprint:
+            return self
+        with self._lock:
+            if fp != self._fingerprint:
+                if self._fingerprint is not None:
+                    POOL.reset()
+                    RESULT_CACHE.clear()
+                with POOL.connection() as conn:
+                    self._build(conn)
+                self._fingerprint = fp
+        return self
+
+    def tables(self) -> List[str]:
+        return list(self.ensure()._tables)
+
+    def table_info(self, table: str, sample_rows: int) -> Dict[str, Any]:
+        info = self.ensure()._info[table]
+        return {"ddl": info["ddl"], "columns": info["columns"], "samples": info["samples"][:max(sample_rows, 0)]}
+
+    def row_counts(self) -> Dict[str, int]:
+        return dict(self.ensure()._row_counts)
+
+    def compact(self, tables: Optional[List[str]] = None) -> str:
+        self.ensure()
+        target = self._tables if not tables else [t for t in self._tables if t in set(tables)]
+        return "\n".join(self._compact[t] for t in target)
+
+CATALOG = SchemaCatalog()
+
+RESULT_CACHE_BYTES = int(os.getenv("SQLITE_RESULT_CACHE_BYTES", str(8 * 1024 * 1024)))
+RESULT_CACHE_TTL_S = float(os.getenv("SQLITE_RESULT_CACHE_TTL_S", "600"))
+
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and lowercase everything outside quoted literals/identifiers."""
+    parts = _QUOTED.split(sql.strip())
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p).lower() for i, p in enumerate(parts))
+
+class ResultCache:
+    """
+    LRU + TTL cache of successful `sql_execute_query` results, bounded by the JSON size of the entries.
+    """
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES, ttl_s: float = RESULT_CACHE_TTL_S):
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(query: str, params: Dict[str, Any], row_limit: int) -> Tuple:
+        return (
+            db_fingerprint(),
+            normalize_sql(query),
+            json.dumps(params, sort_keys=True, default=str),
+            int(row_limit or 0),
+        )
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_s:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Tuple, result: Dict[str, Any]) -> None:
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic(), size, result)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: Tuple) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+RESULT_CACHE = ResultCache()
+
+QUERY_TIMEOUT_MS = int(os.getenv("SQLITE_QUERY_TIMEOUT_MS", "5000"))
+QUERY_MAX_VM_STEPS = int(os.getenv("SQLITE_QUERY_MAX_VM_STEPS", "200000000"))
+PROGRESS_EVERY = 1000  # VM instructions between progress-handler calls
+
+BUDGET_STATS: Dict[str, int] = {"queries": 0, "time_exceeded": 0, "vm_steps_exceeded": 0}
+_budget_lock = threading.Lock()
+
+class QueryBudget:
+    """
+    Wall-clock and VM-instruction budget for one SQLite call, enforced through the progress handler.
+    When the handler returns non-zero SQLite interrupts the statement (OperationalError: interrupted).
+    `0` disables a limit; `None` uses the global default.
+    """
+    def __init__(self, timeout_ms: Optional[int] = None, max_vm_steps: Optional[int] = None):
+        self.timeout_ms = QUERY_TIMEOUT_MS if timeout_ms is None else int(timeout_ms)
+        self.max_vm_steps = QUERY_MAX_VM_STEPS if max_vm_steps is None else int(max_vm_steps)
+        self.steps = 0
+        self.exceeded: Optional[str] = None
+        self._t0 = time.monotonic()
+
+    def restart(self) -> None:
+        """Fresh time/step window on the same budget (one per fetch batch of a long-lived stream)."""
+        self.steps = 0
+        self._t0 = time.monotonic()
+
+    def _tick(self) -> int:
+        self.steps += PROGRESS_EVERY
+        if self.max_vm_steps and self.steps > self.max_vm_steps:
+            self.exceeded = "vm_steps"
+            return 1
+        if self.timeout_ms and (time.monotonic() - self._t0) * 1000 > self.timeout_ms:
+            self.exceeded = "time"
+            return 1
+        return 0
+
+    @contextmanager
+    def attach(self, conn: sqlite3.Connection) -> Iterator["QueryBudget"]:
+        conn.set_progress_handler(self._tick, PROGRESS_EVERY)
+        try:
+            yield self
+        finally:
+            conn.set_progress_handler(None, 0)
+            with _budget_lock:
+                BUDGET_STATS["queries"] += 1
+                if self.exceeded:
+                    BUDGET_STATS[f"{self.exceeded}_exceeded"] += 1
+
+    def report(self, rows_fetched: int) -> Dict[str, Any]:
+        return {
+            "ok": False,
+            "error": "budget_exceeded",
+            "budget": self.exceeded,
+            "limits": {"timeout_ms": self.timeout_ms, "max_vm_steps": self.max_vm_steps},
+            "progress": {
+                "elapsed_ms": int((time.monotonic() - self._t0) * 1000),
+                "vm_steps": self.steps,
+                "rows_fetched": rows_fetched,
+            },
+            "message": f"Query aborted: {self.exceeded} budget exhausted. Narrow the query (filters, LIMIT, fewer joins).",
+        }
+
+CURSOR_IDLE_S = float(os.getenv("SQLITE_CURSOR_IDLE_S", "120"))
+CURSOR_MAX_OPEN = int(os.getenv("SQLITE_CURSOR_MAX_OPEN", "16"))
+
+class CursorStore:
+    """
+    Open server-side cursors for paginated queries, addressed by an opaque token.
+    Each cursor owns a dedicated connection (so it never starves the pool) and is closed after `idle_s` without use.
+    """
+    def __init__(self, idle_s: float = CURSOR_IDLE_S, max_open: int = CURSOR_MAX_OPEN):
+        self.idle_s = idle_s
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._cursors: Dict[str, Dict[str, Any]] = {}
+        self.expired = 0
+
+    def open(self, query: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Register a cursor; the statement runs on the first fetch (`execute`), under that call's budget."""
+        self.sweep()
+        entry = {
+            "conn": None,
+            "query": query,
+            "params": params,
+            "cur": None,
+            "cols": [],
+            "pending": [],
+            "fetched": 0,
+            "last_used": time.monotonic(),
+            "lock": threading.Lock(),
+        }
+        token = secrets.token_urlsafe(16)
+        with self._lock:  # check and reserve in one hold, so concurrent opens can't pass max_open
+            if len(self._cursors) >= self.max_open:
+                raise RuntimeError(f"Too many open cursors (max {self.max_open}); finish or let others expire.")
+            self._cursors[token] = entry
+        try:
+            entry["conn"] = ro_connect()
+        except Exception:
+            with self._lock:
+                self._cursors.pop(token, None)
+            raise
+        return token, entry
+
+    @staticmethod
+    def execute(entry: Dict[str, Any]) -> None:
+        if entry["cur"] is None:
+            cur = entry["conn"].execute(entry["query"], entry["params"])
+            entry["cur"], entry["cols"] = cur, [d[0] for d in cur.description] if cur.description else []
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        self.sweep()
+        with self._lock:
+            entry = self._cursors.get(token)
+        if entry is not None:
+            entry["last_used"] = time.monotonic()
+        return entry
+
+    def close(self, token: str) -> None:
+        with self._lock:
+            entry = self._cursors.pop(token, None)
+        if entry is not None:
+            try:
+                entry["conn"].close()
+            except Exception:
+                pass
+
+    def sweep(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            stale = [t for t, e in self._cursors.items() if now - e["last_used"] > self.idle_s]
+            self.expired += len(stale)
+        for t in stale:
+            self.close(t)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"open": len(self._cursors), "max_open": self.max_open, "expired": self.expired}
+
+CURSORS = CursorStore()
+
 def validate_sql(sql: str, allow_explain: bool = False) -> Tuple[bool, List[str]]:
     errs: List[str] = []
-    if ";" in sql.strip():
+    toks = tokenize(sql)
+    if any(t == ";" for k, t, _ in toks):
         errs.append("Semicolons not allowed (single-statement only).")
-    if DISALLOWED.search(sql):
+    if any(k == "word" and DISALLOWED.fullmatch(t) for k, t, _ in toks):
         errs.append("Disallowed keyword detected (DML/DDL/PRAGMA/etc.).")
-    s = sql.strip().lower()
     allowed_starts = ["select", "with"]
     if allow_explain:
         allowed_starts.append("explain")
-    if not any(s.startswith(p) for p in allowed_starts):
+    if not toks or toks[0][1].lower() not in allowed_starts:
         errs.append("Only SELECT/WITH are allowed.")
     return (len(errs) == 0, errs)
 
@@ -40,9 +500,11 @@ def sql_db_list_tables() -> List[str]:
     """
     Return the list of table names in the current database.
     """
-    with ro_connect() as conn:
-        cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-        return [r[0] for r in cur.fetchall()]
+    return CATALOG.tables()
+
+def _list_tables(conn: sqlite3.Connection) -> List[str]:
+    cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
+    return [r[0] for r in cur.fetchall()]
 
 def sql_db_schema(
     tables: Optional[List[str]] = None,
@@ -51,71 +513,321 @@ def sql_db_schema(
     """
     Return schema info (DDL + columns) and up to `sample_rows` sample rows for each table.
     """
+    all_tables = set(CATALOG.tables())
+    target = all_tables if not tables else set(tables) & all_tables
     out: Dict[str, Dict[str, Any]] = {}
-    with ro_connect() as conn:
-        all_tables = set(sql_db_list_tables()) 
-        target = all_tables if not tables else set(tables) & all_tables
-        for t in sorted(target):
-            ddl_row = conn.execute(
-                "SELECT sql FROM sqlite_master WHERE type='table' AND name=?;", (t,)
-            ).fetchone()
-            ddl = ddl_row[0] if ddl_row else None
-            cols = conn.execute(f"PRAGMA table_info('{t}')").fetchall()
-            col_info = [
-                {
-                    "cid": c[0],
-                    "name": c[1],
-                    "type": c[2],
-                    "notnull": c[3],
-                    "default": c[4],
-                    "pk": bool(c[5]),
-                }
-                for c in cols
-            ]
+    for t in sorted(target):
+        out[t] = CATALOG.table_info(t, sample_rows)
+        if sample_rows > CATALOG.sample_cap:
             try:
-                samp = conn.execute(f"SELECT * FROM '{t}' LIMIT ?;", (max(sample_rows, 0),)).fetchall()
-                samp_cols = [d[0] for d in conn.execute(f"SELECT * FROM '{t}' LIMIT 0").description]
-                samples = [dict(zip(samp_cols, r)) for r in samp]
+                with POOL.connection() as conn:
+                    cur = conn.execute(f"SELECT * FROM '{t}' LIMIT ?;", (sample_rows,))
+                    samp_cols = [d[0] for d in cur.description]
+                    out[t]["samples"] = [dict(zip(samp_cols, r)) for r in cur.fetchall()]
             except Exception as e:
-                samples = [{"error": str(e)}]
-            out[t] = {"ddl": ddl, "columns": col_info, "samples": samples}
+                out[t]["samples"] = [{"error": str(e)}]
     return out
 
+def sql_db_schema_compact(tables: Optional[List[str]] = None) -> str:
+    """
+    Return a ready-made SCHEMA string, one line per table: table(col type, ...).
+    """
+    return CATALOG.compact(tables)
+
+ResultFormat = Literal["records", "columnar", "csv", "arrow"]
+RESULT_FORMATS = ("records", "columnar", "csv", "arrow")
+
+def encode_rows(cols: List[str], rows: Sequence[Sequence[Any]], fmt: str = "records") -> Any:
+    """
+    Encode raw result rows:
+    - records: [{col: value, ...}, ...]
+    - columnar: [[values of col 0], [values of col 1], ...] (same order as `cols`)
+    - csv: CSV text with a header line
+    - arrow: base64 Arrow IPC stream (needs pyarrow)
+    """
+    if fmt == "records":
+        return [dict(zip(cols, r)) for r in rows]
+    if fmt == "columnar":
+        return [list(c) for c in zip(*rows)] if rows else [[] for _ in cols]
+    if fmt == "csv":
+        buf = io.StringIO()
+        w = csv.writer(buf, lineterminator="\n")
+        w.writerow(cols)
+        w.writerows(rows)
+        return buf.getvalue()
+    if fmt == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError("format='arrow' needs pyarrow installed; use 'csv' or 'columnar' instead.")
+        columns = [list(c) for c in zip(*rows)] if rows else [[] for _ in cols]
+        table = pa.table({c: columns[i] for i, c in enumerate(cols)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii")
+    raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(RESULT_FORMATS)}.")
+
+def _encoded(cols: List[str], rows: Sequence[Sequence[Any]], fmt: str) -> Dict[str, Any]:
+    payload = encode_rows(cols, rows, fmt)
+    size = len(payload.encode("utf-8")) if isinstance(payload, str) else len(json.dumps(payload, default=str))
+    return {"format": fmt, "rows": payload, "bytes": size}
+
 def sql_execute_query(
     query: str,
     params: Optional[Dict[str, Any]] = None,
-    row_limit: int = 10000
+    row_limit: int = 10000,
+    format: ResultFormat = "records",
+    timeout_ms: Optional[int] = None,
+    max_vm_steps: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Execute a provided SQL query (SQLite) safely and return rows.
     Input to this tool is a detailed and correct SQL query (use :name parameters).
-    Output is {cols, rows, row_count, duration_ms, truncated}.
+    `format` selects the rows encoding: records (list of dicts), columnar (one list per column), csv or arrow (base64 IPC).
+    A LIMIT of `row_limit` is added to the outermost SELECT when it has none, and the plan is checked first:
+    an over-budget plan is rejected with error="guard_rejected", riskier shapes come back with guard.verdict="warn".
+    Execution is capped by `timeout_ms` and `max_vm_steps` (defaults from SQLITE_QUERY_TIMEOUT_MS / SQLITE_QUERY_MAX_VM_STEPS);
+    an aborted query returns error="budget_exceeded" with the progress it made.
+    Output is {cols, format, rows, bytes, row_count, duration_ms, truncated, guard, cache}.
     """
     params = params or {}
+    if format not in RESULT_FORMATS:
+        return {"ok": False, "error": "validation_failed", "details": [f"Unknown format {format!r}."]}
     ok, errs = validate_sql(query, allow_explain=False)
     if not ok:
         return {"ok": False, "error": "validation_failed", "details": errs}
 
-    if row_limit and not re.search(r"\blimit\s+\d+\b", query, re.IGNORECASE):
-        query = f"SELECT * FROM ({query}) __sub LIMIT {int(row_limit)}"
+    CATALOG.ensure()  # picks up a swapped-in DB file (recycles pool + cache)
+    cache_key = ResultCache.key(query, params, row_limit)
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        result = {**cached, "duration_ms": 0}
+    else:
+        limited = _apply_row_limit(query, row_limit)
+        guard = _plan_guard(limited, params)
+        stopped = _guard_stop(guard)
+        if stopped is not None:
+            return stopped
+        result = _run_query(limited, params, row_limit, QueryBudget(timeout_ms, max_vm_steps))
+        if not result["ok"]:
+            return result
+        result["guard"] = guard
+        RESULT_CACHE.put(cache_key, result)
+    try:
+        encoded = _encoded(result["cols"], result["rows"], format)
+    except Exception as e:
+        return {"ok": False, "error": "encoding_error", "message": str(e)}
+    return {**result, **encoded, "cache": {"hit": cached is not None, **_cache_counters()}}
+
+def _run_query(
+    query: str,
+    params: Dict[str, Any],
+    row_limit: int,
+    budget: Optional[QueryBudget] = None
+) -> Dict[str, Any]:
+    budget = budget or QueryBudget()
+    rows: List[Tuple] = []
     t0 = time.time()
     try:
-        with ro_connect() as conn:
+        with POOL.connection() as conn, budget.attach(conn):
             cur = conn.execute(query, params)
             cols = [d[0] for d in cur.description] if cur.description else []
-            rows = cur.fetchall()
+            while True:
+                batch = cur.fetchmany(1000)
+                if not batch:
+                    break
+                rows.extend(batch)
         ms = int((time.time() - t0) * 1000)
         return {
             "ok": True,
             "cols": cols,
-            "rows": [dict(zip(cols, r)) for r in rows],
+            "rows": rows,
             "row_count": len(rows),
             "duration_ms": ms,
             "truncated": bool(row_limit and len(rows) >= row_limit),
         }
     except Exception as e:
+        if budget.exceeded:
+            return budget.report(len(rows))
         return {"ok": False, "error": "execution_error", "message": str(e)}
 
+def sql_execute_query_paged(
+    query: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    page_size: int = 200,
+    cursor: Optional[str] = None,
+    row_limit: int = 10000,
+    format: ResultFormat = "records",
+    timeout_ms: Optional[int] = None,
+    max_vm_steps: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Execute a SQL query page by page.
+    First call: pass `query` (and `params`); the response holds the first page and a `cursor` token when more rows exist.
+    Next calls: pass only `cursor` to get the following page. Cursors expire after a period of inactivity.
+    The first call goes through the same plan guard as sql_execute_query (error="guard_rejected", or `guard` on page 1).
+    `timeout_ms` / `max_vm_steps` apply to each call (page), not to the whole result.
+    Output is {cols, format, rows, bytes, row_count, offset, has_more, cursor}.
+    """
+    budget = QueryBudget(timeout_ms, max_vm_steps)
+    if format not in RESULT_FORMATS:
+        return {"ok": False, "error": "validation_failed", "details": [f"Unknown format {format!r}."]}
+    page_size = max(1, min(int(page_size), 10000))
+    guard = None
+    if cursor:
+        entry = CURSORS.get(cursor)
+        if entry is None:
+            return {"ok": False, "error": "cursor_expired", "message": "Unknown or expired cursor; re-run the query."}
+        token = cursor
+    else:
+        if not query:
+            return {"ok": False, "error": "validation_failed", "details": ["Provide a query or a cursor."]}
+        ok, errs = validate_sql(query, allow_explain=False)
+        if not ok:
+            return {"ok": False, "error": "validation_failed", "details": errs}
+        limited = _apply_row_limit(query, row_limit)
+        guard = _plan_guard(limited, params or {})
+        stopped = _guard_stop(guard)
+        if stopped is not None:
+            return stopped
+        try:
+            token, entry = CURSORS.open(limited, params or {})
+        except Exception as e:
+            return {"ok": False, "error": "execution_error", "message": str(e)}
+
+    with entry["lock"]:
+        try:
+            want = page_size + 1 - len(entry["pending"])
+            # One budget attach per call: on the first call it covers running the statement and the first page.
+            with budget.attach(entry["conn"]):
+                CURSORS.execute(entry)
+                batch = entry["pending"] + (entry["cur"].fetchmany(want) if want > 0 else [])
+        except Exception as e:
+            CURSORS.close(token)
+            if budget.exceeded:
+                return budget.report(entry["fetched"])
+            return {"ok": False, "error": "execution_error", "message": str(e)}
+        page, entry["pending"] = batch[:page_size], batch[page_size:]
+        offset = entry["fetched"]
+        entry["fetched"] += len(page)
+        has_more = bool(entry["pending"])
+    cols = entry["cols"]
+    if not has_more:
+        CURSORS.close(token)
+    try:
+        encoded = _encoded(cols, page, format)
+    except Exception as e:
+        return {"ok": False, "error": "encoding_error", "message": str(e)}
+    return {
+        "ok": True,
+        "cols": cols,
+        **encoded,
+        "row_count": len(page),
+        "offset": offset,
+        "has_more": has_more,
+        "cursor": token if has_more else None,
+        **({"guard": guard} if guard is not None else {}),
+    }
+
+def iter_query_rows(
+    query: str,
+    params: Optional[Dict[str, Any]] = None,
+    row_limit: int = 10000,
+    batch_size: int = 500,
+    timeout_ms: Optional[int] = None,
+    max_vm_steps: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a validated query as dicts, `batch_size` rows at a time (for HTTP streaming).
+    Validation and the plan guard run eagerly, before the first row is requested: raises ValueError if the
+    query fails validation, sqlite3.Error if SQLite cannot compile it, and QueryRejected if the guard rejects its plan.
+    `timeout_ms` / `max_vm_steps` apply to each fetch batch; when a batch exhausts them the stream ends with
+    one error="budget_exceeded" object instead of a row, and any other SQLite error ends it with error="execution_error".
+    The stream reads on its own connection (as CursorStore does): a slow consumer never holds a POOL connection.
+    """
+    ok, errs = validate_sql(query, allow_explain=False)
+    if not ok:
+        raise ValueError("; ".join(errs))
+    CATALOG.ensure()
+    limited = _apply_row_limit(query, row_limit)
+    guard = _plan_guard(limited, params or {})
+    if guard is not None and guard["verdict"] == "error":
+        raise sqlite3.OperationalError(guard["message"])
+    if _guard_rejects(guard):
+        raise QueryRejected(guard)
+    return _stream_rows(limited, params or {}, batch_size, QueryBudget(timeout_ms, max_vm_steps))
+
+def _stream_rows(query: str, params: Dict[str, Any], batch_size: int, budget: QueryBudget) -> Iterator[Dict[str, Any]]:
+    fetched = 0
+    conn = ro_connect()
+    try:
+        with budget.attach(conn):
+            cur = conn.execute(query, params)
+            cols = [d[0] for d in cur.description] if cur.description else []
+            while True:
+                budget.restart()  # time spent waiting on the client between batches is not query time
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                fetched += len(batch)
+                for r in batch:
+                    yield dict(zip(cols, r))
+    except sqlite3.Error as e:
+        # The 200 response has started: the error becomes the last object of the stream.
+        yield budget.report(fetched) if budget.exceeded else {"ok": False, "error": "execution_error", "message": str(e), "rows_fetched": fetched}
+    finally:
+        conn.close()
+
+def _apply_row_limit(query: str, row_limit: int) -> str:
+    return inject_limit(query, row_limit)
+
+class QueryRejected(ValueError):
+    """Raised by iter_query_rows when the plan guard rejects the query; `guard` holds the verdict."""
+    def __init__(self, guard: Dict[str, Any]):
+        super().__init__("Plan guard rejected the query: " + " ".join(guard.get("reasons") or []))
+        self.guard = guard
+
+def _plan_guard(query: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """check_query_plan verdict without the raw plan, or None when SQL_GUARD_MODE=off."""
+    if GUARD_MODE == "off":
+        return None
+    guard = check_query_plan(query, params)
+    guard.pop("plan", None)
+    return guard
+
+def _guard_rejects(guard: Optional[Dict[str, Any]]) -> bool:
+    return guard is not None and guard["verdict"] == "reject" and GUARD_MODE == "enforce"
+
+def _guard_stop(guard: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Error response when the query must not run: execution_error if SQLite can't compile it, guard_rejected on cost."""
+    if guard is not None and guard["verdict"] == "error":
+        return {"ok": False, "error": "execution_error", "message": guard["message"]}
+    if _guard_rejects(guard):
+        return {"ok": False, "error": "guard_rejected", "guard": guard}
+    return None
+
+def check_query_plan(
+    query: str,
+    params: Optional[Dict[str, Any]] = None,
+    budget: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Cost guard run before execution: EXPLAIN QUERY PLAN + row counts from the catalog.
+    Returns {verdict: ok|warn|reject, reasons, estimated_cost, plan}, or verdict "error" with the SQLite `message`
+    when EXPLAIN fails (syntax error, unknown column...): the query is wrong, not too expensive.
+    """
+    row_counts = CATALOG.row_counts()
+    try:
+        with POOL.connection() as conn:
+            return guard_query(conn, query, params or {}, row_counts, budget=budget or GUARD_COST_BUDGET)
+    except sqlite3.Error as e:
+        return {"verdict": "error", "message": str(e), "reasons": [], "estimated_cost": None, "plan": []}
+
+def _cache_counters() -> Dict[str, int]:
+    st = RESULT_CACHE.stats()
+    return {"hits": st["hits"], "misses": st["misses"]}
+
 
 def sql_db_query_checker(
     dialect: str,
@@ -136,18 +848,53 @@ def sql_db_query_checker(
         notes.append("Consider selecting only relevant columns (avoid SELECT *).")
     if " not in " in query.lower():
         notes.append("Check NOT IN vs NULL semantics for your dialect.")
+    if ok and GUARD_MODE != "off" and not query.strip().lower().startswith("explain"):
+        guard = check_query_plan(query)
+        if guard["verdict"] == "error":
+            notes.append(f"SQLite cannot compile the query: {guard['message']}")
+        elif guard["verdict"] != "ok":
+            notes.append(f"Plan guard {guard['verdict']}: " + " ".join(guard["reasons"]))
     return {"fixed_query": query, "notes": "; ".join(notes) or "no changes"}
 
 def sql_db_explain(query: str) -> Dict[str, Any]:
     """
-    Return SQLite EXPLAIN QUERY PLAN for the provided SELECT/WITH query.
+    Return SQLite EXPLAIN QUERY PLAN for the provided SELECT/WITH query, with the plan guard verdict.
     """
     ok, errs = validate_sql(query, allow_explain=True)
     if not ok:
         return {"ok": False, "error": "validation_failed", "details": errs}
     try:
-        with ro_connect() as conn:
+        row_counts = CATALOG.row_counts()
+        with POOL.connection() as conn:
             plan_rows = conn.execute("EXPLAIN QUERY PLAN " + query).fetchall()
-        return {"ok": True, "plan": [tuple(r) for r in plan_rows]}
+            guard = guard_query(conn, query, {}, row_counts)
+        guard.pop("plan", None)
+        return {"ok": True, "plan": [tuple(r) for r in plan_rows], "guard": guard}
     except Exception as e:
         return {"ok": False, "error": "execution_error", "message": str(e)}
+
+def sql_pool_stats() -> Dict[str, int]:
+    """
+    Return connection pool metrics (size, open, idle, in_use, checkouts, waits, replaced).
+    """
+    return POOL.stats()
+
+def sql_budget_stats() -> Dict[str, int]:
+    """
+    Return execution budget metrics (queries, time_exceeded, vm_steps_exceeded).
+    """
+    with _budget_lock:
+        return dict(BUDGET_STATS)
+
+def sql_cursor_stats() -> Dict[str, int]:
+    """
+    Return paginated-cursor metrics (open, max_open, expired).
+    """
+    return CURSORS.stats()
+
+def sql_result_cache_stats() -> Dict[str, Any]:
+    """
+    Return result cache metrics (entries, bytes, hits, misses, evictions, hit_ratio).
+    """
+    return RESULT_CACHE.stats()
+
@@ -0,0 +1,85 @@
+# Runs blocking MCP tools off the event loop so one slow web search / Gemini call doesn't stall every SSE session.
+# - offload(): wraps a sync tool into an async one executed on a bounded thread pool, with a concurrency limit shared by
+#   every tool of the same group (e.g. all SQL tools together share SQL_LIMIT).
+# - run_cpu(): runs a picklable module-level function on a process pool (CPU-bound parsing, etc.).
+from __future__ import annotations
+import os, asyncio, functools, threading, multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+THREAD_WORKERS = int(os.getenv("MCP_THREAD_WORKERS", "32"))
+PROCESS_WORKERS = int(os.getenv("MCP_PROCESS_WORKERS", str(max((os.cpu_count() or 2) // 2, 1))))
+
+_thread_pool = ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix="mcp-tool")
+_process_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+STATS: Dict[str, Dict[str, int]] = {}
+
+def _process_executor() -> ProcessPoolExecutor:
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn: workers must not inherit the parent's SQLite connections / model threads
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+def _count(name: str, key: str, delta: int = 1) -> None:
+    with _stats_lock:
+        st = STATS.setdefault(name, {"calls": 0, "active": 0, "waiting": 0, "peak_active": 0, "errors": 0})
+        st[key] += delta
+        st["peak_active"] = max(st["peak_active"], st["active"])
+
+async def _run(name: str, group: str, limit: int, executor: Any, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    if group not in _semaphores:
+        _semaphores[group] = asyncio.Semaphore(limit)
+    sem = _semaphores[group]
+    _count(name, "calls")
+    _count(name, "waiting")
+    async with sem:
+        _count(name, "waiting", -1)
+        _count(name, "active")
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            _count(name, "errors")
+            raise
+        finally:
+            _count(name, "active", -1)
+
+def offload(limit: int = 8, name: Optional[str] = None, group: Optional[str] = None) -> Callable:
+    """
+    Decorator: turn a blocking tool into an async one that runs on the shared thread pool.
+    Tools with the same `group` share one limit of `limit` concurrent calls (the first tool of a group sets it);
+    without a group the tool gets its own. Stats stay per tool `name`.
+    """
+    def deco(fn: Callable) -> Callable:
+        key = name or fn.__name__
+        sem_key = group or key
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return await _run(key, sem_key, limit, _thread_pool, fn, *args, **kwargs)
+        return wrapper
+    return deco
+
+async def run_cpu(fn: Callable, *args: Any, limit: int = PROCESS_WORKERS, name: Optional[str] = None, **kwargs: Any) -> Any:
+    """Run a CPU-bound, picklable module-level function on the process pool."""
+    key = name or fn.__name__
+    return await _run(key, key, limit, _process_executor(), fn, *args, **kwargs)
+
+def dispatch_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            "thread_workers": THREAD_WORKERS,
+            "process_workers": PROCESS_WORKERS,
+            "tools": {k: dict(v) for k, v in STATS.items()},
+        }
+
+def shutdown() -> None:
+    global _process_pool
+    _thread_pool.shutdown(wait=False, cancel_futures=True)
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
@@ -0,0 +1,114 @@
+# Benchmark of the fetch extraction tiers over a saved corpus of HTML pages.
+# usage:
+#   python unit_testing/bench_extract.py save https://example.com/a https://example.com/b   # snapshot pages into the corpus
+#   python unit_testing/bench_extract.py run [--reference node|python|gold]                 # latency + text overlap table
+# Overlap is token-level F1 of the fast tier's text against the reference (Node Readability by default). "gold" is
+# the hand-labeled main content of the committed corpus (elements marked data-gold; the extractor ignores data-*).
+# The min_score sweep shows which pages each threshold would send to Readability.
+import os, re, sys, time, hashlib, statistics
+from collections import Counter
+import click
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from html_extract import fast_extract, readability_extract, extract_main_html, EXTRACT_MIN_SCORE  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html_corpus")
+
+def _tokens(html: str) -> Counter:
+    import lxml.html
+    if not html.strip():
+        return Counter()
+    text = lxml.html.fromstring(html).text_content()
+    return Counter(re.findall(r"\w+", text.lower()))
+
+def overlap_f1(a: str, b: str) -> float:
+    ta, tb = _tokens(a), _tokens(b)
+    common = sum((ta & tb).values())
+    if not common:
+        return 0.0
+    p, r = common / sum(ta.values()), common / sum(tb.values())
+    return 2 * p * r / (p + r)
+
+def _gold(html: str) -> str:
+    import lxml.html
+    root = lxml.html.document_fromstring(html)
+    return "".join(lxml.html.tostring(el, encoding="unicode", with_tail=False) for el in root.xpath("//*[@data-gold]"))
+
+def _reference(html: str, kind: str) -> str:
+    if kind == "gold":
+        return _gold(html)
+    if kind == "node":
+        return readability_extract(html)
+    from readabilipy.simple_json import simple_json_from_html_string
+    return (simple_json_from_html_string(html, use_readability=False) or {}).get("content") or ""
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - t0) * 1000
+
+@click.group()
+def cli():
+    """Extraction tier benchmark."""
+
+@cli.command()
+@click.argument("urls", nargs=-1, required=True)
+@click.option("--corpus", default=CORPUS_DIR, show_default=True)
+def save(urls, corpus):
+    """Download pages into the corpus directory."""
+    os.makedirs(corpus, exist_ok=True)
+    with httpx.Client(follow_redirects=True, timeout=20, headers={"User-Agent": "Mozilla/5.0"}) as client:
+        for url in urls:
+            try:
+                r = client.get(url)
+                r.raise_for_status()
+            except Exception as e:
+                click.echo(f"skip {url}: {e}")
+                continue
+            name = re.sub(r"[^\w.-]+", "_", httpx.URL(url).host)[:60] + "_" + hashlib.sha1(url.encode()).hexdigest()[:8] + ".html"
+            with open(os.path.join(corpus, name), "w", encoding="utf-8") as f:
+                f.write(r.text)
+            click.echo(f"saved {url} -> {name}")
+
+@cli.command()
+@click.option("--corpus", default=CORPUS_DIR, show_default=True)
+@click.option("--reference", type=click.Choice(["node", "python", "gold"]), default="node", show_default=True)
+def run(corpus, reference):
+    """Compare fast tier vs reference extractor: latency and token-F1 overlap per page."""
+    files = sorted(f for f in os.listdir(corpus) if f.endswith((".html", ".htm"))) if os.path.isdir(corpus) else []
+    if not files:
+        raise click.ClickException(f"No .html files in {corpus}; populate it with the `save` command.")
+    fast_ms, ref_ms, tiered_ms, f1s, scores, fallbacks = [], [], [], [], [], 0
+    click.echo(f"{'page':40} {'fast_ms':>8} {'ref_ms':>8} {'score':>6} {'f1':>6} tier")
+    for name in files:
+        with open(os.path.join(corpus, name), encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        (fast_html, score), t_fast = _timed(fast_extract, html)
+        ref_html, t_ref = _timed(_reference, html, reference)
+        (_, tier, _), t_tiered = _timed(extract_main_html, html, "tiered" if reference == "node" else "fast")
+        if reference != "node" and score < EXTRACT_MIN_SCORE:
+            tier, t_tiered = "readability", t_fast + t_ref
+        f1 = overlap_f1(fast_html, ref_html)
+        fast_ms.append(t_fast); ref_ms.append(t_ref); tiered_ms.append(t_tiered); f1s.append(f1); scores.append(score)
+        fallbacks += tier == "readability"
+        click.echo(f"{name[:40]:40} {t_fast:8.1f} {t_ref:8.1f} {score:6.2f} {f1:6.3f} {tier}")
+
+    def pct(xs, q):
+        return sorted(xs)[min(int(q * len(xs)), len(xs) - 1)]
+    click.echo("")
+    click.echo(f"pages={len(files)} reference={reference} min_score={EXTRACT_MIN_SCORE}")
+    click.echo(f"fast      median={statistics.median(fast_ms):.1f}ms p95={pct(fast_ms, 0.95):.1f}ms")
+    click.echo(f"reference median={statistics.median(ref_ms):.1f}ms p95={pct(ref_ms, 0.95):.1f}ms")
+    click.echo(f"tiered    median={statistics.median(tiered_ms):.1f}ms p95={pct(tiered_ms, 0.95):.1f}ms fallbacks={fallbacks}/{len(files)}")
+    click.echo(f"overlap   mean_f1={statistics.mean(f1s):.3f} min_f1={min(f1s):.3f}")
+    click.echo("")
+    click.echo(f"{'min_score':>9} {'fast':>5} {'fallback':>8} {'fast mean_f1':>12} {'fast min_f1':>11} {'fallback mean_f1':>16}")
+    for t in (0.3, 0.4, 0.5, 0.6, 0.7, 0.8):
+        kept = [f for f, s in zip(f1s, scores) if s >= t]
+        sent = [f for f, s in zip(f1s, scores) if s < t]
+        fmt = lambda xs, fn: f"{fn(xs):.3f}" if xs else "-"
+        click.echo(f"{t:>9.1f} {len(kept):>5} {len(sent):>8} {fmt(kept, statistics.mean):>12} {fmt(kept, min):>11} {fmt(sent, statistics.mean):>16}")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,96 @@
+# Embedding backends for the RAG layer: PyTorch (HuggingFaceEmbeddings) vs ONNX Runtime fp32 / dynamic int8.
+# usage:
+#   python unit_testing/rag_tests/bench_embedding_backends.py check [--synthetic]     # cosine agreement with PyTorch on the corpus
+#   python unit_testing/rag_tests/bench_embedding_backends.py bench [--threads 4]     # per-query + bulk-index latency
+# --synthetic uses the offline random-weight bge-small stand-in (synthetic_model.py): same cost, no retrieval quality.
+import os, sys, time, statistics
+import click
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from rag import EMBED_MODEL, load_markdown, split_documents, make_embeddings  # noqa: E402
+
+BACKENDS = {"torch": ("torch", False), "onnx": ("onnx", False), "onnx-int8": ("onnx", True)}
+# Minimum per-chunk cosine vs PyTorch for `check` to pass.
+MIN_COSINE = {"onnx": 0.9999, "onnx-int8": 0.99}
+QUERIES = [
+    "What is Cost to Serve and its formula?", "How is Contribution Margin % calculated?",
+    "What was the outcome of the Ads Landing Page Headline test?", "Which discount limits apply to enterprise deals?",
+    "Define active, new and churned customer.", "Summarize the Pro Plan +5% price test.",
+]
+
+def _model(model, synthetic):
+    if synthetic:
+        from synthetic_model import build_synthetic_model
+        return build_synthetic_model()
+    return model
+
+def _chunks():
+    return [d.page_content for d in split_documents(load_markdown())]
+
+def _embedder(name, model, threads):
+    backend, int8 = BACKENDS[name]
+    return make_embeddings(backend=backend, int8=int8, threads=threads, model_name=model)
+
+def _cosine(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return (a * b).sum(1) / np.linalg.norm(a, axis=1) / np.linalg.norm(b, axis=1)
+
+@click.group()
+def cli():
+    """Embedding backend equivalence check and benchmark."""
+
+@cli.command()
+@click.option("--model", default=EMBED_MODEL, show_default=True)
+@click.option("--synthetic", is_flag=True)
+@click.option("--k", default=4, show_default=True, help="Top-k for the retrieval agreement check.")
+def check(model, synthetic, k):
+    """Cosine agreement of ONNX (fp32, int8) vectors with PyTorch over every corpus chunk, plus top-k overlap."""
+    model = _model(model, synthetic)
+    chunks = _chunks()
+    ref = _embedder("torch", model, 0)
+    ref_docs, ref_q = np.asarray(ref.embed_documents(chunks)), np.asarray(ref.embed_documents(QUERIES))
+    ref_top = np.argsort(-ref_q @ ref_docs.T, axis=1)[:, :k]
+    failed = False
+    click.echo(f"model={model} chunks={len(chunks)}")
+    for name in ("onnx", "onnx-int8"):
+        emb = _embedder(name, model, 0)
+        docs, q = np.asarray(emb.embed_documents(chunks)), np.asarray(emb.embed_documents(QUERIES))
+        cos = _cosine(ref_docs, docs)
+        top = np.argsort(-q @ docs.T, axis=1)[:, :k]
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, top)])
+        ok = cos.min() >= MIN_COSINE[name]
+        failed |= not ok
+        click.echo(f"{name:>10}: cosine min={cos.min():.6f} p01={np.percentile(cos, 1):.6f} mean={cos.mean():.6f} "
+                   f"top{k} overlap={overlap:.3f} {'OK' if ok else f'FAIL (< {MIN_COSINE[name]})'}")
+    sys.exit(1 if failed else 0)
+
+@cli.command()
+@click.option("--model", default=EMBED_MODEL, show_default=True)
+@click.option("--synthetic", is_flag=True)
+@click.option("--threads", default=0, show_default=True, help="Operator threads (0 = library default).")
+@click.option("--queries", default=50, show_default=True, help="Single-query calls timed per backend.")
+@click.option("--backends", default="torch,onnx,onnx-int8", show_default=True)
+def bench(model, synthetic, threads, queries, backends):
+    """Per-query latency (one embed_query at a time) and bulk index latency (embed every corpus chunk)."""
+    model = _model(model, synthetic)
+    chunks = _chunks()
+    click.echo(f"model={model} chunks={len(chunks)} threads={threads or 'default'}")
+    click.echo(f"{'backend':>10} {'query p50 ms':>12} {'query p95 ms':>12} {'bulk s':>8} {'chunks/s':>9}")
+    for name in backends.split(","):
+        emb = _embedder(name, model, threads)
+        emb.embed_documents(chunks[:8])  # warm-up
+        lat = []
+        for i in range(queries):
+            t0 = time.perf_counter()
+            emb.embed_query(f"{QUERIES[i % len(QUERIES)]} ({i})")
+            lat.append((time.perf_counter() - t0) * 1000)
+        lat.sort()
+        t0 = time.perf_counter()
+        emb.embed_documents(chunks)
+        bulk = time.perf_counter() - t0
+        click.echo(f"{name:>10} {statistics.median(lat):>12.1f} {lat[min(len(lat) - 1, int(len(lat) * 0.95))]:>12.1f} "
+                   f"{bulk:>8.2f} {len(chunks) / bulk:>9.1f}")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,85 @@
+# Throughput/latency of rag_tool retrieval with and without query micro-batching, at N concurrent callers.
+# usage:
+#   python unit_testing/rag_tests/bench_query_batching.py                      # real model + prebuilt index
+#   python unit_testing/rag_tests/bench_query_batching.py --synthetic          # offline: random-weight bge-small shape
+# "direct" is the old path (retriever.get_relevant_documents per call); "batched" goes through QueryBatcher.
+# The embedding cache is bypassed and every query is unique, so each call pays for a forward pass.
+import os, sys, time, tempfile, statistics, threading
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from rag import EMBED_MODEL, db_dir, load_index, load_markdown, split_documents, get_retriever, embed_queries, search_by_vectors  # noqa: E402
+from query_batcher import QueryBatcher, QUERY_BATCH_WINDOW_MS  # noqa: E402
+
+TEMPLATES = [
+    "What is the definition of {} in the KPI glossary?",
+    "Summarize the experiment results related to {}.",
+    "Which policy limits apply to {}?",
+    "How did {} change after the last pricing test?",
+]
+TOPICS = ["cost to serve", "churn", "ARPU", "contribution margin", "active customers", "MRR", "CAC payback", "NPS"]
+
+def questions(n: int, offset: int):
+    return [TEMPLATES[i % len(TEMPLATES)].format(TOPICS[(i // len(TEMPLATES)) % len(TOPICS)]) + f" (case {offset + i})" for i in range(n)]
+
+def run_callers(callers: int, per_caller: int, call, offset: int):
+    lat, lock = [], threading.Lock()
+    def worker(c):
+        for q in questions(per_caller, offset + c * per_caller):
+            t0 = time.perf_counter()
+            call(q)
+            dt = (time.perf_counter() - t0) * 1000
+            with lock:
+                lat.append(dt)
+    threads = [threading.Thread(target=worker, args=(c,)) for c in range(callers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {"qps": len(lat) / wall, "p50": statistics.median(lat), "p95": lat[min(len(lat) - 1, int(len(lat) * 0.95))]}
+
+@click.command()
+@click.option("--model", default=EMBED_MODEL, show_default=True, help="Embedding model name or path.")
+@click.option("--synthetic", is_flag=True, help="Use the offline random-weight model (see synthetic_model.py) and a temp index.")
+@click.option("--index", "index_dir", default=db_dir, show_default=True)
+@click.option("--callers", default="1,8,32", show_default=True)
+@click.option("--queries", default=64, show_default=True, help="Queries per concurrency level (split across callers).")
+@click.option("--window-ms", default=QUERY_BATCH_WINDOW_MS, show_default=True)
+@click.option("--threshold", default=0.5, show_default=True)
+def main(model, synthetic, index_dir, callers, queries, window_ms, threshold):
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from langchain_community.vectorstores import FAISS
+    import torch
+    if synthetic:
+        from synthetic_model import build_synthetic_model
+        model = build_synthetic_model()
+    emb = HuggingFaceEmbeddings(model_name=model)
+    if synthetic:
+        index_dir = tempfile.mkdtemp()
+        FAISS.from_documents(split_documents(load_markdown()), emb).save_local(index_dir)
+    db = load_index(index_dir, emb, check_settings=not synthetic)  # the synthetic index has no manifest
+    retriever = get_retriever(db, threshold)
+    k = retriever.search_kwargs.get("k", 4)
+    click.echo(f"model={model} vectors={db.index.ntotal} torch_threads={torch.get_num_threads()} window_ms={window_ms}")
+    embed_queries(["warm up"], emb)
+
+    offset = 0
+    click.echo(f"{'callers':>7} {'mode':>8} {'qps':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>9}")
+    for n in [int(c) for c in callers.split(",")]:
+        per_caller = max(1, queries // n)
+        direct = run_callers(n, per_caller, retriever.get_relevant_documents, offset)
+        offset += n * per_caller
+        batcher = QueryBatcher(lambda qs: embed_queries(qs, emb),
+                               lambda vs: search_by_vectors(db, vs, k=k, threshold=threshold), window_ms=window_ms)
+        batched = run_callers(n, per_caller, batcher.search, offset)
+        offset += n * per_caller
+        avg_batch = batcher.report()["avg_batch"]
+        batcher.close()
+        for mode, r, b in (("direct", direct, 1.0), ("batched", batched, avg_batch)):
+            click.echo(f"{n:>7} {mode:>8} {r['qps']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {b:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# End-to-end concurrency of the MCP rag_tool (retrieval + answer), called the way the server calls it.
+# usage:
+#   python unit_testing/rag_tests/bench_rag_tool.py                  # real model + prebuilt index
+#   python unit_testing/rag_tests/bench_rag_tool.py --synthetic      # offline: random-weight bge-small shape
+# Gemini is replaced by a fixed-latency fake (--llm-ms) so runs are repeatable and free; the embedding cache is
+# bypassed and every question is unique. --synthetic also drops the score threshold (random-weight queries against
+# the prebuilt index score too low to reach the answer step). "held" is the old tool (one LLM_LIMIT slot held through retrieval and
+# the Gemini call); "split" is server.rag_tool (retrieval under RAG_LIMIT, then an LLM_LIMIT slot for Gemini only).
+import os, sys, time, asyncio, statistics
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+from bench_query_batching import questions  # noqa: E402
+
+class FakeModels:
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    def generate_content(self, model, contents):
+        time.sleep(self.latency_s)
+        return type("Resp", (), {"text": "ok"})()
+
+class FakeClient:
+    def __init__(self, latency_s: float):
+        self.models = FakeModels(latency_s)
+
+async def run_callers(callers: int, per_caller: int, tool, offset: int):
+    lat, answered = [], 0
+    async def worker(c):
+        nonlocal answered
+        for q in questions(per_caller, offset + c * per_caller):
+            t0 = time.perf_counter()
+            ok = await tool(q) == "ok"
+            answered += ok
+            lat.append((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(c) for c in range(callers)))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {"answered": answered, "qps": len(lat) / wall, "p50": statistics.median(lat), "p95": lat[min(len(lat) - 1, int(len(lat) * 0.95))]}
+
+@click.command()
+@click.option("--synthetic", is_flag=True, help="Use the offline random-weight model (see synthetic_model.py).")
+@click.option("--callers", default="1,8,32", show_default=True)
+@click.option("--queries", default=64, show_default=True, help="Questions per concurrency level (split across callers).")
+@click.option("--llm-ms", default=800, show_default=True, help="Latency of the fake Gemini call.")
+def main(synthetic, callers, queries, llm_ms):
+    import rag
+    os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY") or "bench"  # Gemini is faked below
+    if synthetic:
+        from synthetic_model import build_synthetic_model
+        rag._embeddings = rag.HuggingFaceEmbeddings(model_name=build_synthetic_model())
+    else:
+        rag._embeddings = rag.make_embeddings()
+    import server
+    from tool_dispatch import offload
+    server.client = FakeClient(llm_ms / 1000)
+    if synthetic:
+        server.threshold = None  # read by rag_batcher's search on every batch
+
+    @offload(limit=server.LLM_LIMIT, name="rag_tool_held")
+    def held(question: str) -> str:
+        docs = (server.rag_batcher.search(question) or [])[:server.top_k]
+        context = "\n\n".join(d.page_content for d in docs)
+        if not context.strip():
+            return "I don't know from the knowledge base."
+        return server.client.models.generate_content(model=server.rag_model, contents=context + question).text
+
+    async def bench():
+        await server.rag_tool("warm up")
+        click.echo(f"vectors={server.db.index.ntotal} llm_ms={llm_ms} LLM_LIMIT={server.LLM_LIMIT} RAG_LIMIT={server.RAG_LIMIT}")
+        click.echo(f"{'callers':>7} {'mode':>6} {'answered':>8} {'qps':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>9}")
+        offset = 0
+        for n in [int(c) for c in callers.split(",")]:
+            per_caller = max(1, queries // n)
+            for mode, tool in (("held", held), ("split", server.rag_tool)):
+                before = server.rag_batcher.report()
+                r = await run_callers(n, per_caller, tool, offset)
+                after = server.rag_batcher.report()
+                offset += n * per_caller
+                avg_batch = (after["queries"] - before["queries"]) / max(after["batches"] - before["batches"], 1)
+                click.echo(f"{n:>7} {mode:>6} {r['answered']:>8} {r['qps']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {avg_batch:>9.2f}")
+
+    try:
+        asyncio.run(bench())
+    finally:
+        server.rag_batcher.close()
+
+if __name__ == "__main__":
+    main()
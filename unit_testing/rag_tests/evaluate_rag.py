@@ -1,6 +1,8 @@
 import sys, re
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from rag import get_embeddings, embedding_cache_stats
 
 def clean(s: str) -> str:
     if not s: return ""
@@ -16,12 +18,13 @@ def main():
     lines = [ln.strip() for ln in path.read_text(encoding="utf-8").splitlines()]
     lines = [ln for ln in lines if ln]
 
-    model = SentenceTransformer("BAAI/bge-small-en-v1.5")  
+    # Same model as the index, through the persistent embedding cache: re-runs only embed new answers.
+    model = get_embeddings()
 
     pairs = [(clean(lines[i]), clean(lines[i+1])) for i in range(0, len(lines), 2)]
     sims = []
     for idx, (rag, mine) in enumerate(pairs, 1):
-        emb = model.encode([rag, mine], normalize_embeddings=True)
+        emb = model.embed_documents([rag, mine])
         sim = float(util.cos_sim(emb[0], emb[1]))
         sims.append(sim)
         mark = "✓" if sim >= thr else "✗"
@@ -33,6 +36,7 @@ def main():
         print(f"Pairs: {len(sims)}")
         print(f"Avg cosine: {avg:.4f}")
         print(f"Accuracy : {thr:.2f}: {acc*100:.1f}%")
+    print(f"Embedding cache: {embedding_cache_stats()}")
 
 if __name__ == "__main__":
     main()
@@ -2,12 +2,11 @@ import os, json, time, datetime
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.document_loaders import DirectoryLoader
 from langchain.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from google import genai
-from rag import run_rag_for_question, load_index
+from rag import run_rag_for_question, load_index, get_embeddings
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -15,7 +14,6 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 log_path = "unit_testing/rag_logs.txt"
 model = "gemini-2.0-flash"
 DB_DIR = "data/rag_documents/faiss_index"
-EMBED_MODEL = "BAAI/bge-small-en-v1.5"
 client = genai.Client(api_key=GOOGLE_API_KEY)
 
 questions = [
@@ -40,7 +38,7 @@ def write_log_row(path, row_dict):
     with open(path, "a", encoding="utf-8") as f:
         f.write(json.dumps(row_dict, ensure_ascii=False) + "\n")
 
-db = load_index(db_dir=DB_DIR, embeddings=HuggingFaceEmbeddings(model_name=EMBED_MODEL))
+db = load_index(db_dir=DB_DIR, embeddings=get_embeddings())
 retriever = db.as_retriever(
         search_type="similarity_score_threshold",
         search_kwargs={"score_threshold": 0.5}
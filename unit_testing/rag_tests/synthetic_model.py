@@ -0,0 +1,46 @@
+# Offline stand-in for BAAI/bge-small-en-v1.5 in the RAG benchmarks: same BERT shape (12 layers, 384 hidden,
+# CLS pooling + L2 norm), random weights, WordPiece vocab built from the RAG corpus. Compute cost per token matches
+# the real model, so latency/throughput numbers transfer; retrieval quality does not.
+# usage: python unit_testing/rag_tests/synthetic_model.py [OUT_DIR]
+import os, re, sys
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SYNTHETIC_DIR = os.path.join(ROOT, "data", "bench_models", "bge-small-synthetic")
+VOCAB_SIZE = 30522  # bert-base-uncased, as bge-small
+
+def _vocab(docs_dir: str):
+    words = Counter()
+    for base, _, files in os.walk(docs_dir):
+        for name in files:
+            if name.endswith(".md"):
+                with open(os.path.join(base, name), encoding="utf-8", errors="replace") as f:
+                    words.update(re.findall(r"[a-z0-9]+", f.read().lower()))
+    special = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    chars = [chr(c) for c in range(33, 127)]
+    vocab = special + chars + [f"##{c}" for c in chars if c.isalnum()]
+    vocab += [w for w, _ in words.most_common() if w not in vocab]
+    return vocab + [f"[unused{i}]" for i in range(VOCAB_SIZE - len(vocab))]
+
+def build_synthetic_model(out_dir: str = SYNTHETIC_DIR, docs_dir: str = os.path.join(ROOT, "data", "rag_documents")) -> str:
+    if os.path.exists(os.path.join(out_dir, "modules.json")):
+        return out_dir
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+    torch.manual_seed(0)
+    hf_dir = os.path.join(out_dir, "hf")
+    os.makedirs(hf_dir, exist_ok=True)
+    with open(os.path.join(hf_dir, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(_vocab(docs_dir)) + "\n")
+    BertTokenizerFast(os.path.join(hf_dir, "vocab.txt"), do_lower_case=True).save_pretrained(hf_dir)
+    config = BertConfig(vocab_size=VOCAB_SIZE, hidden_size=384, num_hidden_layers=12, num_attention_heads=12,
+                        intermediate_size=1536, max_position_embeddings=512)
+    BertModel(config).save_pretrained(hf_dir)
+    word = models.Transformer(hf_dir, max_seq_length=512)
+    model = SentenceTransformer(modules=[word, models.Pooling(384, pooling_mode="cls"), models.Normalize()])
+    model.save(out_dir)
+    return out_dir
+
+if __name__ == "__main__":
+    print(build_synthetic_model(*sys.argv[1:2]))
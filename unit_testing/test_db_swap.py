@@ -0,0 +1,76 @@
+# Swaps the company DB underneath a running process (as ingest_kpis.py does) and checks nothing serves the old file.
+# Runs against a copy in a temp dir, so the real data/ is never touched.
+import os, sys, shutil, sqlite3, subprocess, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_REL = os.path.join("data", "company_data", "Company_data.db")
+
+def swap_in_month(month: str) -> None:
+    """Copy the DB, append `month` (a clone of the last row) and os.replace it over the live file."""
+    tmp = DB_REL + ".new"
+    shutil.copyfile(DB_REL, tmp)
+    conn = sqlite3.connect(tmp)
+    with conn:
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(monthly_kpis)")]
+        last = conn.execute("SELECT * FROM monthly_kpis ORDER BY month DESC LIMIT 1").fetchone()
+        row = [month if c == "month" else v for c, v in zip(cols, last)]
+        conn.execute(f"INSERT INTO monthly_kpis VALUES ({', '.join('?' * len(cols))})", row)
+    conn.close()
+    os.replace(tmp, DB_REL)
+
+def external_rollup_rebuild() -> None:
+    subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {ROOT!r}); from kpi_rollups import build_rollups; build_rollups()"],
+                   check=True, cwd=os.getcwd())
+
+def run():
+    work = tempfile.mkdtemp()
+    os.makedirs(os.path.join(work, os.path.dirname(DB_REL)))
+    shutil.copyfile(os.path.join(ROOT, DB_REL), os.path.join(work, DB_REL))
+    os.chdir(work)
+    sys.path.insert(0, ROOT)
+    from kpi_rollups import kpi_slice
+
+    def latest() -> str:
+        return kpi_slice("mrr")["rows"][0]["period"]
+
+    first = latest()
+    print("initial latest month:", first)
+
+    # Ingest in another process, rollups rebuilt there too: our pooled rollup connections must not keep the old file.
+    swap_in_month("2030-01-01")
+    external_rollup_rebuild()
+    got = latest()
+    print("after external ingest + rollup rebuild:", got)
+    assert got == "2030-01", got
+
+    # Ingest without a rollup rebuild, kpi_slice as the first call: rollups must be rebuilt from the new file.
+    swap_in_month("2030-02-01")
+    got = latest()
+    print("after ingest, kpi_slice first:", got)
+    assert got == "2030-02", got
+
+    # A paged cursor left open across a swap must not pin the old file for new pool connections.
+    from sql_tools import sql_execute_query, sql_execute_query_paged
+    def count() -> int:
+        return sql_execute_query("SELECT COUNT(*) AS n FROM monthly_kpis")["rows"][0]["n"]
+    before = count()
+    page = sql_execute_query_paged("SELECT month FROM monthly_kpis ORDER BY month", page_size=5)
+    assert page["has_more"], page
+    swap_in_month("2030-03-01")
+    after = count()
+    print("count with an open cursor across a swap:", before, "->", after)
+    assert after == before + 1, (before, after)
+    nxt = sql_execute_query_paged(cursor=page["cursor"], page_size=5)
+    assert nxt["ok"] and nxt["offset"] == 5, nxt
+
+    # The NumPy series loaded before a swap must reload from the new file, even as the first call after it.
+    from kpi_timeseries import SERIES
+    SERIES.ensure()
+    swap_in_month("2030-04-01")
+    got = str(SERIES.ensure().months[-1])
+    print("series after swap:", got)
+    assert got == "2030-04", got
+    print("db swap: ok")
+
+if __name__ == "__main__":
+    run()
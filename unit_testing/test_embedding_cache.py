@@ -0,0 +1,38 @@
+import tempfile, threading
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from embedding_cache import CachedEmbeddings
+
+class Counting(DeterministicFakeEmbedding):
+    calls: int = 0
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+def run():
+    root = tempfile.mkdtemp()
+    inner = Counting(size=16)
+    cache = CachedEmbeddings(inner, "fake/model", root)
+    first = cache.embed_documents(["hello  world", "foo", "foo"])
+    second = cache.embed_documents(["hello world", "bar"])
+    print("model calls (expect 3):", inner.calls, "| whitespace-normalized hit:", first[0] == second[0])
+
+    reopened = CachedEmbeddings(Counting(size=16), "fake/model", root)
+    print("reopened from disk:", reopened.embed_documents(["bar"])[0] == second[1], reopened.report())
+
+    def writer(i):
+        c = CachedEmbeddings(Counting(size=16), "fake/model", root)
+        for j in range(20):
+            c.embed_documents([f"t{i}-{j}", f"shared-{j}"])
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    ref = DeterministicFakeEmbedding(size=16)
+    check = CachedEmbeddings(inner, "fake/model", root)
+    ok = all(
+        max(abs(a - b) for a, b in zip(check.embed_documents([f"t{i}-{j}"])[0], ref.embed_documents([f"t{i}-{j}"])[0])) < 1e-6
+        for i in range(4) for j in range(20)
+    )
+    print("concurrent writers consistent:", ok, check.report())
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,50 @@
+import os, sys, asyncio, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import web_server_fct  # noqa: E402
+from web_server_fct import fetch_many  # noqa: E402
+
+async def check():
+    unwound, started = [], {}
+
+    async def fake_fetch(url: str, max_length: int = 5000, query=None):
+        started[url] = time.monotonic()
+        if "boom" in url:
+            raise RuntimeError("parser exploded")
+        try:
+            await asyncio.sleep(30 if "stuck" in url else 0.05)
+        finally:
+            if "stuck" in url:
+                await asyncio.sleep(0.05)  # e.g. closing a streamed response
+                unwound.append(url)
+        return {"url": url, "content": "ok"}
+
+    web_server_fct.fetch = fake_fetch
+    web_server_fct.FETCH_MANY_CONCURRENCY = 1
+    web_server_fct.FETCH_HOST_DELAY_S = 0.5
+    web_server_fct._fetch_many_sem = None
+
+    # One task raising does not lose the rows already collected; the stuck one is cancelled and awaited.
+    out = await fetch_many(["https://a.com/1", "https://boom.com/", "https://stuck.com/"], deadline_s=0.5)
+    by_url = {r["url"]: r for r in out["results"]}
+    assert by_url["https://a.com/1"]["content"] == "ok", out
+    assert "parser exploded" in by_url["https://boom.com/"]["error"], out
+    assert out["pending"] == ["https://stuck.com/"] and unwound == ["https://stuck.com/"], (out, unwound)
+    print("task errors become rows, cancelled fetches awaited:", out["pending"])
+
+    # A URL waiting for its host's spacing does not hold the only slot: b.com starts right away.
+    await asyncio.sleep(0.6)
+    out = await fetch_many(["https://a.com/2", "https://a.com/3", "https://b.com/"], deadline_s=5)
+    assert len(out["results"]) == 3 and not out["pending"], out
+    assert started["https://b.com/"] < started["https://a.com/3"] - 0.3, started
+    print("same-host spacing does not block other hosts")
+
+    await asyncio.sleep(0.6)
+    await web_server_fct._polite_wait("https://c.com/")
+    assert list(web_server_fct._host_next_start) == ["c.com"], web_server_fct._host_next_start
+    print("elapsed host spacing entries dropped")
+
+def run():
+    asyncio.run(check())
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,46 @@
+import asyncio, time
+from web_server_fct import hedged_search
+
+def fake(name: str, delay_s: float, urls, fail: bool = False):
+    async def backend(query: str, max_results: int):
+        await asyncio.sleep(delay_s)
+        if fail:
+            raise RuntimeError(f"{name} down")
+        return [{"url": u, "snippet": f"{name} #{i}"} for i, u in enumerate(urls[:max_results])] or [{"url": "", "snippet": "No results"}]
+    return backend
+
+async def check():
+    fast = fake("fast", 0.1, ["https://a.com/x", "https://b.com/", "https://c.com"])
+    slow = fake("slow", 0.5, ["https://b.com", "https://d.com"])
+    stuck = fake("stuck", 30, ["https://never.com"])
+
+    out = await hedged_search("q", backends={"fast": fast, "slow": slow}, grace_s=1)
+    print("both merged:", [(r["url"], r["sources"]) for r in out["results"]], out["backends"])
+
+    t = time.time()
+    out = await hedged_search("q", backends={"fast": fast, "stuck": stuck}, grace_s=0.3)
+    print("slow cancelled after grace:", round(time.time() - t, 2), out["backends"]["stuck"]["status"], len(out["results"]))
+
+    out = await hedged_search("q", backends={"down": fake("down", 0, [], fail=True), "empty": fake("empty", 0, [])}, budget_s=1)
+    print("nothing good:", out["results"], out["backends"])
+
+    t = time.time()
+    out = await hedged_search("q", backends={"stuck": stuck}, budget_s=0.5)
+    print("budget hit:", round(time.time() - t, 2), out["backends"])
+
+    unwound = []
+    async def cleanup_on_cancel(query: str, max_results: int):
+        try:
+            await asyncio.sleep(30)
+        finally:
+            await asyncio.sleep(0.05)  # e.g. closing a streamed response
+            unwound.append(True)
+    out = await hedged_search("q", backends={"fast": fast, "loser": cleanup_on_cancel}, grace_s=0.1)
+    assert unwound and out["backends"]["loser"]["status"] == "cancelled", (unwound, out["backends"])
+    print("cancelled losers awaited:", unwound)
+
+def run():
+    asyncio.run(check())
+
+if __name__ == "__main__":
+    run()
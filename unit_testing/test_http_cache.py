@@ -0,0 +1,79 @@
+import asyncio, os, tempfile, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import httpx
+from http_cache import HttpCache, cached_get
+from http_client import FETCH_MAX_BYTES
+
+class Stub(BaseHTTPRequestHandler):
+    """Serves one page with an ETag; answers 304 to a matching If-None-Match, 503 when `down` is set. /big exceeds FETCH_MAX_BYTES."""
+    protocol_version = "HTTP/1.1"
+    etag = '"v1"'
+    down = False
+    hits = 0
+
+    def do_GET(self):
+        Stub.hits += 1
+        if self.path == "/big":
+            body = b"<html><body><p>" + b"x" * FETCH_MAX_BYTES + b"</p></body></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Cache-Control", "max-age=3600")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if Stub.down:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == Stub.etag:
+            self.send_response(304)
+            self.send_header("ETag", Stub.etag)
+            self.send_header("Cache-Control", "max-age=0")
+            self.end_headers()
+            return
+        body = b"<html><body><p>hello</p></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", Stub.etag)
+        self.send_header("Cache-Control", "max-age=0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+async def check(url: str, cache: HttpCache):
+    async with httpx.AsyncClient() as client:
+        print("first:", (await cached_get(client, url, cache=cache))[2])        # miss
+        print("second:", (await cached_get(client, url, cache=cache))[2])       # revalidated (304)
+        Stub.down = True
+        print("origin down:", (await cached_get(client, url, cache=cache))[2])  # stale
+    print("origin requests:", Stub.hits, "stats:", cache.report())
+
+async def check_truncated(url: str, cache: HttpCache):
+    async with httpx.AsyncClient() as client:
+        before = Stub.hits
+        for _ in range(2):
+            text, _, status = await cached_get(client, url, cache=cache)
+            assert status == "miss" and len(text) == FETCH_MAX_BYTES, (status, len(text))
+    assert Stub.hits - before == 2 and cache.get(url) is None  # truncated bodies are never stored
+    assert cache.report()["truncated_skipped"] == 2
+    print("truncated: not cached")
+
+def run():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as d:
+        cache = HttpCache(path=os.path.join(d, "cache.db"))
+        try:
+            asyncio.run(check(f"http://127.0.0.1:{srv.server_port}/page", cache))
+            asyncio.run(check_truncated(f"http://127.0.0.1:{srv.server_port}/big", cache))
+        finally:
+            cache.close()
+            srv.shutdown()
+
+if __name__ == "__main__":
+    run()
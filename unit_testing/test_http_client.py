@@ -0,0 +1,78 @@
+import asyncio, socket, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import httpx
+import http_client
+from http_client import start_http_client, get_sync_http_client, close_http_client, host_slot, read_text_capped, http_stats
+
+class Stub(BaseHTTPRequestHandler):
+    """Keep-alive server echoing the path; /slow holds the request so host_slot concurrency can be observed."""
+    protocol_version = "HTTP/1.1"
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            with Stub.lock:
+                Stub.active += 1
+                Stub.peak = max(Stub.peak, Stub.active)
+            threading.Event().wait(0.05)
+            with Stub.lock:
+                Stub.active -= 1
+        body = f"<html><body><p>{self.path}</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def check(base: str):
+    client = await start_http_client()
+    before = http_stats()
+    for i in range(5):
+        async with client.stream("GET", f"{base}/a{i}") as r:
+            text, truncated = await read_text_capped(r)
+        assert r.status_code == 200 and f"/a{i}" in text and not truncated
+    sync = get_sync_http_client()
+    assert "/b" in (await asyncio.to_thread(sync.get, f"{base}/b")).text
+    after = http_stats()
+    assert after["requests"] - before["requests"] == 6
+    assert after["connections_opened"] - before["connections_opened"] == 2  # one keep-alive connection per client
+
+    for call in (client.get(f"http://127.0.0.1:{_closed_port()}/"), asyncio.to_thread(sync.get, f"http://127.0.0.1:{_closed_port()}/")):
+        try:
+            await call
+            raise AssertionError("expected a connect error")
+        except httpx.ConnectError:
+            pass  # httpcore errors surface as httpx.TransportError subclasses
+
+    async def slow(i):
+        async with host_slot(f"{base}/slow{i}"):
+            await client.get(f"{base}/slow{i}")
+    await asyncio.gather(*(slow(i) for i in range(12)))
+    assert Stub.peak <= http_client.HTTP_PER_HOST_LIMIT, Stub.peak
+    for i in range(50):
+        async with host_slot(f"http://host{i}.invalid/"):
+            pass
+    assert http_client._host_limits == {}, http_client._host_limits  # idle hosts are not kept
+    await close_http_client()
+    print("transports ok; peak per host:", Stub.peak, "stats:", http_stats())
+
+def run():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        asyncio.run(check(f"http://127.0.0.1:{srv.server_port}"))
+    finally:
+        srv.shutdown()
+
+if __name__ == "__main__":
+    run()
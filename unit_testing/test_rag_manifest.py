@@ -0,0 +1,36 @@
+import os, sys, json, tempfile, warnings
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from langchain_community.embeddings import FakeEmbeddings  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+from rag import MANIFEST, index_settings, load_index  # noqa: E402
+
+def _write_manifest(d: str, settings) -> None:
+    with open(os.path.join(d, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"settings": settings, "docs": {}}, f)
+
+def run():
+    emb = FakeEmbeddings(size=8)
+    with tempfile.TemporaryDirectory() as d:
+        FAISS.from_texts(["alpha", "beta"], emb).save_local(d)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            assert load_index(d, emb).index.ntotal == 2
+        assert any(MANIFEST in str(w.message) for w in caught), caught
+        print("index without manifest loads with a warning")
+
+        _write_manifest(d, index_settings())
+        assert load_index(d, emb).index.ntotal == 2
+
+        _write_manifest(d, {**index_settings(), "model": "other/model", "chunk_size": 1000})
+        try:
+            load_index(d, emb)
+            raise AssertionError("expected a settings mismatch")
+        except ValueError as e:
+            msg = str(e)
+        assert "other/model" in msg and "chunk_size" in msg and "chunk_overlap" not in msg, msg
+        assert load_index(d, emb, check_settings=False).index.ntotal == 2
+        print("index built with other settings rejected:", msg)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,29 @@
+import os, sys, math
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from langchain_core.embeddings import Embeddings  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+from langchain_community.vectorstores.utils import DistanceStrategy  # noqa: E402
+from rag import get_retriever, search_by_vectors  # noqa: E402
+
+# Points on the unit circle: distances (and so relevance scores) are spread out enough for the threshold to bite.
+VECTORS = {f"d{i}": [math.cos(i * 0.3), math.sin(i * 0.3)] for i in range(8)}
+QUERIES = {"q0": [1.0, 0.0], "q1": [0.0, 1.0], "q2": [0.6, 0.8]}
+
+class Fixed(Embeddings):
+    def embed_documents(self, texts):
+        return [VECTORS[t] for t in texts]
+    def embed_query(self, text):
+        return QUERIES[text]
+
+def run():
+    # search_by_vectors (one call for a whole micro-batch) returns what the threshold retriever returns per question.
+    for strategy in (DistanceStrategy.EUCLIDEAN_DISTANCE, DistanceStrategy.COSINE, DistanceStrategy.MAX_INNER_PRODUCT):
+        db = FAISS.from_texts(list(VECTORS), Fixed(), distance_strategy=strategy)
+        for threshold in (0.2, 0.5, 0.8, 0.95):
+            want = [[d.page_content for d in get_retriever(db, threshold).invoke(q)] for q in QUERIES]
+            got = [[d.page_content for d in docs] for docs in search_by_vectors(db, list(QUERIES.values()), k=4, threshold=threshold)]
+            assert got == want, (strategy, threshold, got, want)
+    print("search_by_vectors matches the threshold retriever")
+
+if __name__ == "__main__":
+    run()
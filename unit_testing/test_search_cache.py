@@ -0,0 +1,38 @@
+import os, socket, tempfile
+import httpx
+import web_server_fct
+from search_cache import SearchCache
+from web_server_fct import web_search
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def run():
+    with tempfile.TemporaryDirectory() as d:
+        cache = SearchCache(path=os.path.join(d, "search.db"))
+        try:
+            # A DuckDuckGo outage raises instead of looking like "no results", and is not cached.
+            web_server_fct.DDG_URL = f"http://127.0.0.1:{_closed_port()}/html/"
+            for _ in range(2):
+                try:
+                    cache.cached("ddg", "q", 5, lambda: web_search("q"))
+                    raise AssertionError("expected the search error to propagate")
+                except httpx.ConnectError:
+                    pass
+            st = cache.report()
+            assert st["live_entries"] == 0 and st["errors"] == 2 and st["misses"] == 2, st
+
+            # A genuine empty result set is negative-cached.
+            empty = [{"url": "", "snippet": "No results"}]
+            assert cache.cached("ddg", "nothing", 5, lambda: empty) == empty
+            assert cache.cached("ddg", "nothing", 5, lambda: 1 / 0) == empty
+            st = cache.report()
+            assert st["live_negative"] == 1 and st["negative_hits"] == 1, st
+            print("search cache: errors not cached, empty results negative-cached", st)
+        finally:
+            cache.close()
+
+if __name__ == "__main__":
+    run()
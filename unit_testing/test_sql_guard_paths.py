@@ -0,0 +1,61 @@
+# The plan guard and execution budgets must apply to every execution path: sql_execute_query, the paged tool and
+# the /sql_stream iterator.
+import os, sys, sqlite3
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sql_tools import sql_execute_query, sql_execute_query_paged, iter_query_rows, sql_budget_stats, sql_db_query_checker, QueryRejected, GUARD_MODE  # noqa: E402
+
+CARTESIAN = "SELECT * FROM monthly_kpis a, monthly_kpis b, monthly_kpis c, monthly_kpis d"
+SANE = "SELECT month, mrr FROM monthly_kpis ORDER BY month"
+
+def run():
+    assert GUARD_MODE == "enforce", "run with SQL_GUARD_MODE=enforce (the default)"
+    r = sql_execute_query(CARTESIAN)
+    assert r["error"] == "guard_rejected", r
+    r = sql_execute_query_paged(CARTESIAN, page_size=10)
+    assert r["error"] == "guard_rejected", r
+    try:
+        iter_query_rows(CARTESIAN)
+        raise AssertionError("iter_query_rows accepted a rejected plan")
+    except QueryRejected as e:
+        assert e.guard["verdict"] == "reject"
+    print("rejected on all paths:", r["guard"]["reasons"])
+
+    page = sql_execute_query_paged(SANE, page_size=10)
+    assert page["ok"] and page["guard"]["verdict"] != "reject" and page["has_more"], page
+    assert len(list(iter_query_rows(SANE))) == sql_execute_query(SANE)["row_count"]
+    print("sane query allowed on all paths")
+
+    # A wrong query is an execution error (SQLite's message), never a cost rejection.
+    for bad in ("SELECT nonexist FROM monthly_kpis", "SELEC month FROM monthly_kpis"):
+        for r in (sql_execute_query(bad), sql_execute_query_paged(bad, page_size=10)):
+            assert r["error"] in ("execution_error", "validation_failed"), r
+    try:
+        iter_query_rows("SELECT nonexist FROM monthly_kpis")
+        raise AssertionError("iter_query_rows accepted a query SQLite cannot compile")
+    except sqlite3.OperationalError as e:
+        assert "nonexist" in str(e)
+    print("compile errors reported as execution_error")
+
+    # Positional ? parameters go through the guard (EXPLAIN binds one None per placeholder).
+    positional = "SELECT month, mrr FROM monthly_kpis WHERE month >= ? AND mrr > ?2 ORDER BY month"
+    params = ["2025-01-01", 0]
+    r = sql_execute_query(positional, params=params)
+    assert r["ok"] and r["row_count"] > 0 and r["guard"]["verdict"] != "reject", r
+    page = sql_execute_query_paged(positional, params=params, page_size=3)
+    assert page["ok"] and page["row_count"] == 3, page
+    assert len(list(iter_query_rows(positional, params=params))) == r["row_count"]
+    assert "Plan guard" not in sql_db_query_checker("sqlite", positional)["notes"]
+    print("? parameters allowed on all paths:", r["row_count"], "rows")
+
+    before = sql_budget_stats()["queries"]
+    sql_execute_query_paged(SANE, page_size=10)
+    assert sql_budget_stats()["queries"] == before + 1, "first paged call must count one budgeted query"
+
+    # A 3-way cross join aggregate passes the guard (warn), but its first batch alone needs far more than 5k VM steps.
+    slow = "SELECT a.month, COUNT(*) AS n FROM monthly_kpis a, monthly_kpis b, monthly_kpis c GROUP BY a.month"
+    rows = list(iter_query_rows(slow, max_vm_steps=5000, batch_size=50))
+    assert rows and rows[-1].get("error") == "budget_exceeded", rows[-1:]
+    print("stream stopped by budget after", rows[-1]["progress"]["rows_fetched"], "rows")
+
+if __name__ == "__main__":
+    run()
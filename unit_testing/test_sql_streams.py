@@ -0,0 +1,47 @@
+# Long-lived readers (NDJSON streams, paged cursors) must not starve the shared pool, and must fail in-band.
+import os, sys, time, threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sql_tools import iter_query_rows, sql_execute_query, CursorStore, POOL, POOL_SIZE  # noqa: E402
+
+SANE = "SELECT month, mrr FROM monthly_kpis ORDER BY month"
+# The first 50 rows succeed; row 51 overflows at run time, after the stream has started (no ORDER BY: no presort).
+OVERFLOW = "SELECT month, CASE WHEN rowid > 50 THEN abs(-9223372036854775807 - 1) ELSE 0 END AS x FROM monthly_kpis"
+
+def run():
+    # More half-read streams than pool connections: the pool stays free for every other tool.
+    streams = [iter_query_rows(SANE, batch_size=1) for _ in range(POOL_SIZE + 2)]
+    for s in streams:
+        next(s)
+    t0 = time.time()
+    r = sql_execute_query("SELECT COUNT(*) AS n FROM monthly_kpis")
+    assert r["ok"] and time.time() - t0 < 1, (r, time.time() - t0)
+    assert POOL.stats()["in_use"] == 0, POOL.stats()
+    for s in streams:
+        s.close()
+    print("open streams hold no pool connection")
+
+    rows = list(iter_query_rows(OVERFLOW, batch_size=10))
+    assert rows[-1]["error"] == "execution_error" and rows[-1]["rows_fetched"] > 0, rows[-1]
+    assert all("error" not in r for r in rows[:-1]) and len(rows) > 1
+    print("runtime error ends the stream in-band:", rows[-1])
+
+    store = CursorStore(max_open=3)
+    opened, barrier = [], threading.Barrier(24)
+    def open_one():
+        barrier.wait()
+        try:
+            opened.append(store.open(SANE, {})[0])
+        except RuntimeError:
+            pass
+    threads = [threading.Thread(target=open_one) for _ in range(24)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(opened) == 3 and store.stats()["open"] == 3, (len(opened), store.stats())
+    for token in opened:
+        store.close(token)
+    print("concurrent opens capped at max_open")
+
+if __name__ == "__main__":
+    run()
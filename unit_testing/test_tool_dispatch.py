@@ -0,0 +1,39 @@
+import os, sys, asyncio, threading, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tool_dispatch  # noqa: E402
+from tool_dispatch import offload, dispatch_stats  # noqa: E402
+
+active = peak = 0
+lock = threading.Lock()
+
+def _work():
+    global active, peak
+    with lock:
+        active += 1
+        peak = max(peak, active)
+    time.sleep(0.05)
+    with lock:
+        active -= 1
+
+@offload(limit=2, group="test-sql")
+def tool_a():
+    _work()
+
+@offload(limit=2, group="test-sql")
+def tool_b():
+    _work()
+
+async def check():
+    # Two tools of one group share a single limit of 2, not 2 each.
+    await asyncio.gather(*(f() for f in [tool_a, tool_b] * 6))
+    assert peak == 2, peak
+    assert list(tool_dispatch._semaphores) == ["test-sql"], tool_dispatch._semaphores
+    tools = dispatch_stats()["tools"]
+    assert tools["tool_a"]["calls"] == 6 and tools["tool_b"]["calls"] == 6, tools  # stats stay per tool
+    print("group limit shared across tools; peak:", peak)
+
+def run():
+    asyncio.run(check())
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,36 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from url_canon import clean_url, url_key, dedupe_urls  # noqa: E402
+
+# clean_url is what fetch requests: only redirect unwrapping and tracking-param removal.
+FETCH_AS_GIVEN = [
+    "https://amp.dev/documentation/guides",
+    "https://example.com/amp/guide",
+    "https://example.com/a%2Fb",
+    "https://example.com/page?x",
+    "https://Example.com:443/Path/?b=2&a=1#frag",
+]
+
+def run():
+    for u in FETCH_AS_GIVEN:
+        assert clean_url(u) == u, (u, clean_url(u))
+    assert clean_url("https://example.com/p?utm_source=x&id=3&fbclid=y") == "https://example.com/p?id=3"
+    assert clean_url("https://example.com/p?x&utm_medium=y") == "https://example.com/p?x"
+    assert clean_url("https://duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.com%2Fa%3Futm_source%3Dz") == "https://example.com/a"
+
+    # url_key may normalize, but must not merge distinct resources.
+    assert url_key("https://amp.dev/documentation/guides").startswith("amp.dev/")
+    assert url_key("https://amp.co.uk/x").startswith("amp.co.uk/")
+    assert url_key("https://amp.example.com/story") == url_key("https://www.example.com/story/")
+    assert url_key("https://example.com/story/amp") == url_key("https://example.com/story")
+    assert url_key("https://example.com/amp/guide") != url_key("https://example.com/guide")
+    assert url_key("https://example.com/a%2Fb") != url_key("https://example.com/a/b")
+    assert url_key("https://example.com/%7euser") == url_key("https://example.com/~user")
+    assert url_key("https://example.com/p?x") != url_key("https://example.com/p?x=")
+    assert url_key("https://example.com/p?b=2&a=1&utm_source=q") == url_key("https://EXAMPLE.com:443/p?a=1&b=2")
+    assert dedupe_urls(["https://www.example.com/a/?utm_source=x", "https://example.com/a", "https://amp.dev/"]) == [
+        "https://www.example.com/a/", "https://amp.dev/"]
+    print("url_canon: ok")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,128 @@
+# URL canonicalization shared by web_search, web_search_api and fetch.
+# clean_url(): the URL we actually fetch - redirect wrappers unwrapped and tracking params removed, nothing else.
+# url_key():   a cache/dedup key on top of that - scheme, host case, "www.", AMP variants, escapes and trailing
+#              slash no longer distinguish two URLs. Lossy by design, so it is never fetched.
+from __future__ import annotations
+import re, base64
+import urllib.parse
+from typing import Iterable, List, Optional
+
+TRACKING_PARAMS = {
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "twclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl",
+    "_hsenc", "_hsmi", "mkt_tok", "oly_anon_id", "oly_enc_id", "vero_id", "wickedid", "rb_clickid", "s_cid",
+    "ref_src", "ref_url", "cmpid", "spm", "si",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "hsa_", "icid")
+AMP_PARAMS = {"amp", "outputtype", "amp_js_v", "usqp"}
+
+def _param(url: str, *names: str) -> Optional[str]:
+    qs = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+    for n in names:
+        if qs.get(n):
+            return qs[n][0]
+    return None
+
+def _b64_target(value: Optional[str]) -> Optional[str]:
+    """Bing's /ck/a?u=a1<base64url> form."""
+    if not value or not value.startswith("a1"):
+        return None
+    raw = value[2:]
+    try:
+        return base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def unwrap_redirect(url: str) -> str:
+    """Resolve known search/social redirectors to their target without a network round trip."""
+    for _ in range(3):  # wrappers occasionally nest
+        p = urllib.parse.urlsplit(url)
+        host = (p.hostname or "").lower()
+        target = None
+        if host.endswith("duckduckgo.com") and (p.path.startswith("/l/") or "uddg=" in p.query):
+            target = _param(url, "uddg")
+        elif re.fullmatch(r"(www\.)?google\.[a-z.]+", host) and p.path == "/url":
+            target = _param(url, "q", "url")
+        elif host.endswith("bing.com") and p.path.startswith("/ck/"):
+            target = _b64_target(_param(url, "u"))
+        elif host in ("l.facebook.com", "lm.facebook.com") or (host.endswith("facebook.com") and p.path == "/l.php"):
+            target = _param(url, "u")
+        elif host == "l.instagram.com":
+            target = _param(url, "u")
+        elif host == "out.reddit.com" or (host.endswith("linkedin.com") and p.path == "/safety/go"):
+            target = _param(url, "url")
+        elif host == "href.li":
+            target = urllib.parse.unquote(p.query)
+        if not target or not target.startswith(("http://", "https://")):
+            return url
+        url = target
+    return url
+
+# Common second-level public suffixes: "amp.co.uk" is itself a registrable domain, not an AMP subdomain.
+_SECOND_LEVEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "com.au", "net.au", "org.au", "co.nz", "co.jp", "ne.jp", "co.in",
+    "co.za", "com.br", "com.mx", "com.cn", "com.tr", "com.sg", "com.hk", "co.kr",
+}
+_UNRESERVED = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+def _strip_amp(host: str, path: str) -> tuple:
+    """AMP variant -> canonical page, for keys only. `amp.` is kept when the rest is a bare public suffix (amp.dev)."""
+    rest = host[4:] if host.startswith("amp.") else ""
+    if rest.count(".") >= 1 and rest not in _SECOND_LEVEL_SUFFIXES:
+        host = rest
+    path = re.sub(r"/amp/?$", "/", path)
+    path = re.sub(r"\.amp(\.html?)$", r"\1", path)
+    return host, path
+
+def _normalize_escapes(path: str) -> str:
+    """RFC 3986 normalization: upper-case %XX and decode only unreserved characters, so %2F stays %2F."""
+    def fix(m: "re.Match") -> str:
+        ch = chr(int(m.group(1), 16))
+        return ch if ch in _UNRESERVED else f"%{m.group(1).upper()}"
+    return re.sub(r"%([0-9A-Fa-f]{2})", fix, path)
+
+def _is_tracking(piece: str, amp: bool = False) -> bool:
+    name = urllib.parse.unquote_plus(piece.split("=", 1)[0]).lower()
+    return name.startswith(TRACKING_PREFIXES) or name in TRACKING_PARAMS or (amp and name in AMP_PARAMS)
+
+def _filter_query(query: str, amp: bool = False) -> list:
+    """Raw query pieces minus tracking params; kept verbatim (no re-encoding, `x` stays `x`, order kept)."""
+    return [p for p in query.split("&") if p and not _is_tracking(p, amp)]
+
+def clean_url(url: str) -> str:
+    """The URL to fetch: redirect wrappers unwrapped and tracking params removed; everything else exactly as given."""
+    url = unwrap_redirect(url.strip())
+    p = urllib.parse.urlsplit(url)
+    if p.scheme.lower() not in ("http", "https") or not p.query:
+        return url
+    query = _filter_query(p.query)
+    if len(query) == len([q for q in p.query.split("&") if q]):
+        return url
+    return urllib.parse.urlunsplit((p.scheme, p.netloc, p.path, "&".join(query), p.fragment))
+
+def url_key(url: str) -> str:
+    """Cache/dedup key: clean_url with host case, default port, 'www.', AMP variants, escapes, trailing slash,
+    fragment and query order normalized away. Never used as a request URL."""
+    url = clean_url(url)
+    p = urllib.parse.urlsplit(url)
+    scheme = p.scheme.lower()
+    if scheme not in ("http", "https"):
+        return url
+    host = (p.hostname or "").lower().rstrip(".")
+    host = host[4:] if host.startswith("www.") else host
+    host, path = _strip_amp(host, re.sub(r"/{2,}", "/", _normalize_escapes(p.path or "/")))
+    if p.port and not ((scheme == "http" and p.port == 80) or (scheme == "https" and p.port == 443)):
+        host = f"{host}:{p.port}"
+    query = sorted(_filter_query(p.query, amp=True))
+    return host + (path.rstrip("/") or "/") + (f"?{'&'.join(query)}" if query else "")
+
+def dedupe_urls(urls: Iterable[str]) -> List[str]:
+    """Clean every URL and keep the first of each url_key, preserving order."""
+    seen, out = set(), []
+    for u in urls:
+        if not u:
+            continue
+        key = url_key(u)
+        if key not in seen:
+            seen.add(key)
+            out.append(clean_url(u))
+    return out
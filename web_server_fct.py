@@ -1,24 +1,47 @@
 # https://github.com/modelcontextprotocol/servers/blob/main/src/fetch/src/mcp_server_fetch/server.py
 import httpx
 import markdownify
-from readabilipy.simple_json import simple_json_from_html_string
+from html_extract import extract_main_html
 import re
-from typing import List, Dict, Literal
+import html as html_lib
+from typing import Any, List, Dict, Literal, Optional, Callable, Awaitable
 from pydantic import BaseModel, AnyUrl, Field
 import urllib.parse
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
+from tool_dispatch import run_cpu
+from http_client import get_http_client, get_sync_http_client, host_slot, read_text_capped
+from http_cache import cached_get, HTTP_CACHE_ENABLED
+from url_canon import clean_url, url_key, unwrap_redirect, dedupe_urls
+from doc_cache import DOC_CACHE, content_hash
+from passages import split_passages, select_passages, format_passages
 
 load_dotenv() 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 DEFAULT_UA = "FastMCP/1.0 (+https://example.com)"
 DEFAULT_UA_BROWSER = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+FETCH_MANY_CONCURRENCY = int(os.getenv("FETCH_MANY_CONCURRENCY", "8"))
+FETCH_MANY_MAX_URLS = int(os.getenv("FETCH_MANY_MAX_URLS", "10"))
+FETCH_HOST_DELAY_S = float(os.getenv("FETCH_HOST_DELAY_S", "0.5"))
+SEARCH_BUDGET_S = float(os.getenv("SEARCH_BUDGET_S", "8"))
+SEARCH_HEDGE_GRACE_S = float(os.getenv("SEARCH_HEDGE_GRACE_S", "1.0"))
+DDG_URL = "https://html.duckduckgo.com/html/"
+DDG_HEADERS = {
+    "User-Agent": DEFAULT_UA_BROWSER,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://duckduckgo.com/",
+}
 
 class FetchRequest(BaseModel):
     url: AnyUrl
     max_length: int = Field(5000, gt=0, lt=1_000_000)
     start_index: int = Field(0, ge=0)
     raw: bool = False
+    doc: Optional[str] = None
+    query: Optional[str] = None
     
 class SearchRequest(BaseModel):
     query: str
@@ -26,20 +49,29 @@ class SearchRequest(BaseModel):
     model: Literal["gpt-4o-mini-search-preview", "gpt-5","gpt-5-mini", "gpt-40","gpt-4o-mini"] = "gpt-5" 
 
 def html_to_markdown(html: str) -> str:
-    """Extract main content (Readability) then convert to Markdown."""
-    data = simple_json_from_html_string(html, use_readability=True)
-    content_html = (data or {}).get("content") or ""
+    """Extract main content (fast lxml tier, Readability fallback) then convert to Markdown."""
+    content_html, _, _ = extract_main_html(html)
     if not content_html:
         return "<error>Page could not be simplified; returning nothing.</error>"
     md = markdownify.markdownify(content_html, heading_style=markdownify.ATX)
     return md
 
-async def http_get_text(url: str, timeout_s: int = 20) -> (str, str):
-    """Fetch URL and return (text, content_type). Raises for HTTP errors."""
-    async with httpx.AsyncClient(follow_redirects=True, headers={"User-Agent": DEFAULT_UA}, timeout=timeout_s) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        return r.text, r.headers.get("content-type", "")
+async def http_get_text(url: str, timeout_s: Optional[float] = None, use_cache: bool = HTTP_CACHE_ENABLED) -> (str, str):
+    """
+    Fetch URL with the shared pooled client (through the on-disk HTTP cache) and return (text, content_type).
+    The body is streamed: non-text types are refused from the headers and reading stops at FETCH_MAX_BYTES.
+    Raises for HTTP errors.
+    """
+    client = await get_http_client()
+    timeout = timeout_s if timeout_s is not None else httpx.USE_CLIENT_DEFAULT
+    async with host_slot(url):
+        if use_cache:
+            text, ctype, _ = await cached_get(client, url, timeout=timeout)
+            return text, ctype
+        async with client.stream("GET", url, timeout=timeout) as r:
+            r.raise_for_status()
+            text, _ = await read_text_capped(r)
+    return text, r.headers.get("content-type", "")
     
 def looks_like_html(body: str, content_type: str) -> bool:
     if "text/html" in content_type.lower():
@@ -47,53 +79,111 @@ def looks_like_html(body: str, content_type: str) -> bool:
     return "<html" in body[:500].lower()
 
 # ----------------------------------------------------------------------------------------------------------------------------
+_openai_clients: Dict[str, Any] = {}
+
+def _openai(kind: str = "sync") -> Any:
+    """One OpenAI / AsyncOpenAI client per process (keeps its connection pool warm)."""
+    if kind not in _openai_clients:
+        from openai import OpenAI, AsyncOpenAI
+        _openai_clients[kind] = (AsyncOpenAI if kind == "async" else OpenAI)(api_key=OPENAI_API_KEY)
+    return _openai_clients[kind]
+
 def web_search_api(query: str, max_results: int , model: str ) -> List[Dict[str, str]]:
-    """Minimal web_search: returns [{'url': str, 'snippet': str}, ...]."""
+    """Minimal web_search: returns [{'url': str, 'snippet': str}, ...]. Raises on failure, so errors never reach the search cache."""
     if not OPENAI_API_KEY:
-        return [{"url": "", "snippet": "OPENAI_API_KEY not set."}]
-    from openai import OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    try:
-        resp = client.responses.create(
-            model=model,
-            tools=[{"type": "web_search_preview", "search_context_size": "medium"}],
-            input=query,
-        )
-    except Exception as e:
-        return [{"url": "", "snippet": f"Search failed: {e}"}]
-    text = getattr(resp, "output_text", "") or ""
-    urls = re.findall(r"https?://[^\s)\"'>]+", text)
+        raise RuntimeError("OPENAI_API_KEY not set.")
+    resp = _openai().responses.create(
+        model=model,
+        tools=[{"type": "web_search_preview", "search_context_size": "medium"}],
+        input=query,
+    )
+    return _openai_results(getattr(resp, "output_text", "") or "", max_results)
+
+async def web_search_api_async(query: str, max_results: int, model: str) -> List[Dict[str, str]]:
+    """Async twin of web_search_api (cancellable)."""
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY not set.")
+    resp = await _openai("async").responses.create(
+        model=model,
+        tools=[{"type": "web_search_preview", "search_context_size": "medium"}],
+        input=query,
+    )
+    return _openai_results(getattr(resp, "output_text", "") or "", max_results)
+
+def _openai_results(text: str, max_results: int) -> List[Dict[str, str]]:
+    urls = re.findall(r"https?://[^\s)\"'>\]]+", text)
 
     results: List[Dict[str, str]] = []
-    for u in urls[:max_results]:
+    seen = set()
+    for u in urls:
+        key = url_key(u)
+        if key in seen:
+            continue
+        seen.add(key)
         i = text.find(u)
         start = max(i - 80, 0)
         end = i + len(u) + 80
-        results.append({"url": u, "snippet": text[start:end]})
+        results.append({"url": clean_url(u), "snippet": text[start:end]})
+        if len(results) >= max_results:
+            break
     if not results:
         results.append({"url": "", "snippet": text[:1000]})
     return results
 
 # ----------------------------------------------------------------------------------------------------------------------------
 
-async def fetch(url: str, max_length: int = 5000, start_index: int = 0, raw: bool = False) -> Dict:
+async def fetch(
+    url: str,
+    max_length: int = 5000,
+    start_index: int = 0,
+    raw: bool = False,
+    doc: Optional[str] = None,
+    query: Optional[str] = None,
+) -> Dict:
     try:
-        args = FetchRequest(url=url, max_length=max_length, start_index=start_index, raw=raw)
+        args = FetchRequest(url=url, max_length=max_length, start_index=start_index, raw=raw, doc=doc, query=query)
     except Exception as e:
         return {"error": f"Invalid arguments: {e}"}
-    try:
-        body, ctype = await http_get_text(str(args.url))
-    except httpx.HTTPStatusError as e:
-        return {"url": str(args.url), "error": f"HTTP {e.response.status_code} while fetching."}
-    except Exception as e:
-        return {"url": str(args.url), "error": f"Fetch failed: {e}"}
+    # Request the URL as given minus redirect wrappers / tracking params; AMP, www. and slash variants only share
+    # the cache key (url_key), they are never rewritten into the request.
+    target = clean_url(str(args.url))
+    key = url_key(target)
+    # Continuation pages are served from the converted-document cache: no download, no re-parse.
+    cached = DOC_CACHE.lookup(key, args.raw, args.doc) if (args.start_index > 0 or args.doc or args.query) else None
+    if cached is None:
+        try:
+            body, ctype = await http_get_text(target)
+        except httpx.HTTPStatusError as e:
+            return {"url": target, "error": f"HTTP {e.response.status_code} while fetching."}
+        except Exception as e:
+            return {"url": target, "error": f"Fetch failed: {e}"}
 
-    if not args.raw and looks_like_html(body, ctype):
-        content = html_to_markdown(body)
-        prefix = ""
-    else:
-        content = body
-        prefix = f"Content-Type: {ctype or 'unknown'} (raw)\n\n"
+        body_hash = content_hash(body)
+        cached = DOC_CACHE.by_body(key, body_hash, args.raw)
+        if cached is None:
+            if not args.raw and looks_like_html(body, ctype):
+                content = await run_cpu(html_to_markdown, body)
+                prefix = ""
+            else:
+                content = body
+                prefix = f"Content-Type: {ctype or 'unknown'} (raw)\n\n"
+            cached = DOC_CACHE.put(key, target, body_hash, args.raw, content, prefix)
+    content, prefix = cached.content, cached.prefix
+    out = {"url": target, "prefix": prefix, "doc": cached.handle}
+    if url_key(cached.url) != key:
+        # Byte-identical to a document already fetched under another URL.
+        out["same_as"] = cached.url
+    if args.query:
+        # Best BM25 passages within max_length instead of the top of the page; offsets allow reading around them.
+        if cached.passages is None:
+            cached.passages = await asyncio.to_thread(split_passages, content)
+        selected = await asyncio.to_thread(select_passages, cached.passages, args.query, args.max_length)
+        if selected:
+            out["content"] = format_passages(selected, args.max_length)
+            out["passages"] = [{"start": p.start, "end": p.end, "section": p.section, "score": round(sc, 3)} for p, sc in selected]
+            out["total_length"] = len(content)
+            return out
+        out["note"] = "No passage matched the query; returning the page from start_index."
     total = len(content)
     if args.start_index >= total:
         final = "<error>No more content available.</error>"
@@ -102,45 +192,199 @@ async def fetch(url: str, max_length: int = 5000, start_index: int = 0, raw: boo
         final = chunk if chunk else "<error>No more content available.</error>"
         if len(chunk) == args.max_length and (args.start_index + len(chunk)) < total:
             next_start = args.start_index + len(chunk)
-            final += f"\n\n<error>Content truncated. Call fetch with start_index={next_start} to continue.</error>"
-    return {"url": str(args.url), "prefix": prefix, "content": final}
+            final += f"\n\n<error>Content truncated. Call fetch with start_index={next_start} and doc=\"{cached.handle}\" to continue.</error>"
+    out["content"] = final
+    return out
+
+_fetch_many_sem: Optional[asyncio.Semaphore] = None
+_host_next_start: Dict[str, float] = {}
+
+async def _polite_wait(url: str) -> None:
+    """Space out request starts to the same host by FETCH_HOST_DELAY_S."""
+    host = urllib.parse.urlsplit(url).hostname or ""
+    now = time.monotonic()
+    for h in [h for h, t in _host_next_start.items() if t <= now]:
+        del _host_next_start[h]  # spacing already elapsed: don't keep every host ever fetched
+    start = max(now, _host_next_start.get(host, 0.0))
+    _host_next_start[host] = start + FETCH_HOST_DELAY_S
+    if start > now:
+        await asyncio.sleep(start - now)
+
+async def _fetch_one(url: str, max_length: int, timeout_s: float, query: Optional[str] = None) -> Dict:
+    global _fetch_many_sem
+    if _fetch_many_sem is None:
+        _fetch_many_sem = asyncio.Semaphore(FETCH_MANY_CONCURRENCY)
+    t0 = time.monotonic()
+    # Wait for the host's turn before taking a slot, so same-host spacing doesn't block other hosts.
+    await _polite_wait(url)
+    async with _fetch_many_sem:
+        try:
+            out = await asyncio.wait_for(fetch(url, max_length=max_length, query=query), timeout_s)
+        except asyncio.TimeoutError:
+            out = {"url": url, "error": f"Timed out after {timeout_s:g}s."}
+    out["elapsed_ms"] = int((time.monotonic() - t0) * 1000)
+    return out
+
+async def fetch_many(
+    urls: List[str],
+    max_length: int = 5000,
+    per_url_timeout_s: float = 15,
+    deadline_s: float = 30,
+    on_result: Optional[Callable[[Dict, int, int], Awaitable[None]]] = None,
+    query: Optional[str] = None,
+) -> Dict:
+    """
+    Fetch several URLs concurrently (global limit FETCH_MANY_CONCURRENCY, per-host spacing FETCH_HOST_DELAY_S).
+    Results are collected in completion order; URLs still running at `deadline_s` are cancelled and listed in `pending`.
+    `on_result(result, done, total)` is awaited as each URL finishes.
+    """
+    urls = dedupe_urls(urls)[:FETCH_MANY_MAX_URLS]
+    if not urls:
+        return {"results": [], "pending": [], "error": "No urls given."}
+    tasks = {asyncio.create_task(_fetch_one(u, max_length, per_url_timeout_s, query)): u for u in urls}
+    results: List[Dict] = []
+    deadline = time.monotonic() + deadline_s
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is not None:
+                    results.append({"url": tasks[t], "error": f"Fetch failed: {t.exception()}"})
+                else:
+                    results.append(t.result())
+                if on_result is not None:
+                    await on_result(results[-1], len(results), len(urls))
+    finally:
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)  # let cancelled fetches close their responses
+    return {"results": results, "pending": [tasks[t] for t in pending]}
 
 # ----------------------------------------------------------------------------------------------------------------------------
 
 def web_search(query: str, max_results: int = 5) -> List[str]:
-    """Return a plain list of URLs (strings)."""
-    try:
-        r = httpx.get(
-            "https://html.duckduckgo.com/html/",
-            params={"q": query},
-            headers={
-                "User-Agent": DEFAULT_UA_BROWSER,
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Referer": "https://duckduckgo.com/",
-            },
-            timeout=20,
-            follow_redirects=True,
-        )
-        r.raise_for_status()
-    except Exception:
-        return []
-    html = r.text
-    anchors = re.findall(r'href="([^"]+)"', html)
-    urls = []
-    for a in anchors:
-        if "uddg=" in a or a.startswith("/l/"):
-            try:
-                full = a if a.startswith("http") else "https://duckduckgo.com" + a
-                u = urllib.parse.unquote(urllib.parse.parse_qs(urllib.parse.urlparse(full).query).get("uddg", [full])[0])
-            except Exception:
-                u = a
-            if u.startswith("http") and "duckduckgo.com" not in u and u not in urls:
-                urls.append(u)
-        elif a.startswith("http") and "duckduckgo.com" not in a:
-            if a not in urls:
-                urls.append(a)
+    """Return a plain list of URLs (strings); raises on HTTP/network errors so a failure is not cached as "no results"."""
+    r = get_sync_http_client().get(DDG_URL, params={"q": query}, headers=DDG_HEADERS, timeout=20)
+    r.raise_for_status()
+    return _parse_ddg(r.text, max_results)
+
+async def web_search_async(query: str, max_results: int = 5) -> List[str]:
+    """Async DuckDuckGo scrape on the shared client (cancellable); raises on HTTP errors."""
+    client = await get_http_client()
+    r = await client.get(DDG_URL, params={"q": query}, headers=DDG_HEADERS, timeout=20)
+    r.raise_for_status()
+    return _parse_ddg(r.text, max_results)
+
+def _parse_ddg(html: str, max_results: int) -> List[str]:
+    """Result links from a DuckDuckGo HTML page: uddg= wrappers unwrapped, canonicalized, de-duplicated."""
+    urls: List[str] = []
+    seen = set()
+    for a in re.findall(r'href="([^"]+)"', html):
+        a = html_lib.unescape(a)
+        full = "https:" + a if a.startswith("//") else ("https://duckduckgo.com" + a if a.startswith("/") else a)
+        u = unwrap_redirect(full)
+        if not u.startswith("http") or "duckduckgo.com" in (urllib.parse.urlsplit(u).hostname or ""):
+            continue
+        key = url_key(u)
+        if key not in seen:
+            seen.add(key)
+            urls.append(clean_url(u))
         if len(urls) >= max_results:
             break
+    return urls
+
+# ----------------------------------------------------------------------------------------------------------------------------
+SearchBackend = Callable[[str, int], Awaitable[List[Dict[str, str]]]]
 
-    return urls[:max_results]
\ No newline at end of file
+def default_search_backends(model: str) -> Dict[str, SearchBackend]:
+    """DuckDuckGo scrape + OpenAI web_search_preview, both read through / written to the shared search cache."""
+    from search_cache import SEARCH_CACHE
+
+    def through_cache(key: str, search: SearchBackend) -> SearchBackend:
+        async def run(query: str, max_results: int) -> List[Dict[str, str]]:
+            hit = await asyncio.to_thread(SEARCH_CACHE.get, key, query, max_results)
+            if hit is not None:
+                return hit
+            results = await search(query, max_results)
+            await asyncio.to_thread(SEARCH_CACHE.put, key, query, max_results, results)
+            return results
+        return run
+
+    async def ddg(query: str, max_results: int) -> List[Dict[str, str]]:
+        urls = await web_search_async(query, max_results)
+        return [{"url": u, "snippet": ""} for u in urls] or [{"url": "", "snippet": "No results"}]
+
+    async def openai(query: str, max_results: int) -> List[Dict[str, str]]:
+        return await web_search_api_async(query, max_results, model)
+
+    return {"ddg": through_cache("ddg", ddg), "openai": through_cache(f"openai:{model}", openai)}
+
+def merge_ranked(result_sets: Dict[str, List[Dict[str, str]]], max_results: int) -> List[Dict[str, Any]]:
+    """Interleave backends rank by rank, dropping duplicate URLs but recording every backend that returned them."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    depth = max((len(r) for r in result_sets.values()), default=0)
+    for rank in range(depth):
+        for name, results in result_sets.items():
+            if rank >= len(results) or not results[rank].get("url"):
+                continue
+            item = results[rank]
+            key = url_key(item["url"])
+            if key in merged:
+                merged[key]["sources"].append(name)
+                merged[key]["snippet"] = merged[key]["snippet"] or item.get("snippet", "")
+            else:
+                merged[key] = {"url": item["url"], "snippet": item.get("snippet", ""), "sources": [name], "rank": len(merged)}
+    return list(merged.values())[:max_results]
+
+async def hedged_search(
+    query: str,
+    max_results: int = 5,
+    model: str = "gpt-5",
+    budget_s: float = SEARCH_BUDGET_S,
+    grace_s: float = SEARCH_HEDGE_GRACE_S,
+    backends: Optional[Dict[str, SearchBackend]] = None,
+) -> Dict[str, Any]:
+    """
+    Query every backend concurrently. Once the first non-empty result set arrives, the others get `grace_s`
+    more to contribute; anything still running then (or at `budget_s`) is cancelled.
+    Returns {"results": merged by rank, "backends": per-backend status/latency, "elapsed_ms"}.
+    """
+    backends = backends if backends is not None else default_search_backends(model)
+    t0 = time.monotonic()
+    deadline = t0 + budget_s
+    tasks = {asyncio.create_task(fn(query, max_results)): name for name, fn in backends.items()}
+    report: Dict[str, Dict[str, Any]] = {name: {"status": "pending"} for name in backends}
+    good: Dict[str, List[Dict[str, str]]] = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                name = tasks[t]
+                ms = int((time.monotonic() - t0) * 1000)
+                if t.exception() is not None:
+                    report[name] = {"status": "error", "ms": ms, "error": str(t.exception())}
+                    continue
+                results = t.result()
+                ok = any(r.get("url") for r in results)
+                report[name] = {"status": "ok" if ok else "empty", "ms": ms, "n": len(results)}
+                if ok:
+                    if not good:
+                        deadline = min(deadline, time.monotonic() + grace_s)
+                    good[name] = results
+    finally:
+        for t in pending:
+            t.cancel()
+            report[tasks[t]] = {"status": "cancelled", "ms": int((time.monotonic() - t0) * 1000)}
+        # Wait for the losers to unwind (close their responses) so nothing outlives the call or logs "never retrieved".
+        await asyncio.gather(*pending, return_exceptions=True)
+    ordered = {name: good[name] for name in backends if name in good}
+    return {"results": merge_ranked(ordered, max_results), "backends": report, "elapsed_ms": int((time.monotonic() - t0) * 1000)}